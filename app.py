@@ -1,38 +1,36 @@
 import dash
-from dash import dcc, html, callback_context
-from dash.dependencies import Input, Output, State
+from dash import dcc, html, callback_context, Patch
+from dash.dependencies import ALL, MATCH, ClientsideFunction, Input, Output, State
 import dash_bootstrap_components as dbc
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-from datetime import datetime, date
-import base64
-import io
-
-# REMOVIDO: px.defaults.template = "plotly_dark"
-
+from datetime import datetime
+import functools
+import os
+import secrets
+
+import flask
+
+import metrics
+from compression import install_compression
+from dataset import get_data
+from engine import (
+    TOP_N, filter_options, query_dashboard, query_digest, query_trend, search_options, status_breakdown, update_state,
+    warm_state
+)
+from figures import (
+    cached_figures, empty_data, full_figure, motivo_donut_data, patch_figure, status_bar_data, top_vagas_data,
+    top_vagas_title, trend_flow_figure, trend_rate_figure
+)
+from indexes import DATE_COLUMN, TYPEAHEAD_COLUMNS
+from uploads import (
+    IngestionStarted, OffsetMismatch, UploadNotFound, append_chunk, finish_upload, ingestion_status, start_upload,
+    upload_status
+)
 
-# =====================================================================
-# FUNÇÃO DE CARREGAMENTO DE DADOS
-# =====================================================================
-def load_data():
-    """Lê e trata o arquivo de dados, retornando um DataFrame."""
-    try:
-        df = pd.read_csv('data/dados.csv', sep=';')
-    except UnicodeDecodeError:
-        df = pd.read_csv('data/dados.csv', sep=';', encoding='latin1')
-    
-    df['Recrutamento e Seleção'] = pd.to_datetime(df['Recrutamento e Seleção'], format='%d/%m/%Y', errors='coerce')
-    df.dropna(subset=['Recrutamento e Seleção'], inplace=True)
-    df.columns = df.columns.str.strip()
-    df['STATUS'] = df['STATUS'].str.strip().fillna('Não especificado')
-    df.loc[df['STATUS'] == '', 'STATUS'] = 'Não especificado'
-    return df
 
 # =====================================================================
 # INICIALIZAÇÃO E CONFIGURAÇÕES GERAIS
 # =====================================================================
-df = load_data() # Carga inicial dos dados
+get_data() # Carga inicial dos dados (fica em cache para os callbacks)
 app = dash.Dash(
     __name__, 
     external_stylesheets=[dbc.themes.CYBORG, dbc.icons.BOOTSTRAP], 
@@ -40,6 +38,34 @@ app = dash.Dash(
 )
 server = app.server
 
+
+def _secret_key(path=os.path.join('data', '.secret_key')):
+    """Chave da sessão Flask: DASHBOARD_SECRET_KEY ou uma chave gerada e guardada em disco.
+
+    Guardada em arquivo para ser a mesma em todos os workers do gunicorn.
+    """
+    if os.environ.get('DASHBOARD_SECRET_KEY'):
+        return os.environ['DASHBOARD_SECRET_KEY']
+    try:
+        with open(path, 'x', encoding='utf-8') as f:
+            f.write(secrets.token_hex(32))
+    except FileExistsError:
+        pass
+    with open(path, encoding='utf-8') as f:
+        return f.read().strip()
+
+
+# A sessão Flask (cookie assinado) autoriza as rotas HTTP de upload
+server.secret_key = _secret_key()
+
+# Tempo, status e tamanho das respostas de cada callback (ver metrics.py e a rota /metrics)
+metrics.instrument_server(server)
+# Compressão das respostas e revalidação do layout por ETag (ver compression.py).
+# Registrada depois das métricas: o Flask roda os after_request na ordem
+# inversa, então as métricas veem a resposta já comprimida (o tamanho
+# original fica em flask.g).
+install_compression(server)
+
 # =====================================================================
 # USUÁRIOS E PERMISSÕES
 # =====================================================================
@@ -49,10 +75,26 @@ USERS = {
 }
 
 # =====================================================================
-# OPÇÕES PARA FILTROS (BASEADO NA CARGA INICIAL)
+# OPÇÕES PARA FILTROS
 # =====================================================================
-status_vaga_options = sorted(df['Status da Vaga'].unique())
-status_interno_options = sorted(df['STATUS'].unique())
+# As opções vêm da versão vigente dos dados (ver dashboard_layout e
+# atualizar_opcoes). Os filtros de busca abaixo, de alta cardinalidade,
+# recebem opções só conforme o texto digitado (ver engine.search_options).
+rotulos_busca = {
+    'Contrato': 'Contrato',
+    'Cidade da OI': 'Cidade',
+    'Título do Cargo': 'Cargo',
+    'RECRUTADOR': 'Recrutador',
+    'COO': 'COO',
+    'Executivo': 'Executivo',
+    'Diretor': 'Diretor',
+    'Gerente': 'Gerente',
+    'Coordenador': 'Coordenador',
+    'Supervisor': 'Supervisor',
+}
+
+# Quantidades de vagas por página no gráfico de vagas abertas há mais tempo
+top_n_options = [10, 15, 25, 50]
 
 # =====================================================================
 # LAYOUTS (PÁGINA DE LOGIN E PÁGINA DO DASHBOARD)
@@ -83,189 +125,303 @@ login_layout = dbc.Container([
 
 
 # --- Layout Principal do Dashboard (seu código original com adições) ---
-dashboard_layout = dbc.Container([
-    # Adicionando Botão de Logout e Nome do Usuário
-    dbc.Row([
-        dbc.Col(html.Div(id='user-name-display', className='text-muted text-start'), width=6),
-        dbc.Col(dbc.Button("Sair", id="logout_button", color="danger", size="sm", className="float-end"), width=6),
-    ], className="mt-3 mb-2"),
-
-    # Container para a funcionalidade de Upload (visível apenas para admin)
-    html.Div(id='upload-container', children=[
+def dashboard_layout():
+    """Página do dashboard, com as opções dos filtros da versão vigente dos dados.
+
+    Montada a cada abertura da página (as opções ficam em cache por versão,
+    ver engine.filter_options), então nunca mostra opções de uma base antiga.
+    """
+    datas = get_data()[DATE_COLUMN]
+    opcoes_status = filter_options('Status da Vaga')
+    opcoes_status_interno = filter_options('STATUS')
+
+    return dbc.Container([
+        # Adicionando Botão de Logout e Nome do Usuário
         dbc.Row([
-            dbc.Col([
-                html.Hr(),
-                html.H5("Atualizar Base de Dados (Admin)", className="text-info"),
-                dcc.Upload(
-                    id='upload-data',
-                    children=html.Div(['Arraste e solte ou ', html.A('selecione um arquivo .csv')]),
-                    style={
-                        'width': '100%', 'height': '60px', 'lineHeight': '60px',
-                        'borderWidth': '1px', 'borderStyle': 'dashed',
-                        'borderRadius': '5px', 'textAlign': 'center', 'margin': '10px'
-                    },
-                    multiple=False
-                ),
-                html.Div(id='output-data-upload'),
-                html.Hr()
-            ])
-        ], className='mb-4')
-    ], style={'display': 'none'}), # Oculto por padrão
-
-    # --- Linha 1: Titulo ---
-    dbc.Row([
-        dbc.Col([
-            html.H1('Dashboard de Análise de Vagas', className='text-primary mb-0'),
-            html.P('Análise de desempenho do processo seletivo', className='text-muted')
-        ], width=12)
-    ], className='mb-4 mt-4'),
-
-    # --- Linha 2: Filtros ---
-    dbc.Row([
-        dbc.Col([
-            dbc.Card([
-                dbc.CardBody([
-                    html.H5("Filtros Gerais", className="card-title"),
-                    dbc.Row([
-                        # Filtro de Data
-                        dbc.Col(
-                            dcc.DatePickerRange(
-                                id='filtro-data',
-                                min_date_allowed=df['Recrutamento e Seleção'].min().date(),
-                                max_date_allowed=df['Recrutamento e Seleção'].max().date(),
-                                start_date=df['Recrutamento e Seleção'].min().date(),
-                                end_date=df['Recrutamento e Seleção'].max().date(),
-                                display_format='DD/MM/YYYY',
-                                className='w-100'
-                            ), width=4
-                        ),
-                        # Filtro de Grupo Economico
-                        dbc.Col(
-                            dcc.Dropdown(
-                                id='filtro-grupo',
-                                options=[{'label': g, 'value': g} for g in df['Grupo Econômico'].unique()],
-                                value=None,
-                                placeholder="Selecione o Grupo",
-                                multi=True
-                            ), width=4
-                        ),
-                        # Filtro de UF
-                        dbc.Col(
-                            dcc.Dropdown(
-                                id='filtro-uf',
-                                options=[{'label': u, 'value': u} for u in df['UF da OI'].unique()],
-                                value=None,
-                                placeholder="Selecione a UF",
-                                multi=True
-                            ), width=4
-                        )
-                    ])
+            dbc.Col(html.Div(id='user-name-display', className='text-muted text-start'), width=6),
+            dbc.Col(dbc.Button("Sair", id="logout_button", color="danger", size="sm", className="float-end"), width=6),
+        ], className="mt-3 mb-2"),
+
+        # Container para a funcionalidade de Upload (visível apenas para admin)
+        html.Div(id='upload-container', children=[
+            dbc.Row([
+                dbc.Col([
+                    html.Hr(),
+                    html.H5("Atualizar Base de Dados (Admin)", className="text-info"),
+                    # Substituir a base ou mesclar só as vagas novas/alteradas (ver merge.py)
+                    dbc.RadioItems(
+                        id='upload-modo',
+                        options=[
+                            {'label': 'Substituir a base', 'value': 'replace'},
+                            {'label': 'Mesclar com a base (atualização incremental)', 'value': 'merge'},
+                        ],
+                        value='replace',
+                        inline=True,
+                    ),
+                    # Envio em partes pela rota /upload/csv (ver assets/upload.js)
+                    html.Div(
+                        id='upload-data',
+                        children=html.Div(['Arraste e solte ou ', html.A('selecione um arquivo .csv ou .xlsx')]),
+                        style={
+                            'width': '100%', 'height': '60px', 'lineHeight': '60px',
+                            'borderWidth': '1px', 'borderStyle': 'dashed',
+                            'borderRadius': '5px', 'textAlign': 'center', 'margin': '10px',
+                            'cursor': 'pointer'
+                        }
+                    ),
+                    html.Div(id='output-data-upload'),
+                    html.Hr()
                 ])
             ], className='mb-4')
-        ])
-    ]),
-
-    # --- Abas ---
-    dcc.Tabs(id="tabs-principal", value='tab-status-vaga', children=[
-        # --- Aba 1: Análise por Status da Vaga (Original) ---
-        dcc.Tab(label='Análise por Status da Vaga', value='tab-status-vaga', children=[
-            dbc.Card(dbc.CardBody([
-                # Filtro Específico da Aba (Estilo Excel)
-                dbc.Button("Filtrar por Status da Vaga...", id="filtro-status-btn", className="mb-2 w-100"),
-                dbc.Collapse(
-                    dbc.Card(dbc.CardBody([
+        ], style={'display': 'none'}), # Oculto por padrão
+
+        # --- Linha 1: Titulo ---
+        dbc.Row([
+            dbc.Col([
+                html.H1('Dashboard de Análise de Vagas', className='text-primary mb-0'),
+                html.P('Análise de desempenho do processo seletivo', className='text-muted')
+            ], width=12)
+        ], className='mb-4 mt-4'),
+
+        # --- Linha 2: Filtros ---
+        dbc.Row([
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardBody([
+                        html.H5("Filtros Gerais", className="card-title"),
                         dbc.Row([
-                            dbc.Col(dbc.Button("Marcar Todos", id="filtro-status-select-all", size="sm", color="primary", outline=True), width="auto"),
-                            dbc.Col(dbc.Button("Limpar Todos", id="filtro-status-clear-all", size="sm", color="secondary", outline=True), width="auto"),
-                        ], className="mb-2"),
-                        dcc.Checklist(
-                            id='filtro-status',
-                            options=[{'label': s, 'value': s} for s in status_vaga_options],
-                            value=status_vaga_options,
-                            labelStyle={'display': 'block', 'margin-bottom': '5px'},
-                            style={'height': '200px', 'overflow-y': 'auto', 'border': '1px solid #ddd', 'padding': '10px', 'border-radius': '5px'}
+                            # Filtro de Data
+                            dbc.Col(
+                                dcc.DatePickerRange(
+                                    id='filtro-data',
+                                    min_date_allowed=datas.min().date(),
+                                    max_date_allowed=datas.max().date(),
+                                    start_date=datas.min().date(),
+                                    end_date=datas.max().date(),
+                                    display_format='DD/MM/YYYY',
+                                    className='w-100'
+                                ), width=4
+                            ),
+                            # Filtro de Grupo Economico
+                            dbc.Col(
+                                dcc.Dropdown(
+                                    id='filtro-grupo',
+                                    options=filter_options('Grupo Econômico'),
+                                    value=None,
+                                    placeholder="Selecione o Grupo",
+                                    multi=True
+                                ), width=4
+                            ),
+                            # Filtro de UF
+                            dbc.Col(
+                                dcc.Dropdown(
+                                    id='filtro-uf',
+                                    options=filter_options('UF da OI'),
+                                    value=None,
+                                    placeholder="Selecione a UF",
+                                    multi=True
+                                ), width=4
+                            )
+                        ]),
+                        # Busca textual (ver search.py): todos os termos, sem acentos nem caixa
+                        dbc.Row([
+                            dbc.Col(
+                                dbc.Input(
+                                    id='busca-texto',
+                                    type='search',
+                                    debounce=True,
+                                    placeholder="Buscar em anotações, cargo, endereço ou localidade..."
+                                ), width=12
+                            )
+                        ], className='mt-3'),
+                        # Filtros de busca (contrato, cidade, cargo, gestores)
+                        dbc.Button("Mais filtros...", id="filtro-busca-btn", color="link", size="sm", className="mt-2 px-0"),
+                        dbc.Collapse(
+                            dbc.Row([
+                                dbc.Col(
+                                    dcc.Dropdown(
+                                        id={'type': 'filtro-busca', 'col': col},
+                                        options=[],
+                                        value=None,
+                                        placeholder=f"{rotulos_busca[col]} (digite para buscar)",
+                                        multi=True
+                                    ), width=4, className='mb-2'
+                                )
+                                # Mesma ordem de TYPEAHEAD_COLUMNS: é a ordem dos valores nos callbacks
+                                for col in TYPEAHEAD_COLUMNS
+                            ], className='mt-2'),
+                            id="filtro-busca-collapse",
+                            is_open=False,
                         ),
-                    ])),
-                    id="filtro-status-collapse",
-                    is_open=False
-                ),
-
-                # KPIs
-                dbc.Row([
-                    dbc.Col(dbc.Card(dbc.CardBody(id='kpi-total-vagas')), width=3),
-                    dbc.Col(dbc.Card(dbc.CardBody(id='kpi-dias-aberto')), width=3),
-                    dbc.Col(dbc.Card(dbc.CardBody(id='kpi-fora-sla')), width=3),
-                    dbc.Col(dbc.Card(dbc.CardBody(id='kpi-taxa-fora-sla')), width=3)
-                ], className='mb-4 mt-3'),
-                # Graficos
-                dbc.Row([
-                    dbc.Col(dcc.Graph(id='grafico-vagas-status'), lg=8, md=12, className="mb-4"),
-                    dbc.Col(dcc.Graph(id='grafico-vagas-motivo'), lg=4, md=12, className="mb-4")
-                ]),
-                # Grafico Top Vagas
-                 dbc.Row([
-                    dbc.Col([
-                        html.Hr(),
-                        dcc.Graph(id='grafico-top-vagas-aberto', style={'height': '600px'})
-                    ], width=12)
-                ], className='mt-4'),
-            ]), className='mt-3')
+                    ])
+                ], className='mb-4')
+            ])
         ]),
 
-        # --- Aba 2: Análise por STATUS (Novo) ---
-        dcc.Tab(label='Análise por Status Interno', value='tab-status-interno', children=[
-            dbc.Card(dbc.CardBody([
-                # Filtro Específico da Aba (Estilo Excel)
-                dbc.Button("Filtrar por STATUS Interno...", id="filtro-status-interno-btn", className="mb-2 w-100"),
-                dbc.Collapse(
-                    dbc.Card(dbc.CardBody([
-                        dbc.Row([
-                            dbc.Col(dbc.Button("Marcar Todos", id="filtro-status-interno-select-all", size="sm", color="primary", outline=True), width="auto"),
-                            dbc.Col(dbc.Button("Limpar Todos", id="filtro-status-interno-clear-all", size="sm", color="secondary", outline=True), width="auto"),
-                        ], className="mb-2"),
-                        dcc.Checklist(
-                            id='filtro-status-interno',
-                            options=[{'label': s, 'value': s} for s in status_interno_options],
-                            value=status_interno_options,
-                            labelStyle={'display': 'block', 'margin-bottom': '5px'},
-                            style={'height': '200px', 'overflow-y': 'auto', 'border': '1px solid #ddd', 'padding': '10px', 'border-radius': '5px'}
-                        ),
-                    ])),
-                    id="filtro-status-interno-collapse",
-                    is_open=False
-                ),
-
-                # KPIs (com IDs diferentes)
-                dbc.Row([
-                    dbc.Col(dbc.Card(dbc.CardBody(id='kpi-total-vagas-interno')), width=3),
-                    dbc.Col(dbc.Card(dbc.CardBody(id='kpi-dias-aberto-interno')), width=3),
-                    dbc.Col(dbc.Card(dbc.CardBody(id='kpi-fora-sla-interno')), width=3),
-                    dbc.Col(dbc.Card(dbc.CardBody(id='kpi-taxa-fora-sla-interno')), width=3)
-                ], className='mb-4 mt-3'),
-                # Graficos (com IDs diferentes)
-                dbc.Row([
-                    dbc.Col(dcc.Graph(id='grafico-vagas-status-interno'), lg=8, md=12, className="mb-4"),
-                    dbc.Col(dcc.Graph(id='grafico-vagas-motivo-interno'), lg=4, md=12, className="mb-4")
-                ]),
-                # Grafico Top Vagas (com ID diferente)
-                 dbc.Row([
-                    dbc.Col([
-                        html.Hr(),
-                        dcc.Graph(id='grafico-top-vagas-aberto-interno', style={'height': '600px'})
-                    ], width=12)
-                ], className='mt-4'),
-            ]), className='mt-3')
+        # --- Abas ---
+        dcc.Tabs(id="tabs-principal", value='tab-status-vaga', children=[
+            # --- Aba 1: Análise por Status da Vaga (Original) ---
+            dcc.Tab(label='Análise por Status da Vaga', value='tab-status-vaga', children=[
+                dbc.Card(dbc.CardBody([
+                    # Filtro Específico da Aba (Estilo Excel)
+                    dbc.Button("Filtrar por Status da Vaga...", id="filtro-status-btn", className="mb-2 w-100"),
+                    dbc.Collapse(
+                        dbc.Card(dbc.CardBody([
+                            dbc.Row([
+                                dbc.Col(dbc.Button("Marcar Todos", id="filtro-status-select-all", size="sm", color="primary", outline=True), width="auto"),
+                                dbc.Col(dbc.Button("Limpar Todos", id="filtro-status-clear-all", size="sm", color="secondary", outline=True), width="auto"),
+                            ], className="mb-2"),
+                            dcc.Checklist(
+                                id='filtro-status',
+                                options=opcoes_status,
+                                value=[o['value'] for o in opcoes_status],
+                                labelStyle={'display': 'block', 'margin-bottom': '5px'},
+                                style={'height': '200px', 'overflow-y': 'auto', 'border': '1px solid #ddd', 'padding': '10px', 'border-radius': '5px'}
+                            ),
+                        ])),
+                        id="filtro-status-collapse",
+                        is_open=False
+                    ),
+
+                    # KPIs
+                    dbc.Row([
+                        dbc.Col(dbc.Card(dbc.CardBody(id='kpi-total-vagas')), width=3),
+                        dbc.Col(dbc.Card(dbc.CardBody(id='kpi-dias-aberto')), width=3),
+                        dbc.Col(dbc.Card(dbc.CardBody(id='kpi-fora-sla')), width=3),
+                        dbc.Col(dbc.Card(dbc.CardBody(id='kpi-taxa-fora-sla')), width=3)
+                    ], className='mb-4 mt-3'),
+                    # Graficos
+                    dbc.Row([
+                        dbc.Col(dcc.Graph(id='grafico-vagas-status'), lg=8, md=12, className="mb-4"),
+                        dbc.Col(dcc.Graph(id='grafico-vagas-motivo'), lg=4, md=12, className="mb-4")
+                    ]),
+                    # Grafico Top Vagas
+                     dbc.Row([
+                        dbc.Col([
+                            html.Hr(),
+                            # Quantidade de vagas por página e paginação do Top N
+                            dbc.Row([
+                                dbc.Col(html.Label("Vagas por página:"), width="auto"),
+                                dbc.Col(dcc.Dropdown(
+                                    id='top-n',
+                                    options=[{'label': str(n), 'value': n} for n in top_n_options],
+                                    value=TOP_N,
+                                    clearable=False,
+                                    style={'width': '90px'}
+                                ), width="auto"),
+                                dbc.Col(dbc.Pagination(id='top-pagina', active_page=1, max_value=1, size="sm", previous_next=True, fully_expanded=False), width="auto"),
+                            ], className="align-items-center mb-2"),
+                            dcc.Graph(id='grafico-top-vagas-aberto', style={'height': '600px'})
+                        ], width=12)
+                    ], className='mt-4'),
+                    # Versão dos dados já enviada completa ao navegador
+                    dcc.Store(id='render-state-status-vaga'),
+                    # Agregado por status para o filtro no navegador
+                    dcc.Store(id='agregado-status-vaga'),
+                ]), className='mt-3')
+            ]),
+
+            # --- Aba 2: Análise por STATUS (Novo) ---
+            dcc.Tab(label='Análise por Status Interno', value='tab-status-interno', children=[
+                dbc.Card(dbc.CardBody([
+                    # Filtro Específico da Aba (Estilo Excel)
+                    dbc.Button("Filtrar por STATUS Interno...", id="filtro-status-interno-btn", className="mb-2 w-100"),
+                    dbc.Collapse(
+                        dbc.Card(dbc.CardBody([
+                            dbc.Row([
+                                dbc.Col(dbc.Button("Marcar Todos", id="filtro-status-interno-select-all", size="sm", color="primary", outline=True), width="auto"),
+                                dbc.Col(dbc.Button("Limpar Todos", id="filtro-status-interno-clear-all", size="sm", color="secondary", outline=True), width="auto"),
+                            ], className="mb-2"),
+                            dcc.Checklist(
+                                id='filtro-status-interno',
+                                options=opcoes_status_interno,
+                                value=[o['value'] for o in opcoes_status_interno],
+                                labelStyle={'display': 'block', 'margin-bottom': '5px'},
+                                style={'height': '200px', 'overflow-y': 'auto', 'border': '1px solid #ddd', 'padding': '10px', 'border-radius': '5px'}
+                            ),
+                        ])),
+                        id="filtro-status-interno-collapse",
+                        is_open=False
+                    ),
+
+                    # KPIs (com IDs diferentes)
+                    dbc.Row([
+                        dbc.Col(dbc.Card(dbc.CardBody(id='kpi-total-vagas-interno')), width=3),
+                        dbc.Col(dbc.Card(dbc.CardBody(id='kpi-dias-aberto-interno')), width=3),
+                        dbc.Col(dbc.Card(dbc.CardBody(id='kpi-fora-sla-interno')), width=3),
+                        dbc.Col(dbc.Card(dbc.CardBody(id='kpi-taxa-fora-sla-interno')), width=3)
+                    ], className='mb-4 mt-3'),
+                    # Graficos (com IDs diferentes)
+                    dbc.Row([
+                        dbc.Col(dcc.Graph(id='grafico-vagas-status-interno'), lg=8, md=12, className="mb-4"),
+                        dbc.Col(dcc.Graph(id='grafico-vagas-motivo-interno'), lg=4, md=12, className="mb-4")
+                    ]),
+                    # Grafico Top Vagas (com ID diferente)
+                     dbc.Row([
+                        dbc.Col([
+                            html.Hr(),
+                            # Quantidade de vagas por página e paginação do Top N
+                            dbc.Row([
+                                dbc.Col(html.Label("Vagas por página:"), width="auto"),
+                                dbc.Col(dcc.Dropdown(
+                                    id='top-n-interno',
+                                    options=[{'label': str(n), 'value': n} for n in top_n_options],
+                                    value=TOP_N,
+                                    clearable=False,
+                                    style={'width': '90px'}
+                                ), width="auto"),
+                                dbc.Col(dbc.Pagination(id='top-pagina-interno', active_page=1, max_value=1, size="sm", previous_next=True, fully_expanded=False), width="auto"),
+                            ], className="align-items-center mb-2"),
+                            dcc.Graph(id='grafico-top-vagas-aberto-interno', style={'height': '600px'})
+                        ], width=12)
+                    ], className='mt-4'),
+                    # Versão dos dados já enviada completa ao navegador
+                    dcc.Store(id='render-state-status-interno'),
+                    # Agregado por status para o filtro no navegador
+                    dcc.Store(id='agregado-status-interno'),
+                ]), className='mt-3')
+            ]),
+
+            # --- Aba 3: Tendência (rollups diários, ver rollups.py) ---
+            dcc.Tab(label='Tendência', value='tab-tendencia', children=[
+                dbc.Card(dbc.CardBody([
+                    dbc.Row([
+                        dbc.Col(html.Label("Agrupar por:"), width="auto"),
+                        dbc.Col(dbc.RadioItems(
+                            id='tendencia-periodo',
+                            options=[{'label': 'Semana', 'value': 'week'}, {'label': 'Mês', 'value': 'month'}],
+                            value='month',
+                            inline=True
+                        ), width="auto"),
+                        dbc.Col(html.Label("Taxa fora do SLA por:"), width="auto", className="ms-4"),
+                        dbc.Col(dbc.RadioItems(
+                            id='tendencia-quebra',
+                            options=[
+                                {'label': 'Total', 'value': ''},
+                                {'label': 'Grupo Econômico', 'value': 'Grupo Econômico'},
+                                {'label': 'UF', 'value': 'UF da OI'},
+                            ],
+                            value='',
+                            inline=True
+                        ), width="auto"),
+                    ], className="align-items-center mb-2"),
+                    html.Small("Considera o período, o grupo econômico e a UF selecionados.", className="text-muted"),
+                    dbc.Row([
+                        dbc.Col(dcc.Graph(id='grafico-tendencia-fluxo'), width=12, className="mb-4"),
+                        dbc.Col(dcc.Graph(id='grafico-tendencia-sla'), width=12),
+                    ], className='mt-3'),
+                ]), className='mt-3')
+            ]),
         ]),
-    ]),
 
 
-    # --- Linha 6: Rodape ---
-    dbc.Row([
-        dbc.Col(html.Hr(), width=12),
-        dbc.Col(html.P(f"Dados atualizados em: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}"), width=12, className='text-center text-muted')
-    ])
+        # --- Linha 6: Rodape ---
+        dbc.Row([
+            dbc.Col(html.Hr(), width=12),
+            dbc.Col(html.P(f"Dados atualizados em: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}"), width=12, className='text-center text-muted')
+        ])
 
-], fluid=True)
+    ], fluid=True)
 
 # =====================================================================
 # LAYOUT PRINCIPAL (CONTROLA QUAL PÁGINA MOSTRAR)
@@ -296,11 +452,11 @@ def router(pathname, session_data):
         return login_layout
     
     if pathname.startswith('/dashboard') and is_authenticated:
-        return dashboard_layout
+        return dashboard_layout()
     
     # Se não for nenhuma das rotas acima e não estiver autenticado, vai para o login
     if is_authenticated:
-        return dashboard_layout # Se já estiver logado e na raiz, vai para o dash
+        return dashboard_layout() # Se já estiver logado e na raiz, vai para o dash
     
     return login_layout
 
@@ -326,6 +482,9 @@ def login_logic(n_clicks, username, password):
             'username': username, 
             'role': USERS[username]['role']
         }
+        # Mesma identidade na sessão Flask, usada pelas rotas HTTP (upload)
+        flask.session['username'] = username
+        flask.session['role'] = USERS[username]['role']
         # Em sucesso, atualiza a sessão e redireciona para o dashboard
         return session_data, "", False, '/dashboard'
     else:
@@ -347,6 +506,7 @@ def logout_logic(n_clicks):
         raise dash.exceptions.PreventUpdate
         
     # Limpa a sessão e redireciona para a página de login
+    flask.session.clear()
     return {}, '/login'
 
 
@@ -390,395 +550,432 @@ def display_username(session_data):
         return f"Logado como: {session_data.get('username')} ({role})"
     return ""
 
-# --- Callback 6: Processar o Upload do Arquivo ---
-@app.callback(
-    [Output('output-data-upload', 'children'),
-     Output('data-update-signal', 'data')],
-    Input('upload-data', 'contents'),
-    State('upload-data', 'filename')
-)
-def update_output_upload(contents, filename):
-    if contents is not None:
-        content_type, content_string = contents.split(',')
-        decoded = base64.b64decode(content_string)
-        try:
-            if 'csv' in filename:
-                # Salva o novo arquivo
-                with open('data/dados.csv', 'wb') as f:
-                    f.write(decoded)
-                
-                # Gera uma mensagem de sucesso
-                alert = dbc.Alert(f"Arquivo '{filename}' atualizado com sucesso!", color="success", dismissable=True)
-                # Retorna a mensagem e um sinal para os outros callbacks atualizarem
-                return alert, datetime.now().isoformat()
-            else:
-                alert = dbc.Alert("Erro: O arquivo deve ser no formato .csv", color="danger", dismissable=True)
-                return alert, dash.no_update
-
-        except Exception as e:
-            print(e)
-            alert = dbc.Alert(f"Houve um erro ao processar o arquivo: {e}", color="danger", dismissable=True)
-            return alert, dash.no_update
-            
-    return "", dash.no_update
-
-
-# --- Callbacks para interatividade do Filtro 1 (Status da Vaga) ---
-@app.callback(
-    Output("filtro-status-collapse", "is_open"),
-    [Input("filtro-status-btn", "n_clicks")],
-    [State("filtro-status-collapse", "is_open")],
-)
-def toggle_collapse_status(n, is_open):
-    if n:
-        return not is_open
-    return is_open
+# --- Rotas HTTP do upload em partes ---
+# O navegador envia o CSV em partes (multipart) para estas rotas, sem base64
+# nem passar pelo callback; cada parte é gravada direto no arquivo temporário.
+# Ao fim, a ingestão roda em segundo plano (ver uploads.finish_upload): o
+# navegador acompanha as etapas e, depois da troca atômica da base, dispara
+# o 'data-update-signal'.
+def _upload_error(message, status, **extra):
+    return flask.jsonify({'error': message, **extra}), status
+
+
+def _require_admin(view):
+    """Só administradores logados (sessão Flask) podem enviar arquivos."""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if flask.session.get('role') != 'admin':
+            return _upload_error("Acesso negado.", 403)
+        return view(*args, **kwargs)
+    return wrapper
+
+
+@server.route('/upload/csv', methods=['POST'])
+@_require_admin
+def upload_start():
+    dados = flask.request.get_json(silent=True) or {}
+    try:
+        return flask.jsonify(start_upload(
+            dados.get('filename'), int(dados.get('size') or 0), mode=dados.get('mode', 'replace')
+        ))
+    except ValueError as e:
+        return _upload_error(str(e), 400)
 
-@app.callback(
-    Output("filtro-status", "value"),
-    [Input("filtro-status-select-all", "n_clicks"),
-     Input("filtro-status-clear-all", "n_clicks")]
-)
-def manage_all_selection_status(select_all, clear_all):
-    ctx = dash.callback_context
-    if not ctx.triggered:
-        return status_vaga_options
-    
-    button_id = ctx.triggered[0]['prop_id'].split('.')[0]
-    if button_id == "filtro-status-select-all":
-        return status_vaga_options
-    if button_id == "filtro-status-clear-all":
-        return []
-    return status_vaga_options
-
-# --- Callbacks para interatividade do Filtro 2 (STATUS Interno) ---
-@app.callback(
-    Output("filtro-status-interno-collapse", "is_open"),
-    [Input("filtro-status-interno-btn", "n_clicks")],
-    [State("filtro-status-interno-collapse", "is_open")],
+
+@server.route('/upload/csv/<upload_id>', methods=['GET'])
+@_require_admin
+def upload_get(upload_id):
+    try:
+        return flask.jsonify(upload_status(upload_id))
+    except UploadNotFound:
+        return _upload_error("Upload não encontrado.", 404)
+
+
+@server.route('/upload/csv/<upload_id>/chunk', methods=['POST'])
+@_require_admin
+def upload_chunk(upload_id):
+    arquivo = flask.request.files.get('chunk')
+    if arquivo is None:
+        return _upload_error("Parte ausente na requisição.", 400)
+    try:
+        received = append_chunk(upload_id, int(flask.request.form.get('offset', -1)), arquivo.stream)
+    except UploadNotFound:
+        return _upload_error("Upload não encontrado.", 404)
+    except OffsetMismatch as e:
+        return _upload_error(str(e), 409, received=e.received)
+    except ValueError as e:
+        return _upload_error(str(e), 400)
+    return flask.jsonify({'received': received})
+
+
+@server.route('/upload/csv/<upload_id>/finish', methods=['POST'])
+@_require_admin
+def upload_finish(upload_id):
+    try:
+        job = finish_upload(upload_id, prepare=warm_state, update=update_state)
+    except IngestionStarted as e:
+        # Requisição repetida: devolve o progresso da ingestão já em andamento
+        return flask.jsonify(e.job), 409
+    except UploadNotFound:
+        return _upload_error("Upload não encontrado.", 404)
+    except ValueError as e:
+        return _upload_error(str(e), 400)
+    return flask.jsonify(job), 202
+
+
+@server.route('/upload/csv/<upload_id>/ingestion', methods=['GET'])
+@_require_admin
+def upload_ingestion(upload_id):
+    try:
+        return flask.jsonify(ingestion_status(upload_id))
+    except UploadNotFound:
+        return _upload_error("Ingestão não encontrada.", 404)
+
+
+# --- Métricas no formato do Prometheus ---
+# Com DASHBOARD_METRICS_TOKEN definido, a coleta precisa do cabeçalho
+# "Authorization: Bearer <token>"; sem ele, a rota é aberta (rede interna).
+@server.route('/metrics', methods=['GET'])
+def metrics_view():
+    token = os.environ.get('DASHBOARD_METRICS_TOKEN')
+    if token and not secrets.compare_digest(flask.request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return flask.Response("Acesso negado.\n", 403, mimetype='text/plain')
+    return flask.Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
+# --- Callbacks para interatividade dos Filtros de Status (no navegador) ---
+# Abrir/fechar o filtro e os botões "Marcar Todos"/"Limpar Todos" rodam no
+# navegador (assets/dashboard.js), sem requisições ao servidor.
+for prefixo in ('filtro-status', 'filtro-status-interno'):
+    app.clientside_callback(
+        ClientsideFunction(namespace='dashboard', function_name='alternarCollapse'),
+        Output(f"{prefixo}-collapse", "is_open"),
+        Input(f"{prefixo}-btn", "n_clicks"),
+        State(f"{prefixo}-collapse", "is_open"),
+    )
+    app.clientside_callback(
+        ClientsideFunction(namespace='dashboard', function_name='selecionarTodos'),
+        Output(prefixo, "value"),
+        Input(f"{prefixo}-select-all", "n_clicks"),
+        Input(f"{prefixo}-clear-all", "n_clicks"),
+        State(prefixo, "options"),
+        prevent_initial_call=True
+    )
+
+
+app.clientside_callback(
+    ClientsideFunction(namespace='dashboard', function_name='alternarCollapse'),
+    Output("filtro-busca-collapse", "is_open"),
+    Input("filtro-busca-btn", "n_clicks"),
+    State("filtro-busca-collapse", "is_open"),
 )
-def toggle_collapse_status_interno(n, is_open):
-    if n:
-        return not is_open
-    return is_open
 
+
+# --- Opções dos filtros por versão dos dados ---
+# Filtros de busca: cada texto digitado traz só as opções que casam, do
+# índice de prefixos da versão vigente (nada é enviado antes da busca).
 @app.callback(
-    Output("filtro-status-interno", "value"),
-    [Input("filtro-status-interno-select-all", "n_clicks"),
-     Input("filtro-status-interno-clear-all", "n_clicks")]
+    Output({'type': 'filtro-busca', 'col': MATCH}, 'options'),
+    Input({'type': 'filtro-busca', 'col': MATCH}, 'search_value'),
+    Input('data-update-signal', 'data'),
+    State({'type': 'filtro-busca', 'col': MATCH}, 'value'),
+    prevent_initial_call=True
 )
-def manage_all_selection_status_interno(select_all, clear_all):
-    ctx = dash.callback_context
-    if not ctx.triggered:
-        return status_interno_options
-    
-    button_id = ctx.triggered[0]['prop_id'].split('.')[0]
-    if button_id == "filtro-status-interno-select-all":
-        return status_interno_options
-    if button_id == "filtro-status-interno-clear-all":
-        return []
-    return status_interno_options
+def buscar_opcoes(texto, update_signal, selecionados):
+    col = callback_context.outputs_list['id']['col']
+    return search_options(col, texto, selecionados, update_signal)
 
 
-# --- Callback para a ABA 1: Status da Vaga (Original) ---
+def selecao_atualizada(opcoes_anteriores, selecionados, opcoes):
+    """Mantém a seleção do usuário e já marca os valores que surgiram na nova versão."""
+    anteriores = {o['value'] for o in opcoes_anteriores or []}
+    marcados = set(selecionados or [])
+    return [o['value'] for o in opcoes if o['value'] in marcados or o['value'] not in anteriores]
+
+
+# Nova versão publicada (upload): opções, quantidades e período permitido
+# são trocados pelos da nova versão, sem recarregar a página.
 @app.callback(
-    [
-        Output('kpi-total-vagas', 'children'),
-        Output('kpi-dias-aberto', 'children'),
-        Output('kpi-fora-sla', 'children'),
-        Output('kpi-taxa-fora-sla', 'children'),
-        Output('grafico-vagas-status', 'figure'),
-        Output('grafico-vagas-motivo', 'figure'),
-        Output('grafico-top-vagas-aberto', 'figure')
-    ],
-    [
-        Input('filtro-data', 'start_date'),
-        Input('filtro-data', 'end_date'),
-        Input('filtro-status', 'value'), # Filtro específico desta aba
-        Input('filtro-grupo', 'value'),
-        Input('filtro-uf', 'value'),
-        Input('data-update-signal', 'data') # Input para o sinal de atualização
-    ]
+    Output('filtro-grupo', 'options'),
+    Output('filtro-uf', 'options'),
+    Output('filtro-status', 'options'),
+    Output('filtro-status', 'value', allow_duplicate=True),
+    Output('filtro-status-interno', 'options'),
+    Output('filtro-status-interno', 'value', allow_duplicate=True),
+    Output('filtro-data', 'min_date_allowed'),
+    Output('filtro-data', 'max_date_allowed'),
+    Output('filtro-data', 'end_date'),
+    Input('data-update-signal', 'data'),
+    State('filtro-status', 'options'),
+    State('filtro-status', 'value'),
+    State('filtro-status-interno', 'options'),
+    State('filtro-status-interno', 'value'),
+    State('filtro-data', 'max_date_allowed'),
+    State('filtro-data', 'end_date'),
+    prevent_initial_call=True
 )
-def update_dashboard_status_vaga(start_date, end_date, selected_status, selected_grupos, selected_ufs, update_signal):
-    # --- 1. Filtragem dos Dados ---
-    # Recarrega os dados sempre que a função for chamada
-    df = load_data()
+def atualizar_opcoes(update_signal, opcoes_status, status, opcoes_interno, interno, max_anterior, fim):
+    datas = get_data(update_signal)[DATE_COLUMN]
+    novo_status = filter_options('Status da Vaga', update_signal)
+    novo_interno = filter_options('STATUS', update_signal)
+    maximo = datas.max().date().isoformat()
+    # Período que ia até a última data passa a incluir as datas novas
+    novo_fim = maximo if fim and max_anterior and fim[:10] == max_anterior[:10] else dash.no_update
+    return (
+        filter_options('Grupo Econômico', update_signal),
+        filter_options('UF da OI', update_signal),
+        novo_status,
+        selecao_atualizada(opcoes_status, status, novo_status),
+        novo_interno,
+        selecao_atualizada(opcoes_interno, interno, novo_interno),
+        datas.min().date().isoformat(),
+        maximo,
+        novo_fim,
+    )
 
-    start_date_obj = date.fromisoformat(start_date)
-    end_date_obj = date.fromisoformat(end_date)
-    
-    dff = df[(df['Recrutamento e Seleção'].dt.date >= start_date_obj) & (df['Recrutamento e Seleção'].dt.date <= end_date_obj)]
-    
-    if selected_status:
-        dff = dff[dff['Status da Vaga'].isin(selected_status)]
-    if selected_grupos:
-        dff = dff[dff['Grupo Econômico'].isin(selected_grupos)]
-    if selected_ufs:
-        dff = dff[dff['UF da OI'].isin(selected_ufs)]
 
-    # --- 2. Calculo dos KPIs ---
-    if dff.empty or not selected_status:
-        empty_fig = go.Figure()
-        empty_fig.update_layout(
-            xaxis={"visible": False}, yaxis={"visible": False},
-            annotations=[{"text": "Sem dados para os filtros selecionados", "xref": "paper", "yref": "paper", "showarrow": False, "font": {"size": 16}}]
-        )
-        kpi_vagas_html = [html.H6('Total de Vagas', className='card-subtitle'), html.H4('0', className='card-title')]
-        kpi_dias_html = [html.H6('Média de Dias em Aberto', className='card-subtitle'), html.H4('N/A', className='card-title')]
-        kpi_fora_sla_html = [html.H6('Vagas Fora do SLA', className='card-subtitle'), html.H4('0', className='card-title text-danger')]
-        kpi_taxa_sla_html = [html.H6('Taxa Fora do SLA', className='card-subtitle'), html.H4('N/A', className='card-title')]
-        return kpi_vagas_html, kpi_dias_html, kpi_fora_sla_html, kpi_taxa_sla_html, empty_fig, empty_fig, empty_fig
-
-    # Total de Vagas
-    total_vagas = len(dff)
-    kpi_vagas_html = [
-        html.H6('Total de Vagas', className='card-subtitle'),
-        html.H4(f'{total_vagas}', className='card-title')
-    ]
+# --- Configuração de cada aba de análise ---
+# As abas têm a mesma estrutura; muda apenas a coluna de status usada no
+# filtro específico, no gráfico de barras e no rótulo do Top N. O sufixo
+# identifica os componentes da aba (ex.: 'kpi-total-vagas-interno').
+TABS = {
+    'tab-status-vaga': {
+        'suffix': '',
+        'filtro_status': 'filtro-status',
+        'render_state': 'render-state-status-vaga',
+        'agregado': 'agregado-status-vaga',
+        'status_col': 'Status da Vaga',
+        'titulo_status': 'Quantidade de Vagas por Status',
+        'rotulo_status': False,
+    },
+    'tab-status-interno': {
+        'suffix': '-interno',
+        'filtro_status': 'filtro-status-interno',
+        'render_state': 'render-state-status-interno',
+        'agregado': 'agregado-status-interno',
+        'status_col': 'STATUS',
+        'titulo_status': 'Quantidade de Vagas por STATUS Interno',
+        'rotulo_status': True,
+    },
+}
 
-    # Média de Dias em Aberto
-    media_dias_aberto = dff['Dias em Aberto'].mean()
-    kpi_dias_html = [
-        html.H6('Média de Dias em Aberto', className='card-subtitle'),
-        html.H4(f'{media_dias_aberto:.1f} dias', className='card-title')
-    ]
 
-    # Vagas Fora do SLA
-    vagas_fora_sla = dff[dff['Situação Vagas'] == 'Fora do SLA'].shape[0]
-    kpi_fora_sla_html = [
-        html.H6('Vagas Fora do SLA', className='card-subtitle'),
-        html.H4(f'{vagas_fora_sla}', className='card-title text-danger')
+def tab_outputs(tab, allow_duplicate=False):
+    """KPIs, gráficos e número de páginas do Top N de uma aba, na ordem usada pelos callbacks."""
+    suffix = TABS[tab]['suffix']
+    return [
+        Output(f'kpi-total-vagas{suffix}', 'children', allow_duplicate=allow_duplicate),
+        Output(f'kpi-dias-aberto{suffix}', 'children', allow_duplicate=allow_duplicate),
+        Output(f'kpi-fora-sla{suffix}', 'children', allow_duplicate=allow_duplicate),
+        Output(f'kpi-taxa-fora-sla{suffix}', 'children', allow_duplicate=allow_duplicate),
+        Output(f'grafico-vagas-status{suffix}', 'figure', allow_duplicate=allow_duplicate),
+        Output(f'grafico-vagas-motivo{suffix}', 'figure', allow_duplicate=allow_duplicate),
+        Output(f'grafico-top-vagas-aberto{suffix}', 'figure', allow_duplicate=allow_duplicate),
+        Output(f'top-pagina{suffix}', 'max_value', allow_duplicate=allow_duplicate),
     ]
 
-    # Taxa de Vagas Fora do SLA
-    if total_vagas > 0:
-        taxa_fora_sla = (vagas_fora_sla / total_vagas) * 100
-        kpi_taxa_sla_html = [
-            html.H6('Taxa Fora do SLA', className='card-subtitle'),
-            html.H4(f'{taxa_fora_sla:.2f}%', className='card-title text-danger')
-        ]
-    else:
-        kpi_taxa_sla_html = [
-            html.H6('Taxa Fora do SLA', className='card-subtitle'),
-            html.H4('N/A', className='card-title')
-        ]
 
-    # --- 3. Criacao dos Graficos ---
-
-    # Grafico de Vagas por Status (Barras)
-    vagas_por_status = dff['Status da Vaga'].value_counts().reset_index()
-    vagas_por_status.columns = ['Status da Vaga', 'Quantidade']
-    fig_status = px.bar(
-        vagas_por_status.sort_values(by='Quantidade', ascending=True),
-        x='Quantidade',
-        y='Status da Vaga',
-        title='Quantidade de Vagas por Status',
-        orientation='h',
-        text='Quantidade'
-    )
-    fig_status.update_layout(
-        yaxis_title=None, 
-        xaxis_title='Quantidade de Vagas',
-        paper_bgcolor='rgba(0,0,0,0)', # Fundo transparente
-        plot_bgcolor='rgba(0,0,0,0)', # Fundo transparente
-        font=dict(color='white') # Cor da fonte
-    )
-    fig_status.update_traces(textposition='outside')
-
-    # Grafico de Vagas por Motivo (Rosca)
-    vagas_por_motivo = dff['Descrição do Motivo'].value_counts().reset_index()
-    vagas_por_motivo.columns = ['Descrição do Motivo', 'Quantidade']
-    fig_motivo = px.pie(
-        vagas_por_motivo,
-        names='Descrição do Motivo',
-        values='Quantidade',
-        title='Distribuição por Motivo',
-        hole=.4
-    )
-    fig_motivo.update_traces(insidetextfont_color='white', insidetextfont_size=14, textfont_size=12)
-    fig_motivo.update_layout(
-        paper_bgcolor='rgba(0,0,0,0)',
-        plot_bgcolor='rgba(0,0,0,0)',
-        font=dict(color='white'),
-        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
-    )
-    
-    # Grafico de Top 15 Vagas com Mais Tempo em Aberto
-    df_abertas = dff[dff['Status da Vaga'] != 'Finalizado - Vaga Preenchida']
-    df_top_abertas = df_abertas.sort_values(by='Dias em Aberto', ascending=False).head(15)
-    
-    # Criando um rótulo mais informativo para o eixo Y
-    df_top_abertas['Label'] = df_top_abertas['Código da Vaga'].astype(str) + " (" + df_top_abertas['Título do Cargo'] + ")"
-
-    fig_top_vagas = px.bar(
-        df_top_abertas.sort_values(by='Dias em Aberto', ascending=True),
-        y='Label',
-        x='Dias em Aberto',
-        title='Top 15 Vagas com Mais Tempo em Aberto',
-        text='Dias em Aberto',
-        orientation='h'
-    )
-    fig_top_vagas.update_layout(
-        height=600, # Define uma altura fixa para o gráfico
-        yaxis_title=None,
-        xaxis_title='Dias em Aberto',
-        yaxis=dict(tickfont=dict(size=10)), # Diminui o tamanho da fonte para caber mais texto
-        paper_bgcolor='rgba(0,0,0,0)',
-        plot_bgcolor='rgba(0,0,0,0)',
-        font=dict(color='white')
-    )
-    fig_top_vagas.update_traces(textposition='outside')
-    
-    return kpi_vagas_html, kpi_dias_html, kpi_fora_sla_html, kpi_taxa_sla_html, fig_status, fig_motivo, fig_top_vagas
+def tab_callback_args(tab):
+    """Outputs, Inputs e State do callback de uma aba, a partir da configuração.
 
-
-# --- Callback para a ABA 2: STATUS Interno (Nova) ---
-@app.callback(
-    [
-        Output('kpi-total-vagas-interno', 'children'),
-        Output('kpi-dias-aberto-interno', 'children'),
-        Output('kpi-fora-sla-interno', 'children'),
-        Output('kpi-taxa-fora-sla-interno', 'children'),
-        Output('grafico-vagas-status-interno', 'figure'),
-        Output('grafico-vagas-motivo-interno', 'figure'),
-        Output('grafico-top-vagas-aberto-interno', 'figure')
-    ],
-    [
+    O checklist de status é só State: mudanças nele são tratadas no navegador
+    a partir do agregado por status (ver assets/dashboard.js).
+    """
+    config = TABS[tab]
+    outputs = tab_outputs(tab) + [
+        Output(config['render_state'], 'data'),
+        Output(config['agregado'], 'data'),
+    ]
+    inputs = [
         Input('filtro-data', 'start_date'),
         Input('filtro-data', 'end_date'),
-        Input('filtro-status-interno', 'value'), # Filtro específico desta aba
         Input('filtro-grupo', 'value'),
         Input('filtro-uf', 'value'),
-        Input('data-update-signal', 'data') # Input para o sinal de atualização
+        Input({'type': 'filtro-busca', 'col': ALL}, 'value'), # Na ordem de TYPEAHEAD_COLUMNS
+        Input('busca-texto', 'value'), # Busca textual
+        Input('data-update-signal', 'data'), # Input para o sinal de atualização
+        Input('tabs-principal', 'value'), # Só a aba visível é calculada
+        Input(f"top-n{config['suffix']}", 'value'), # Vagas por página do Top N
+        Input(f"top-pagina{config['suffix']}", 'active_page'),
     ]
-)
-def update_dashboard_status_interno(start_date, end_date, selected_status, selected_grupos, selected_ufs, update_signal):
-    # --- 1. Filtragem dos Dados ---
-    # Recarrega os dados sempre que a função for chamada
-    df = load_data()
-
-    start_date_obj = date.fromisoformat(start_date)
-    end_date_obj = date.fromisoformat(end_date)
-    
-    dff = df[(df['Recrutamento e Seleção'].dt.date >= start_date_obj) & (df['Recrutamento e Seleção'].dt.date <= end_date_obj)]
-    
-    if selected_status:
-        dff = dff[dff['STATUS'].isin(selected_status)] # << MUDANÇA AQUI
-    if selected_grupos:
-        dff = dff[dff['Grupo Econômico'].isin(selected_grupos)]
-    if selected_ufs:
-        dff = dff[dff['UF da OI'].isin(selected_ufs)]
-
-    # --- 2. Calculo dos KPIs (lógica idêntica, mas aplicada aos dados filtrados) ---
-    if dff.empty or not selected_status:
-        empty_fig = go.Figure()
-        empty_fig.update_layout(
-            xaxis={"visible": False}, yaxis={"visible": False},
-            annotations=[{"text": "Sem dados para os filtros selecionados", "xref": "paper", "yref": "paper", "showarrow": False, "font": {"size": 16}}]
-        )
-        kpi_vagas_html = [html.H6('Total de Vagas', className='card-subtitle'), html.H4('0', className='card-title')]
-        kpi_dias_html = [html.H6('Média de Dias em Aberto', className='card-subtitle'), html.H4('N/A', className='card-title')]
-        kpi_fora_sla_html = [html.H6('Vagas Fora do SLA', className='card-subtitle'), html.H4('0', className='card-title text-danger')]
-        kpi_taxa_sla_html = [html.H6('Taxa Fora do SLA', className='card-subtitle'), html.H4('N/A', className='card-title')]
-        return kpi_vagas_html, kpi_dias_html, kpi_fora_sla_html, kpi_taxa_sla_html, empty_fig, empty_fig, empty_fig
-
-    total_vagas = len(dff)
-    kpi_vagas_html = [
-        html.H6('Total de Vagas', className='card-subtitle'),
-        html.H4(f'{total_vagas}', className='card-title')
+    state = [
+        State(config['filtro_status'], 'value'), # Filtro específico desta aba
+        State(config['render_state'], 'data'), # Versão e filtros já renderizados
     ]
+    return outputs, inputs, state
 
-    media_dias_aberto = dff['Dias em Aberto'].mean()
-    kpi_dias_html = [
-        html.H6('Média de Dias em Aberto', className='card-subtitle'),
-        html.H4(f'{media_dias_aberto:.1f} dias', className='card-title')
-    ]
 
-    vagas_fora_sla = dff[dff['Situação Vagas'] == 'Fora do SLA'].shape[0]
-    kpi_fora_sla_html = [
-        html.H6('Vagas Fora do SLA', className='card-subtitle'),
-        html.H4(f'{vagas_fora_sla}', className='card-title text-danger')
+def kpi_values(resumo, vazio):
+    """Título, valor e classe de cada um dos quatro KPIs."""
+    if vazio:
+        return [
+            ('Total de Vagas', '0', 'card-title'),
+            ('Média de Dias em Aberto', 'N/A', 'card-title'),
+            ('Vagas Fora do SLA', '0', 'card-title text-danger'),
+            ('Taxa Fora do SLA', 'N/A', 'card-title'),
+        ]
+
+    total_vagas = resumo['total']
+    media_dias_aberto = resumo['sum_dias'] / resumo['n_dias'] if resumo['n_dias'] else float('nan')
+    vagas_fora_sla = resumo['fora_sla']
+    taxa_fora_sla = (vagas_fora_sla / total_vagas) * 100
+    return [
+        ('Total de Vagas', f'{total_vagas}', 'card-title'),
+        ('Média de Dias em Aberto', f'{media_dias_aberto:.1f} dias', 'card-title'),
+        ('Vagas Fora do SLA', f'{vagas_fora_sla}', 'card-title text-danger'),
+        ('Taxa Fora do SLA', f'{taxa_fora_sla:.2f}%', 'card-title text-danger'),
     ]
 
-    if total_vagas > 0:
-        taxa_fora_sla = (vagas_fora_sla / total_vagas) * 100
-        kpi_taxa_sla_html = [
-            html.H6('Taxa Fora do SLA', className='card-subtitle'),
-            html.H4(f'{taxa_fora_sla:.2f}%', className='card-title text-danger')
-        ]
+
+def kpi_children(titulo, valor, classe):
+    """Conteúdo completo do card de um KPI."""
+    return [html.H6(titulo, className='card-subtitle'), html.H4(valor, className=classe)]
+
+
+def kpi_patch(valor, classe):
+    """Atualização parcial do card de um KPI: só o valor e sua classe."""
+    patch = Patch()
+    patch[1]['props']['children'] = valor
+    patch[1]['props']['className'] = classe
+    return patch
+
+
+def render_dashboard(tab, start_date, end_date, selected_grupos, selected_ufs, selected_busca, texto_busca, update_signal, active_tab, top_n, top_pagina, selected_status, render_state):
+    """Calcula KPIs e gráficos de uma aba a partir do motor de consulta.
+
+    Abas ocultas não são calculadas: ficam desatualizadas até serem abertas.
+    Se o navegador já tem as figuras completas desta versão dos dados
+    (`render_state`), envia apenas atualizações parciais (dash.Patch).
+    Junto vai o agregado por status usado pelo filtro no navegador.
+    """
+    if tab != active_tab:
+        raise dash.exceptions.PreventUpdate
+
+    config = TABS[tab]
+    status_col = config['status_col']
+    render_state = render_state or {}
+
+    # --- 1. Filtragem dos Dados ---
+    # O motor de consulta reaproveita os filtros gerais entre as abas e guarda
+    # os resultados em cache (por versão dos dados + filtros)
+    filtros = {
+        status_col: selected_status,
+        'Grupo Econômico': selected_grupos,
+        'UF da OI': selected_ufs,
+        **dict(zip(TYPEAHEAD_COLUMNS, selected_busca or [])),
+    }
+    # Página do Top N: fora do alcance (ex.: após filtrar) volta para a última
+    top_n = top_n or TOP_N
+    top_offset = ((top_pagina or 1) - 1) * top_n
+    resumo = query_dashboard(start_date, end_date, filtros, status_col, update_signal, top_n, top_offset, texto_busca)
+    paginas = max(1, -(-resumo['top']['total'] // top_n))
+    if top_offset >= paginas * top_n:
+        top_offset = (paginas - 1) * top_n
+        resumo = query_dashboard(start_date, end_date, filtros, status_col, update_signal, top_n, top_offset, texto_busca)
+    version = resumo['key'][0]
+    query = query_digest(resumo['key'])
+    vazio = resumo['total'] == 0 or not selected_status
+
+    # Aba reaberta sem mudança de filtros ou de dados: nada a enviar
+    if render_state.get('query') == query:
+        raise dash.exceptions.PreventUpdate
+
+    # --- 2. Calculo dos KPIs ---
+    kpis = kpi_values(resumo, vazio)
+
+    # --- 3. Dados dos Graficos ---
+    # Arrays montados uma vez por consulta e guardados em cache
+    if vazio:
+        dados = {kind: empty_data(kind) for kind in ('status', 'motivo', 'top')}
     else:
-        kpi_taxa_sla_html = [
-            html.H6('Taxa Fora do SLA', className='card-subtitle'),
-            html.H4('N/A', className='card-title')
+        dados = cached_figures((tab,) + resumo['key'], lambda: {
+            'status': status_bar_data(resumo['by_status']),
+            'motivo': motivo_donut_data(resumo['by_motivo']),
+            'top': top_vagas_data(resumo['top'], with_status=config['rotulo_status']),
+        })
+
+    # Agregado por status para os filtros gerais (usado pelo checklist no navegador)
+    # (com as vagas abertas até o fim da página atual do Top N)
+    # (com a seleção do checklist usada aqui: se ela mudou nesse meio tempo, o navegador recombina)
+    agregado = {
+        **status_breakdown(start_date, end_date, filtros, status_col, config['rotulo_status'], top_offset + top_n, update_signal, texto_busca),
+        'selecionados': selected_status or [],
+    }
+
+    # --- 4. Resposta: completa na primeira vez, parcial nas seguintes ---
+    new_state = {'version': version, 'query': query}
+    if render_state.get('version') != version:
+        kpi_outputs = [kpi_children(*kpi) for kpi in kpis]
+        fig_outputs = [
+            full_figure('status', dados['status'], vazio, config['titulo_status']),
+            full_figure('motivo', dados['motivo'], vazio),
+            full_figure('top', dados['top'], vazio, top_vagas_title(top_n, top_offset)),
         ]
+        return (*kpi_outputs, *fig_outputs, paginas, new_state, agregado)
 
-    # --- 3. Criacao dos Graficos ---
-
-    # Grafico de Vagas por Status (Barras) - USANDO A COLUNA 'STATUS'
-    vagas_por_status = dff['STATUS'].value_counts().reset_index() # << MUDANÇA AQUI
-    vagas_por_status.columns = ['STATUS', 'Quantidade']
-    fig_status = px.bar(
-        vagas_por_status.sort_values(by='Quantidade', ascending=True),
-        x='Quantidade',
-        y='STATUS', # << MUDANÇA AQUI
-        title='Quantidade de Vagas por STATUS Interno', # << MUDANÇA AQUI
-        orientation='h',
-        text='Quantidade'
-    )
-    fig_status.update_layout(
-        yaxis_title=None, 
-        xaxis_title='Quantidade de Vagas',
-        paper_bgcolor='rgba(0,0,0,0)',
-        plot_bgcolor='rgba(0,0,0,0)',
-        font=dict(color='white')
-    )
-    fig_status.update_traces(textposition='outside')
-
-    # Grafico de Vagas por Motivo (Rosca) - Lógica idêntica
-    vagas_por_motivo = dff['Descrição do Motivo'].value_counts().reset_index()
-    vagas_por_motivo.columns = ['Descrição do Motivo', 'Quantidade']
-    fig_motivo = px.pie(
-        vagas_por_motivo,
-        names='Descrição do Motivo',
-        values='Quantidade',
-        title='Distribuição por Motivo',
-        hole=.4
-    )
-    fig_motivo.update_traces(insidetextfont_color='white', insidetextfont_size=14, textfont_size=12)
-    fig_motivo.update_layout(
-        paper_bgcolor='rgba(0,0,0,0)',
-        plot_bgcolor='rgba(0,0,0,0)',
-        font=dict(color='white'),
-        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
-    )
-    
-    # Grafico de Top 15 Vagas com Mais Tempo em Aberto - Lógica idêntica
-    df_abertas = dff[dff['Status da Vaga'] != 'Finalizado - Vaga Preenchida']
-    df_top_abertas = df_abertas.sort_values(by='Dias em Aberto', ascending=False).head(15)
-    
-    df_top_abertas['Label'] = df_top_abertas['Código da Vaga'].astype(str) + " [" + df_top_abertas['STATUS'] + "] (" + df_top_abertas['Título do Cargo'] + ")"
-
-    fig_top_vagas = px.bar(
-        df_top_abertas.sort_values(by='Dias em Aberto', ascending=True),
-        y='Label',
-        x='Dias em Aberto',
-        title='Top 15 Vagas com Mais Tempo em Aberto',
-        text='Dias em Aberto',
-        orientation='h'
-    )
-    fig_top_vagas.update_layout(
-        height=600,
-        yaxis_title=None,
-        xaxis_title='Dias em Aberto',
-        yaxis=dict(tickfont=dict(size=10)),
-        paper_bgcolor='rgba(0,0,0,0)',
-        plot_bgcolor='rgba(0,0,0,0)',
-        font=dict(color='white')
+    kpi_outputs = [kpi_patch(valor, classe) for _, valor, classe in kpis]
+    fig_outputs = [
+        patch_figure('status', dados['status'], vazio),
+        patch_figure('motivo', dados['motivo'], vazio),
+        patch_figure('top', dados['top'], vazio, top_vagas_title(top_n, top_offset)),
+    ]
+    return (*kpi_outputs, *fig_outputs, paginas, new_state, agregado)
+
+
+# --- Callback para a ABA 1: Status da Vaga (Original) ---
+@app.callback(*tab_callback_args('tab-status-vaga'))
+def update_dashboard_status_vaga(start_date, end_date, selected_grupos, selected_ufs, selected_busca, texto_busca, update_signal, active_tab, top_n, top_pagina, selected_status, render_state):
+    return render_dashboard('tab-status-vaga', start_date, end_date, selected_grupos, selected_ufs, selected_busca, texto_busca, update_signal, active_tab, top_n, top_pagina, selected_status, render_state)
+
+
+# --- Callback para a ABA 2: STATUS Interno (Nova) ---
+@app.callback(*tab_callback_args('tab-status-interno'))
+def update_dashboard_status_interno(start_date, end_date, selected_grupos, selected_ufs, selected_busca, texto_busca, update_signal, active_tab, top_n, top_pagina, selected_status, render_state):
+    return render_dashboard('tab-status-interno', start_date, end_date, selected_grupos, selected_ufs, selected_busca, texto_busca, update_signal, active_tab, top_n, top_pagina, selected_status, render_state)
+
+
+# --- Filtro de status no navegador (as duas abas) ---
+# Marcar/desmarcar status recombina o agregado já enviado pelo servidor:
+# KPIs e gráficos são recalculados em assets/dashboard.js. A seleção do
+# checklist só é montada em um lugar (o clique ou atualizar_opcoes); um
+# agregado novo também dispara a recombinação, que não faz nada se a
+# seleção ainda for a usada pelo servidor. Assim os status marcados após um
+# upload entram nos gráficos mesmo que a aba tenha sido calculada com a
+# seleção anterior.
+for tab, config in TABS.items():
+    app.clientside_callback(
+        ClientsideFunction(namespace='dashboard', function_name='filtrarStatus'),
+        tab_outputs(tab, allow_duplicate=True),
+        Input(config['filtro_status'], 'value'),
+        Input(config['agregado'], 'data'),
+        State(f"grafico-vagas-status{config['suffix']}", 'figure'),
+        State(f"grafico-vagas-motivo{config['suffix']}", 'figure'),
+        State(f"grafico-top-vagas-aberto{config['suffix']}", 'figure'),
+        State(f"top-n{config['suffix']}", 'value'),
+        State(f"top-pagina{config['suffix']}", 'active_page'),
+        prevent_initial_call=True
     )
-    fig_top_vagas.update_traces(textposition='outside')
-    
-    return kpi_vagas_html, kpi_dias_html, kpi_fora_sla_html, kpi_taxa_sla_html, fig_status, fig_motivo, fig_top_vagas
+
+
+# --- Callback para a ABA 3: Tendência ---
+@app.callback(
+    Output('grafico-tendencia-fluxo', 'figure'),
+    Output('grafico-tendencia-sla', 'figure'),
+    Input('filtro-data', 'start_date'),
+    Input('filtro-data', 'end_date'),
+    Input('filtro-grupo', 'value'),
+    Input('filtro-uf', 'value'),
+    Input('data-update-signal', 'data'),
+    Input('tabs-principal', 'value'), # Só calcula com a aba visível
+    Input('tendencia-periodo', 'value'),
+    Input('tendencia-quebra', 'value'),
+)
+def update_tendencia(start_date, end_date, selected_grupos, selected_ufs, update_signal, active_tab, periodo, quebra):
+    if active_tab != 'tab-tendencia':
+        raise dash.exceptions.PreventUpdate
+    filtros = {'Grupo Econômico': selected_grupos, 'UF da OI': selected_ufs}
+    tendencia = query_trend(start_date, end_date, filtros, periodo, quebra or None, update_signal)
+    return trend_flow_figure(tendencia), trend_rate_figure(tendencia)
 
 
 # =====================================================================
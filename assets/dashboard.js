@@ -0,0 +1,155 @@
+/*
+ * Callbacks executados no navegador (clientside_callback).
+ *
+ * O servidor envia, para os filtros gerais atuais, um agregado compacto por
+ * status (ver engine.status_breakdown). Marcar/desmarcar status no checklist
+ * apenas recombina esse agregado aqui, sem nenhuma requisição ao servidor.
+ * Um agregado novo também é recombinado quando o checklist já mudou desde a
+ * consulta do servidor (ex.: status novos marcados após um upload).
+ */
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    dashboard: (function () {
+        var AVISO_VAZIO = {
+            text: 'Sem dados para os filtros selecionados',
+            xref: 'paper', yref: 'paper', showarrow: false, font: {size: 16}
+        };
+        var TOP_N = 15;
+
+        // Mesmo título de figures.top_vagas_title
+        function tituloTop(n, inicio) {
+            if (inicio === 0) {
+                return 'Top ' + n + ' Vagas com Mais Tempo em Aberto';
+            }
+            return 'Vagas com Mais Tempo em Aberto (' + (inicio + 1) + 'ª a ' + (inicio + n) + 'ª)';
+        }
+
+        function kpi(titulo, valor, classe) {
+            return [
+                {namespace: 'dash_html_components', type: 'H6', props: {children: titulo, className: 'card-subtitle'}},
+                {namespace: 'dash_html_components', type: 'H4', props: {children: valor, className: classe}}
+            ];
+        }
+
+        // Nova figura a partir da atual: troca só os arrays e o estado vazio
+        function atualizarFigura(figura, dados, vazio, eixos, titulo) {
+            var layout = Object.assign({}, figura.layout, {annotations: vazio ? [AVISO_VAZIO] : []});
+            if (titulo) {
+                layout.title = {text: titulo};
+            }
+            if (eixos) {
+                layout.xaxis = Object.assign({}, layout.xaxis, {visible: !vazio});
+                layout.yaxis = Object.assign({}, layout.yaxis, {visible: !vazio});
+            }
+            return Object.assign({}, figura, {
+                data: [Object.assign({}, figura.data[0], dados)],
+                layout: layout
+            });
+        }
+
+        return {
+            filtrarStatus: function (selecionados, agregado, figStatus, figMotivo, figTop, topN, pagina) {
+                var semFiguras = !figStatus || !figStatus.data || !figMotivo || !figMotivo.data || !figTop || !figTop.data;
+                if (!agregado || semFiguras) {
+                    return window.dash_clientside.no_update;
+                }
+
+                var marcados = {};
+                (selecionados || []).forEach(function (s) { marcados[s] = true; });
+
+                // Agregado recém-chegado com a mesma seleção da consulta: o servidor já renderizou
+                var ctx = window.dash_clientside.callback_context;
+                var novoAgregado = ctx.triggered.some(function (t) { return t.prop_id.indexOf('agregado-') === 0; });
+                var consultados = agregado.selecionados || [];
+                var mesmaSelecao = consultados.length === Object.keys(marcados).length &&
+                    consultados.every(function (s) { return marcados[s]; });
+                if (novoAgregado && mesmaSelecao) {
+                    return window.dash_clientside.no_update;
+                }
+
+                var total = 0, somaDias = 0, nDias = 0, foraSla = 0, abertas = 0;
+                var barras = [], motivos = {}, top = [];
+                agregado.status.forEach(function (status, i) {
+                    if (!marcados[status]) {
+                        return;
+                    }
+                    total += agregado.count[i];
+                    somaDias += agregado.sum_dias[i];
+                    nDias += agregado.n_dias[i];
+                    foraSla += agregado.fora_sla[i];
+                    abertas += agregado.abertas[i];
+                    barras.push([status, agregado.count[i]]);
+                    agregado.motivo_counts[i].forEach(function (par) {
+                        motivos[par[0]] = (motivos[par[0]] || 0) + par[1];
+                    });
+                    top = top.concat(agregado.top[i]);
+                });
+
+                var vazio = total === 0 || !selecionados || selecionados.length === 0;
+                var kpis;
+                if (vazio) {
+                    kpis = [
+                        kpi('Total de Vagas', '0', 'card-title'),
+                        kpi('Média de Dias em Aberto', 'N/A', 'card-title'),
+                        kpi('Vagas Fora do SLA', '0', 'card-title text-danger'),
+                        kpi('Taxa Fora do SLA', 'N/A', 'card-title')
+                    ];
+                    barras = [];
+                    motivos = {};
+                    top = [];
+                } else {
+                    kpis = [
+                        kpi('Total de Vagas', String(total), 'card-title'),
+                        kpi('Média de Dias em Aberto', (nDias ? somaDias / nDias : NaN).toFixed(1) + ' dias', 'card-title'),
+                        kpi('Vagas Fora do SLA', String(foraSla), 'card-title text-danger'),
+                        kpi('Taxa Fora do SLA', (foraSla / total * 100).toFixed(2) + '%', 'card-title text-danger')
+                    ];
+                }
+
+                // Barras: menor quantidade embaixo
+                barras.sort(function (a, b) { return a[1] - b[1]; });
+                var quantidades = barras.map(function (b) { return b[1]; });
+
+                // Rosca: motivos em ordem decrescente
+                var fatias = Object.keys(motivos).map(function (m) { return [agregado.motivos[m], motivos[m]]; });
+                fatias.sort(function (a, b) { return b[1] - a[1]; });
+
+                // Top N: junta os tops de cada status na ordem global das vagas abertas
+                // e recorta a página atual (a última, se a seleção tiver menos páginas)
+                var n = topN || TOP_N;
+                var paginas = Math.max(1, Math.ceil(abertas / n));
+                var inicio = (Math.min(pagina || 1, paginas) - 1) * n;
+                top.sort(function (a, b) { return a[0] - b[0]; });
+                top = top.slice(inicio, inicio + n).reverse();
+                var dias = top.map(function (t) { return t[1]; });
+
+                return kpis.concat([
+                    atualizarFigura(figStatus, {
+                        x: quantidades, y: barras.map(function (b) { return b[0]; }), text: quantidades
+                    }, vazio, true),
+                    atualizarFigura(figMotivo, {
+                        labels: fatias.map(function (f) { return f[0]; }), values: fatias.map(function (f) { return f[1]; })
+                    }, vazio, false),
+                    atualizarFigura(figTop, {
+                        x: dias, y: top.map(function (t) { return t[2]; }), text: dias
+                    }, vazio, true, tituloTop(n, inicio)),
+                    paginas
+                ]);
+            },
+
+            selecionarTodos: function (selectAll, clearAll, opcoes) {
+                var ctx = window.dash_clientside.callback_context;
+                if (!ctx.triggered.length) {
+                    return window.dash_clientside.no_update;
+                }
+                if (ctx.triggered[0].prop_id.indexOf('-clear-all.') !== -1) {
+                    return [];
+                }
+                return (opcoes || []).map(function (o) { return o.value; });
+            },
+
+            alternarCollapse: function (n, aberto) {
+                return n ? !aberto : aberto;
+            }
+        };
+    })()
+});
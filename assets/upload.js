@@ -0,0 +1,202 @@
+/*
+ * Upload do CSV (ou da planilha .xlsx exportada) em partes pela rota
+ * /upload/csv (ver uploads.py).
+ *
+ * O arquivo é lido do disco em fatias (Blob.slice) e cada fatia vai como
+ * multipart, sem base64 e sem passar pelo payload dos callbacks. Um envio
+ * interrompido é retomado do ponto em que o servidor parou: o id do upload
+ * fica no sessionStorage, chaveado por nome, tamanho e data do arquivo.
+ * Recebido o arquivo, a ingestão roda em segundo plano no servidor; as
+ * etapas são consultadas e mostradas até a publicação da nova versão, e só
+ * então o 'data-update-signal' é disparado com dash_clientside.set_props.
+ * No modo 'merge' o arquivo só traz vagas novas ou alteradas, mescladas à
+ * base atual pela chave da vaga.
+ */
+(function () {
+    var TENTATIVAS = 3;
+    var INTERVALO_PROGRESSO = 500; // ms entre consultas ao progresso da ingestão
+    var ESPERA_MAXIMA = 30 * 60 * 1000; // ms de espera pela ingestão antes de desistir
+    var EXTENSOES = ['.csv', '.xlsx'];
+
+    function mensagem(texto, cor) {
+        window.dash_clientside.set_props('output-data-upload', {
+            children: {
+                namespace: 'dash_bootstrap_components', type: 'Alert',
+                props: {children: texto, color: cor, dismissable: cor !== 'info'}
+            }
+        });
+    }
+
+    function requisicao(metodo, url, corpo) {
+        var opcoes = {method: metodo, credentials: 'same-origin'};
+        if (corpo instanceof FormData) {
+            opcoes.body = corpo;
+        } else if (corpo) {
+            opcoes.body = JSON.stringify(corpo);
+            opcoes.headers = {'Content-Type': 'application/json'};
+        }
+        return fetch(url, opcoes).then(function (resposta) {
+            return resposta.json().catch(function () { return {}; }).then(function (dados) {
+                dados.status = resposta.status;
+                return dados;
+            });
+        });
+    }
+
+    // Lista das etapas da ingestão: concluídas, atual e pendentes
+    function progresso(nome, job) {
+        var etapas = job.stages.map(function (etapa) {
+            var feita = job.done.indexOf(etapa) !== -1;
+            return (feita ? '\u2713 ' : '\u2026 ') + job.labels[etapa];
+        });
+        return nome + ': ' + job.message + ' (' + etapas.join(' \u2192 ') + ')';
+    }
+
+    // Consulta o progresso até o fim da ingestão, um erro ou ESPERA_MAXIMA
+    function acompanhar(nome, id, consultas) {
+        consultas = consultas || 0;
+        if (consultas * INTERVALO_PROGRESSO >= ESPERA_MAXIMA) {
+            return Promise.reject(new Error(
+                'O processamento de ' + nome + ' não terminou a tempo. Verifique os dados mais tarde ou envie o arquivo novamente.'
+            ));
+        }
+        return new Promise(function (resolve) {
+            window.setTimeout(resolve, INTERVALO_PROGRESSO);
+        }).then(function () {
+            return requisicao('GET', '/upload/csv/' + id + '/ingestion');
+        }).then(function (job) {
+            if (job.status !== 200) {
+                throw new Error(job.error || 'Falha ao consultar o processamento.');
+            }
+            if (job.error) {
+                throw new Error(job.error);
+            }
+            if (job.finished) {
+                return job;
+            }
+            mensagem(progresso(nome, job), 'info');
+            return acompanhar(nome, id, consultas + 1);
+        });
+    }
+
+    function modoSelecionado() {
+        var marcado = document.querySelector('#upload-modo input:checked');
+        return marcado ? marcado.value : 'replace';
+    }
+
+    function chaveRetomada(arquivo, modo) {
+        return 'upload-csv:' + [modo, arquivo.name, arquivo.size, arquivo.lastModified].join(':');
+    }
+
+    function resumo(nome, job) {
+        if (!job.summary) {
+            return "Arquivo '" + nome + "' atualizado com sucesso!";
+        }
+        return "Arquivo '" + nome + "' mesclado com sucesso: " + job.summary.inserted + ' vaga(s) nova(s), ' +
+            job.summary.updated + ' alterada(s), ' + job.summary.unchanged + ' sem alteração.';
+    }
+
+    // Retoma o upload anterior do mesmo arquivo ou começa um novo
+    function iniciar(arquivo, modo) {
+        var anterior = window.sessionStorage.getItem(chaveRetomada(arquivo, modo));
+        var novo = function () {
+            return requisicao('POST', '/upload/csv', {filename: arquivo.name, size: arquivo.size, mode: modo});
+        };
+        if (!anterior) {
+            return novo();
+        }
+        return requisicao('GET', '/upload/csv/' + anterior).then(function (estado) {
+            return estado.status === 200 ? estado : novo();
+        });
+    }
+
+    function enviarPartes(arquivo, estado, tentativas) {
+        if (estado.received >= arquivo.size) {
+            return Promise.resolve(estado);
+        }
+        var fim = Math.min(estado.received + estado.chunk_size, arquivo.size);
+        var corpo = new FormData();
+        corpo.append('offset', estado.received);
+        corpo.append('chunk', arquivo.slice(estado.received, fim), arquivo.name);
+        mensagem('Enviando ' + arquivo.name + ': ' + Math.floor(estado.received / arquivo.size * 100) + '%', 'info');
+
+        return requisicao('POST', '/upload/csv/' + estado.id + '/chunk', corpo).then(function (resposta) {
+            if (resposta.status === 200 || resposta.status === 409) {
+                // 409: o servidor já tinha outra posição; continua de onde ele parou
+                estado.received = resposta.received;
+                return enviarPartes(arquivo, estado, TENTATIVAS);
+            }
+            throw new Error(resposta.error || 'Falha no envio.');
+        }, function (erro) {
+            // Falha de rede: tenta de novo a mesma parte
+            if (tentativas <= 1) {
+                throw erro;
+            }
+            return enviarPartes(arquivo, estado, tentativas - 1);
+        });
+    }
+
+    function enviar(arquivo) {
+        if (!arquivo) {
+            return;
+        }
+        var nome = arquivo.name.toLowerCase();
+        var aceito = EXTENSOES.some(function (ext) { return nome.slice(-ext.length) === ext; });
+        if (!aceito) {
+            mensagem('Erro: O arquivo deve ser no formato .csv ou .xlsx', 'danger');
+            return;
+        }
+        var modo = modoSelecionado();
+        iniciar(arquivo, modo).then(function (estado) {
+            if (estado.status !== 200) {
+                throw new Error(estado.error || 'Falha ao iniciar o envio.');
+            }
+            window.sessionStorage.setItem(chaveRetomada(arquivo, modo), estado.id);
+            return enviarPartes(arquivo, estado, TENTATIVAS);
+        }).then(function (estado) {
+            return requisicao('POST', '/upload/csv/' + estado.id + '/finish');
+        }).then(function (job) {
+            window.sessionStorage.removeItem(chaveRetomada(arquivo, modo));
+            // 409: a ingestão já tinha sido iniciada (envio repetido); acompanha a mesma
+            if (job.status !== 202 && job.status !== 409) {
+                throw new Error(job.error || 'Falha ao processar o arquivo.');
+            }
+            mensagem(progresso(arquivo.name, job), 'info');
+            return acompanhar(arquivo.name, job.id);
+        }).then(function (job) {
+            mensagem(resumo(arquivo.name, job), 'success');
+            // Só depois da troca atômica da base: os dashboards recarregam os dados
+            window.dash_clientside.set_props('data-update-signal', {data: job.version});
+        }).catch(function (erro) {
+            mensagem(erro.message, 'danger');
+        });
+    }
+
+    function areaDeUpload(alvo) {
+        return alvo && alvo.closest ? alvo.closest('#upload-data') : null;
+    }
+
+    // A área de upload só existe depois do login: os eventos ficam no documento
+    document.addEventListener('click', function (evento) {
+        if (!areaDeUpload(evento.target)) {
+            return;
+        }
+        evento.preventDefault();
+        var seletor = document.createElement('input');
+        seletor.type = 'file';
+        seletor.accept = EXTENSOES.join(',');
+        seletor.addEventListener('change', function () { enviar(seletor.files[0]); });
+        seletor.click();
+    });
+    document.addEventListener('dragover', function (evento) {
+        if (areaDeUpload(evento.target)) {
+            evento.preventDefault();
+        }
+    });
+    document.addEventListener('drop', function (evento) {
+        if (areaDeUpload(evento.target)) {
+            evento.preventDefault();
+            enviar(evento.dataTransfer.files[0]);
+        }
+    });
+})();
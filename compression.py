@@ -0,0 +1,131 @@
+import gzip
+import hashlib
+
+import flask
+
+try:
+    import brotli
+except ImportError: # sem brotli: só gzip
+    brotli = None
+
+from engine import LRUCache
+
+
+# Respostas menores que isso não compensam a compressão (bytes)
+MIN_COMPRESS_BYTES = 500
+
+# Níveis de compressão: respostas dinâmicas (por requisição) e arquivos estáticos (comprimidos uma vez)
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+STATIC_GZIP_LEVEL = 9
+STATIC_BROTLI_QUALITY = 9
+
+# Tipos de conteúdo comprimidos
+COMPRESSIBLE_TYPES = ('application/json', 'application/javascript', 'text/')
+
+# Rotas do Dash: respostas dinâmicas, respostas GET revalidadas por ETag e arquivos estáticos
+DYNAMIC_PATHS = ('/_dash-update-component', '/_dash-layout', '/_dash-dependencies')
+ETAG_PATHS = ('/_dash-layout', '/_dash-dependencies')
+STATIC_PREFIX = '/_dash-component-suites/'
+
+# Arquivos estáticos já comprimidos (plotly.js e afins), por caminho, ETag e codificação
+STATIC_CACHE_MAX_ENTRIES = 64
+STATIC_CACHE_MAX_BYTES = 32 * 1024 * 1024
+
+
+# =====================================================================
+# COMPRESSÃO DAS RESPOSTAS (BROTLI OU GZIP)
+# =====================================================================
+# As respostas dos callbacks (figuras completas em JSON), o layout e os
+# scripts dos componentes saem comprimidos quando o navegador aceita:
+# brotli se o pacote estiver instalado, senão gzip (biblioteca padrão).
+# Os scripts estáticos não mudam entre requisições e são comprimidos uma
+# única vez, num nível mais alto; as respostas dinâmicas usam um nível
+# mais rápido.
+_static_cache = LRUCache(STATIC_CACHE_MAX_ENTRIES, STATIC_CACHE_MAX_BYTES)
+
+
+def accepted_encoding(header):
+    """Melhor codificação aceita no Accept-Encoding ('br', 'gzip' ou None)."""
+    accepted = {}
+    for part in (header or '').split(','):
+        name, _, params = part.strip().partition(';')
+        q = 1.0
+        if params.strip().startswith('q='):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip().lower()] = q
+    for encoding in ('br', 'gzip') if brotli is not None else ('gzip',):
+        if accepted.get(encoding, accepted.get('*', 0)) > 0:
+            return encoding
+    return None
+
+
+def compress(data, encoding, static=False):
+    """Bytes comprimidos na codificação dada."""
+    if encoding == 'br':
+        return brotli.compress(data, quality=STATIC_BROTLI_QUALITY if static else BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=STATIC_GZIP_LEVEL if static else GZIP_LEVEL, mtime=0)
+
+
+def _compressible(response):
+    return (
+        response.status_code == 200
+        and 'Content-Encoding' not in response.headers
+        and response.mimetype.startswith(COMPRESSIBLE_TYPES)
+    )
+
+
+def _compress_response(response, static):
+    encoding = accepted_encoding(flask.request.headers.get('Accept-Encoding'))
+    response.vary.add('Accept-Encoding')
+    if encoding is None:
+        return response
+    response.direct_passthrough = False
+    data = response.get_data()
+    if len(data) < MIN_COMPRESS_BYTES:
+        return response
+    if static:
+        # O caminho (com a versão do pacote) e o ETag do Dash, se houver, identificam o conteúdo do arquivo
+        key = (flask.request.path, response.get_etag()[0], encoding)
+        body = _static_cache.get_or_compute(key, lambda: compress(data, encoding, static=True))
+    else:
+        body = compress(data, encoding)
+    # As métricas (ver metrics.py) medem a resposta serializada e a comprimida
+    flask.g.uncompressed_bytes = len(data)
+    response.set_data(body)
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
+# =====================================================================
+# ETAG E REVALIDAÇÃO (304) DAS RESPOSTAS GET DO DASH
+# =====================================================================
+# O layout e as dependências não mudam sem uma nova versão do app ou dos
+# dados. O ETag é o hash do conteúdo (o que a versão dos dados mudar no
+# layout muda o hash) e, com 'Cache-Control: no-cache', o navegador sempre
+# revalida: se nada mudou, recebe 304 sem corpo. O ETag é fraco porque a
+# mesma entidade pode sair comprimida ou não.
+def _revalidate(response):
+    if response.status_code != 200:
+        return response
+    response.set_etag(hashlib.blake2b(response.get_data(), digest_size=16).hexdigest(), weak=True)
+    response.cache_control.no_cache = True
+    return response.make_conditional(flask.request)
+
+
+def install_compression(server):
+    """Comprime as respostas do Dash e revalida as respostas GET por ETag no servidor Flask."""
+    @server.after_request
+    def _optimize_response(response):
+        path = flask.request.path
+        static = path.startswith(STATIC_PREFIX)
+        if not static and path not in DYNAMIC_PATHS:
+            return response
+        if path in ETAG_PATHS:
+            response = _revalidate(response)
+        if _compressible(response):
+            response = _compress_response(response, static)
+        return response
@@ -0,0 +1,107 @@
+import numpy as np
+import pandas as pd
+
+from indexes import DATE_COLUMN, FILTER_COLUMNS, build_filter_index
+
+
+# Dimensões do cubo, além do dia de 'Recrutamento e Seleção'
+CUBE_DIMENSIONS = ['Status da Vaga', 'STATUS', 'Grupo Econômico', 'UF da OI', 'Descrição do Motivo']
+
+# Medidas somadas em cada célula do cubo
+MEASURES = ['count', 'sum_dias', 'n_dias', 'fora_sla']
+
+
+# =====================================================================
+# CUBO PRÉ-AGREGADO PARA KPIs E GRÁFICOS DE CONTAGEM
+# =====================================================================
+# Uma linha por combinação observada de dia x dimensões, com as medidas:
+#   count    -> quantidade de vagas
+#   sum_dias -> soma de 'Dias em Aberto'
+#   n_dias   -> vagas com 'Dias em Aberto' preenchido (para a média)
+#   fora_sla -> vagas com 'Situação Vagas' == 'Fora do SLA'
+# O cubo é ordenado por dia, então usa o mesmo índice de filtros das linhas.
+#
+# Filtros por colunas fora do cubo (ver indexes.TYPEAHEAD_COLUMNS) somam as
+# mesmas medidas direto nas linhas: o índice das linhas guarda as medidas de
+# cada linha e summarize funciona igual sobre os dois.
+def row_measures(df, dtype=np.int64):
+    """Medidas de cada linha (uma vaga por linha), como arrays."""
+    dias = df['Dias em Aberto']
+    return {
+        'count': np.ones(len(df), dtype=dtype),
+        'sum_dias': dias.fillna(0).to_numpy(dtype=np.float64),
+        'n_dias': dias.notna().to_numpy(dtype=dtype),
+        'fora_sla': (df['Situação Vagas'] == 'Fora do SLA').to_numpy(dtype=dtype),
+    }
+
+
+def build_cube(df):
+    """Agrega o DataFrame no cubo dia x dimensões."""
+    data = pd.DataFrame({
+        DATE_COLUMN: df[DATE_COLUMN].dt.normalize(),
+        **{col: df[col] for col in CUBE_DIMENSIONS},
+        **row_measures(df),
+    })
+    cube = data.groupby([DATE_COLUMN] + CUBE_DIMENSIONS, observed=True, dropna=False, sort=True).sum()
+    return cube.reset_index()
+
+
+def update_cube(cube, added, removed):
+    """Cubo atualizado por linhas inseridas (`added`) e retiradas (`removed`) da base.
+
+    Só as células tocadas mudam de valor: as medidas das linhas retiradas são
+    subtraídas, as das inseridas somadas, e células zeradas saem do cubo. O
+    custo é o do tamanho do cubo e da atualização, não o do histórico.
+    """
+    keys = [DATE_COLUMN] + CUBE_DIMENSIONS
+    plus, minus = build_cube(added), build_cube(removed)
+    minus[MEASURES] = -minus[MEASURES]
+    parts = [cube, plus, minus]
+    # Mesmas categorias nas três partes (a atualização pode trazer valores novos)
+    for col in CUBE_DIMENSIONS:
+        categories = parts[0][col].cat.categories
+        for part in parts[1:]:
+            categories = categories.union(part[col].cat.categories)
+        for part in parts:
+            part[col] = part[col].cat.set_categories(categories)
+
+    merged = pd.concat(parts, ignore_index=True)
+    merged = merged.groupby(keys, observed=True, dropna=False, sort=True)[MEASURES].sum().reset_index()
+    return merged[merged['count'] != 0].reset_index(drop=True)
+
+
+def index_cube(cube):
+    """Índice de filtros de um cubo já agregado (inclui os códigos do motivo e as medidas)."""
+    index = build_filter_index(cube, FILTER_COLUMNS + ['Descrição do Motivo'])
+    index['measures'] = {name: cube[name].to_numpy() for name in MEASURES}
+    return index
+
+
+def build_cube_index(df):
+    """Monta o cubo e seu índice de filtros."""
+    return index_cube(build_cube(df))
+
+
+def summarize(cube_index, rows, group_col):
+    """Soma as medidas das células selecionadas do cubo (ou das linhas, ver row_measures).
+
+    Retorna os totais dos KPIs e as contagens por `group_col` e por motivo
+    (apenas valores com contagem maior que zero, em ordem decrescente).
+    """
+    measures = cube_index['measures']
+    count = measures['count'][rows]
+
+    def count_by(col):
+        categories = cube_index['categories'][col]
+        totals = np.bincount(cube_index['codes'][col][rows] + 1, weights=count, minlength=len(categories) + 1)[1:]
+        counts = pd.Series(totals.astype(np.int64), index=np.asarray(categories, dtype=object))
+        return counts[counts > 0].sort_values(ascending=False, kind='stable')
+
+    return {
+        'total': int(count.sum()),
+        'sum_dias': float(measures['sum_dias'][rows].sum()),
+        'n_dias': int(measures['n_dias'][rows].sum()),
+        'fora_sla': int(measures['fora_sla'][rows].sum()),
+        'by_status': count_by(group_col),
+        'by_motivo': count_by('Descrição do Motivo'),
+    }
@@ -0,0 +1,873 @@
+import contextlib
+import io
+import json
+import os
+import shutil
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError: # Windows: sem lock entre processos
+    fcntl = None
+
+import numpy as np
+import pandas as pd
+
+import metrics
+from merge import MERGE_KEY, key_index, merge_rows, row_hashes
+from normalize import header_key, normalize_frame
+from singleflight import SingleFlight
+
+
+DATA_PATH = os.path.join('data', 'dados.csv')
+
+# Versão do formato das gerações colunares; mudar força a reconstrução a partir do CSV
+SNAPSHOT_FORMAT = 7
+
+# Com DASHBOARD_BUILD_LOCK=1, os workers montam as estruturas derivadas um de cada vez
+# (lock de arquivo por estrutura, ver singleflight.py)
+BUILD_LOCK = os.environ.get('DASHBOARD_BUILD_LOCK') == '1'
+
+
+# =====================================================================
+# ESQUEMA DAS COLUNAS (VER dicionario_de_dados.md)
+# =====================================================================
+# Tipos compactos por coluna:
+#   'category' -> texto de baixa cardinalidade (códigos inteiros + dicionário)
+#   'text'     -> texto livre ou identificadores (sem a limpeza das categorias;
+#                 na geração, também códigos + dicionário de valores distintos)
+#   'smallint' -> inteiros pequenos (float32 se houver valores ausentes)
+#   'decimal'  -> número com vírgula decimal (ex.: '1.649,12')
+#   'date'     -> data no formato DD/MM/AAAA
+# Só as colunas marcadas com load=True são lidas do CSV: são as que os
+# dashboards usam de fato.
+SCHEMA = {
+    'STATUS': {'dtype': 'category', 'load': True},
+    'RECRUTADOR': {'dtype': 'category', 'load': True},
+    'NOME': {'dtype': 'text', 'load': False},
+    'PREVISÃO INÍCIO': {'dtype': 'text', 'load': False},
+    'STATUS DO PROCESO': {'dtype': 'category', 'load': False},
+    'Empresa': {'dtype': 'category', 'load': False},
+    'COO': {'dtype': 'category', 'load': True},
+    'Executivo': {'dtype': 'category', 'load': True},
+    'Diretor': {'dtype': 'category', 'load': True},
+    'Gerente': {'dtype': 'category', 'load': True},
+    'Coordenador': {'dtype': 'category', 'load': True},
+    'Supervisor': {'dtype': 'category', 'load': True},
+    'Grupo Econômico': {'dtype': 'category', 'load': True},
+    'Grupo Econômico com Menor Gestor': {'dtype': 'category', 'load': False},
+    'Contrato': {'dtype': 'category', 'load': True},
+    'UF da OI': {'dtype': 'category', 'load': True},
+    'Cidade da OI': {'dtype': 'category', 'load': True},
+    'Microrregiões': {'dtype': 'category', 'load': False},
+    'Localidade': {'dtype': 'category', 'load': True},
+    'Cep da OI': {'dtype': 'text', 'load': False},
+    'Endereço Completo da OI': {'dtype': 'text', 'load': True},
+    'Código da Requisição': {'dtype': 'text', 'load': True},
+    'Código da Vaga': {'dtype': 'text', 'load': True},
+    'IDPV': {'dtype': 'text', 'load': False},
+    'Hub de Vagas': {'dtype': 'smallint', 'load': False},
+    'Título do Cargo': {'dtype': 'category', 'load': True},
+    'Descrição do Sexo': {'dtype': 'category', 'load': False},
+    'Descrição da Escala': {'dtype': 'category', 'load': False},
+    'Salário': {'dtype': 'decimal', 'load': False},
+    'Status da Vaga Agrupadas': {'dtype': 'category', 'load': False},
+    'Status da Vaga': {'dtype': 'category', 'load': True},
+    'Situação Vagas': {'dtype': 'category', 'load': True},
+    'Dias em Aberto': {'dtype': 'smallint', 'load': True},
+    'Qtd em Andamento': {'dtype': 'smallint', 'load': False},
+    'Qtd Finalizadas': {'dtype': 'smallint', 'load': False},
+    'Recrutamento e Seleção': {'dtype': 'date', 'load': True},
+    'Finalizada': {'dtype': 'date', 'load': True},
+    'Descrição do Motivo': {'dtype': 'category', 'load': True},
+    'Anotações': {'dtype': 'text', 'load': True},
+    'Habilitação Técnica': {'dtype': 'text', 'load': False},
+    'Data de Início da OI': {'dtype': 'date', 'load': False},
+    'Abrangência Vagas': {'dtype': 'category', 'load': False},
+}
+
+LOADED_COLUMNS = [name for name, spec in SCHEMA.items() if spec['load']]
+
+# Hashes gravados em cada geração para a mesclagem incremental (ver merge.py)
+HASH_ARRAYS = ['row_hash', 'key_hash', 'key_pos']
+
+
+def _convert_column(series, dtype):
+    """Converte uma coluna lida como texto para o tipo compacto do esquema."""
+    if dtype == 'smallint':
+        values = pd.to_numeric(series, errors='coerce', downcast='integer')
+        return values if values.dtype.kind in 'iu' else values.astype('float32')
+    if dtype == 'decimal':
+        values = series.str.replace('.', '', regex=False).str.replace(',', '.', regex=False)
+        return pd.to_numeric(values, errors='coerce').astype('float32')
+    if dtype == 'date':
+        return pd.to_datetime(series, format='%d/%m/%Y', errors='coerce')
+    return series
+
+
+# =====================================================================
+# LEITURA E TRATAMENTO DO CSV (FONTE DA VERDADE)
+# =====================================================================
+def decode_csv(raw):
+    """Decodifica os bytes do CSV: UTF-8 (com ou sem BOM) ou, em último caso, latin1."""
+    try:
+        return raw.decode('utf-8-sig')
+    except UnicodeDecodeError:
+        return raw.decode('latin1')
+
+
+def check_header(names, columns=None):
+    """Valida os nomes do cabeçalho; retorna o mapa nome do esquema -> nome original."""
+    columns = columns or LOADED_COLUMNS
+    # Os cabeçalhos podem vir com espaços ou sem acentos (ver normalize.header_key)
+    found = {header_key(name): name for name in names}
+    missing = [name for name in columns if header_key(name) not in found]
+    if missing:
+        raise ValueError(f"Colunas ausentes no arquivo: {', '.join(missing)}")
+    return {name: found[header_key(name)] for name in columns}
+
+
+def parse_csv(source, columns=None):
+    """Lê e trata o CSV exportado (caminho ou bytes), retornando um DataFrame."""
+    columns = columns or LOADED_COLUMNS
+    if isinstance(source, (bytes, bytearray)):
+        raw = bytes(source)
+    else:
+        with open(source, 'rb') as f:
+            raw = f.read()
+
+    # Decodifica uma única vez; o fallback para latin1 não reprocessa o CSV
+    text = decode_csv(raw)
+    raw_names = check_header(pd.read_csv(io.StringIO(text), sep=';', nrows=0).columns, columns)
+
+    df = pd.read_csv(
+        io.StringIO(text), sep=';',
+        usecols=[raw_names[name] for name in columns],
+        dtype={raw_names[name]: 'category' if SCHEMA[name]['dtype'] == 'category' else str for name in columns}
+    )
+    df = df.rename(columns={raw: name for name, raw in raw_names.items()})[columns]
+    for name in columns:
+        df[name] = _convert_column(df[name], SCHEMA[name]['dtype'])
+    return _finish_frame(df)
+
+
+def _finish_frame(df):
+    """Tratamento comum a CSV e .xlsx depois da conversão de tipos."""
+    normalize_frame(df)
+    df.dropna(subset=['Recrutamento e Seleção'], inplace=True)
+    # Linhas ordenadas por data: o filtro de período vira um recorte contíguo
+    df.sort_values('Recrutamento e Seleção', kind='stable', inplace=True)
+    df.reset_index(drop=True, inplace=True)
+    return df
+
+
+# =====================================================================
+# LEITURA DA PLANILHA .xlsx EXPORTADA PELO SISTEMA DE ORIGEM
+# =====================================================================
+# A planilha é lida em modo somente leitura do openpyxl, que percorre o XML
+# da aba linha a linha sem montar o modelo da pasta de trabalho. As linhas
+# são acumuladas em blocos de XLSX_BLOCK_ROWS, só com as colunas usadas, e
+# cada bloco já vira colunas compactas (categorias, inteiros, datas); a
+# memória fica limitada ao bloco atual mais o resultado compacto, qualquer
+# que seja o tamanho da aba. As células são formatadas como no CSV exportado
+# (datas DD/MM/AAAA, vírgula decimal), então os tipos e os hashes de linha
+# são os mesmos dos dois formatos, e uma atualização .xlsx mescla numa base
+# CSV (e vice-versa).
+XLSX_BLOCK_ROWS = 50_000
+
+# Aba dos dados na exportação (ver Dashboard_BI.bas); sem ela, usa a primeira
+XLSX_SHEET = 'BD'
+
+# Arquivos .xlsx são pacotes zip
+_ZIP_MAGIC = b'PK\x03\x04'
+
+
+def is_xlsx(source):
+    """Indica se o arquivo (caminho ou bytes) é uma planilha .xlsx, pelo conteúdo."""
+    if isinstance(source, (bytes, bytearray)):
+        return bytes(source[:4]) == _ZIP_MAGIC
+    with open(source, 'rb') as f:
+        return f.read(4) == _ZIP_MAGIC
+
+
+@contextlib.contextmanager
+def _open_sheet(source):
+    """Aba dos dados, em modo somente leitura (streaming)."""
+    try:
+        import openpyxl
+    except ImportError:
+        raise ValueError("A leitura de arquivos .xlsx requer o pacote openpyxl.") from None
+    # Arquivo aberto aqui: o openpyxl recusa caminhos sem extensão .xlsx (ex.: o .part do upload)
+    with (io.BytesIO(source) if isinstance(source, (bytes, bytearray)) else open(source, 'rb')) as f:
+        try:
+            workbook = openpyxl.load_workbook(f, read_only=True, data_only=True)
+        except Exception as e:
+            raise ValueError(f"Planilha .xlsx inválida: {e}") from None
+        try:
+            yield workbook[XLSX_SHEET] if XLSX_SHEET in workbook.sheetnames else workbook.worksheets[0]
+        finally:
+            workbook.close()
+
+
+def _cell_text(value, dtype):
+    """Texto de uma célula no formato do CSV exportado (None para vazio)."""
+    if value is None or value == '':
+        return None
+    if isinstance(value, str):
+        return value
+    if hasattr(value, 'strftime'):
+        return value.strftime('%d/%m/%Y') if hasattr(value, 'year') else None
+    if isinstance(value, float):
+        if dtype == 'decimal':
+            return repr(value).replace('.', ',')
+        if value.is_integer():
+            return str(int(value))
+    return str(value)
+
+
+def _xlsx_block(block, columns):
+    """Colunas compactas de um bloco de linhas já formatadas como texto."""
+    df = pd.DataFrame(block, columns=columns, dtype='str')
+    for name in columns:
+        dtype = SCHEMA[name]['dtype']
+        df[name] = df[name].astype('category') if dtype == 'category' else _convert_column(df[name], dtype)
+    return df
+
+
+def xlsx_header(source):
+    """Nomes do cabeçalho (primeira linha) da planilha."""
+    with _open_sheet(source) as sheet:
+        header = next(sheet.iter_rows(max_row=1, values_only=True), ())
+    return [str(name) if name is not None else '' for name in header]
+
+
+def parse_xlsx(source, columns=None):
+    """Lê e trata a planilha .xlsx exportada (caminho ou bytes), em blocos de linhas."""
+    columns = columns or LOADED_COLUMNS
+    with _open_sheet(source) as sheet:
+        rows = sheet.iter_rows(values_only=True)
+        header = [str(name) if name is not None else '' for name in next(rows, ())]
+        raw_names = check_header(header, columns)
+        positions = [header.index(raw_names[name]) for name in columns]
+        dtypes = [SCHEMA[name]['dtype'] for name in columns]
+        width = max(positions) + 1
+
+        blocks, block = [], []
+        for row in rows:
+            if len(row) < width: # Linhas com células finais vazias vêm mais curtas
+                row = row + (None,) * (width - len(row))
+            block.append([_cell_text(row[i], dtype) for i, dtype in zip(positions, dtypes)])
+            if len(block) == XLSX_BLOCK_ROWS:
+                blocks.append(_xlsx_block(block, columns))
+                block = []
+        if block or not blocks:
+            blocks.append(_xlsx_block(block, columns))
+
+    if len(blocks) == 1:
+        df = blocks[0]
+    else:
+        df = pd.DataFrame({
+            name: pd.api.types.union_categoricals([b[name] for b in blocks], sort_categories=True)
+            if SCHEMA[name]['dtype'] == 'category' else pd.concat([b[name] for b in blocks], ignore_index=True)
+            for name in columns
+        })
+    return _finish_frame(df)
+
+
+def parse_file(source, columns=None):
+    """Lê o arquivo exportado, CSV ou .xlsx (detectado pelo conteúdo)."""
+    return parse_xlsx(source, columns) if is_xlsx(source) else parse_csv(source, columns)
+
+
+# =====================================================================
+# GERAÇÕES COLUNARES MAPEADAS EM MEMÓRIA (COMPARTILHADAS ENTRE WORKERS)
+# =====================================================================
+# Cada versão publicada dos dados é uma "geração": um diretório com um
+# arquivo .npy por array (sem compressão) e um meta.json. Os workers do
+# gunicorn abrem os arrays com mmap somente leitura, então as páginas ficam
+# no cache do sistema operacional uma única vez, qualquer que seja o número
+# de workers. Categorias e texto viram códigos inteiros + dicionário de
+# valores (UTF-8 separado por NUL), sem precisar de pickle.
+#
+# O arquivo CURRENT aponta a geração vigente e é trocado com os.replace:
+# todos os workers passam a ver a nova geração no mesmo instante.
+def generations_dir(path=DATA_PATH):
+    """Diretório das gerações colunares correspondentes ao CSV."""
+    return os.path.join(os.path.dirname(path), 'generations')
+
+
+def current_generation(path=DATA_PATH):
+    """Nome da geração vigente (conteúdo de CURRENT), ou None se não houver."""
+    try:
+        with open(os.path.join(generations_dir(path), 'CURRENT'), encoding='utf-8') as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+@contextlib.contextmanager
+def _publish_lock(path=DATA_PATH):
+    """Lock entre processos para gravar o CSV e publicar gerações (no-op sem fcntl)."""
+    directory = generations_dir(path)
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, 'LOCK'), 'a') as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def write_generation(df, source_version, path=DATA_PATH, activate=True, hashes=None):
+    """Grava o DataFrame como nova geração; com activate=True já a torna vigente.
+
+    Junto vão os hashes usados na mesclagem incremental (ver read_hashes):
+    os de `hashes`, se dados, ou calculados aqui. Retorna o nome da geração.
+    """
+    directory = generations_dir(path)
+    os.makedirs(directory, exist_ok=True)
+    name = f'g{time.time_ns()}-{os.getpid()}'
+    tmp_dir = os.path.join(directory, f'{name}.tmp')
+    os.makedirs(tmp_dir)
+
+    columns = []
+    for i, col in enumerate(df.columns):
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            codes, uniques = df[col].cat.codes.to_numpy(), df[col].cat.categories
+            kind = 'category'
+        elif df[col].dtype.kind in 'biufmM':
+            np.save(os.path.join(tmp_dir, f'c{i}.npy'), df[col].to_numpy())
+            columns.append({'name': col, 'kind': 'raw'})
+            continue
+        else:
+            # Códigos no tipo inteiro compacto do pandas: a leitura os usa direto do arquivo (ver read_generation)
+            values = pd.Categorical(df[col])
+            codes, uniques = values.codes, values.categories
+            kind = 'text'
+        np.save(os.path.join(tmp_dir, f'c{i}_codes.npy'), codes)
+        np.save(os.path.join(tmp_dir, f'c{i}_values.npy'), _encode_values(uniques))
+        columns.append({'name': col, 'kind': kind, 'n_values': len(uniques)})
+
+    if hashes is None:
+        key_hash, key_pos = key_index(df)
+        hashes = {'row_hash': row_hashes(df), 'key_hash': key_hash, 'key_pos': key_pos}
+    for key in HASH_ARRAYS:
+        np.save(os.path.join(tmp_dir, f'{key}.npy'), hashes[key])
+
+    meta = {'format': SNAPSHOT_FORMAT, 'source': source_version, 'rows': len(df), 'columns': columns}
+    with open(os.path.join(tmp_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+
+    # Diretório completo antes de ser apontado: nenhum worker vê uma geração pela metade
+    os.replace(tmp_dir, os.path.join(directory, name))
+    if activate:
+        activate_generation(name, path)
+    return name
+
+
+def activate_generation(name, path=DATA_PATH):
+    """Aponta CURRENT para a geração dada (troca atômica) e remove as anteriores."""
+    directory = generations_dir(path)
+    pointer = os.path.join(directory, f'CURRENT.{os.getpid()}.tmp')
+    with open(pointer, 'w', encoding='utf-8') as f:
+        f.write(name)
+    os.replace(pointer, os.path.join(directory, 'CURRENT'))
+    _prune_generations(directory, keep=name)
+
+
+def _prune_generations(directory, keep):
+    """Remove gerações anteriores à vigente (workers que ainda as mapeiam não são afetados no POSIX).
+
+    Gerações mais novas ficam: podem estar sendo preparadas por outro upload.
+    """
+    for entry in os.listdir(directory):
+        if entry.startswith('g') and entry < keep:
+            shutil.rmtree(os.path.join(directory, entry), ignore_errors=True)
+
+
+def _encode_values(values):
+    """Dicionário de valores como bytes UTF-8 separados por NUL (ver _decode_values)."""
+    return np.frombuffer('\x00'.join(str(v) for v in values).encode('utf-8'), dtype=np.uint8)
+
+
+def _decode_values(blob, n_values):
+    """Reconstrói o dicionário de valores gravado na geração."""
+    return blob.tobytes().decode('utf-8').split('\x00') if n_values else []
+
+
+def read_meta(name, path=DATA_PATH):
+    """meta.json de uma geração (formato, versão da fonte, colunas), ou None se ausente."""
+    try:
+        with open(os.path.join(generations_dir(path), name, 'meta.json'), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def read_generation(name, path=DATA_PATH):
+    """Abre uma geração com os arrays mapeados (somente leitura).
+
+    Categorias e texto voltam como colunas categóricas cujos códigos são o
+    próprio array mapeado: só o dicionário de valores distintos é copiado
+    para a memória do processo. Retorna (meta, DataFrame), ou None se
+    ausente, de outro formato ou com outras colunas.
+    """
+    directory = os.path.join(generations_dir(path), name)
+
+    def array(filename):
+        return np.load(os.path.join(directory, filename), mmap_mode='r', allow_pickle=False)
+
+    meta = read_meta(name, path)
+    if meta is None or meta.get('format') != SNAPSHOT_FORMAT or [col['name'] for col in meta.get('columns', [])] != LOADED_COLUMNS:
+        return None
+    try:
+        data = {}
+        for i, col in enumerate(meta['columns']):
+            if col['kind'] == 'raw':
+                data[col['name']] = array(f'c{i}.npy')
+            else:
+                categories = _decode_values(array(f'c{i}_values.npy'), col['n_values'])
+                data[col['name']] = pd.Categorical.from_codes(array(f'c{i}_codes.npy'), categories=categories)
+    except (OSError, ValueError, KeyError):
+        return None
+    # copy=False: as colunas continuam apontando para os arquivos mapeados
+    return meta, pd.DataFrame(data, copy=False)
+
+
+def read_hashes(name, path=DATA_PATH):
+    """Hashes de uma geração, mapeados: 'row_hash' por linha e o índice das chaves ('key_hash', 'key_pos')."""
+    directory = os.path.join(generations_dir(path), name)
+    return {
+        key: np.load(os.path.join(directory, f'{key}.npy'), mmap_mode='r', allow_pickle=False)
+        for key in HASH_ARRAYS
+    }
+
+
+# =====================================================================
+# ESTRUTURAS DERIVADAS GRAVADAS NA GERAÇÃO (MAPEADAS POR TODOS OS WORKERS)
+# =====================================================================
+# Índices, cubo, vagas abertas, busca e rollups (ver get_derived) são
+# montados por um único processo e gravados em <geração>/derived/<nome>/:
+# cada array vira um .npy e a forma da estrutura (dicionários, DataFrames,
+# índices do pandas, escalares) vai para um tree.json. Os demais workers
+# abrem os arrays com mmap somente leitura, como as colunas, então a memória
+# dos arrays por linha não cresce com o número de workers. Arrays que já são
+# um arquivo da geração (os códigos das colunas) e os dicionários de valores
+# das colunas só são referenciados. Textos (chaves de busca, trigramas) são
+# guardados como o dicionário das colunas e copiados ao abrir: o custo é o
+# dos valores distintos, não o das linhas. Uma mudança na forma das
+# estruturas pede um novo SNAPSHOT_FORMAT.
+def _derived_dir(generation, name, path=DATA_PATH):
+    return os.path.join(generations_dir(path), generation, 'derived', name)
+
+
+def _mapped_file(array, directory):
+    """Caminho (relativo a `directory`) do .npy do qual `array` é o mapeamento inteiro, ou None."""
+    root, base = None, array
+    while isinstance(base, np.ndarray):
+        if isinstance(base, np.memmap):
+            root = base
+        base = base.base
+    if root is None or root.filename is None:
+        return None
+    relative = os.path.relpath(root.filename, os.path.abspath(directory))
+    whole = (
+        array.shape == root.shape and array.dtype == root.dtype
+        and array.__array_interface__['data'][0] == root.__array_interface__['data'][0]
+    )
+    return relative if whole and not relative.startswith('..') else None
+
+
+def _dump_tree(value, context):
+    """Grava os arrays de `value` e devolve a descrição (serializável em JSON) da estrutura."""
+    df, directory = context['df'], context['directory']
+
+    def save(array):
+        context['files'] += 1
+        filename = f"a{context['files']}.npy"
+        np.save(os.path.join(context['tmp_dir'], filename), array)
+        return filename
+
+    if isinstance(value, dict):
+        if not all(isinstance(key, str) for key in value):
+            raise TypeError("Estruturas derivadas só gravam dicionários com chaves de texto.")
+        return {'dict': [[key, _dump_tree(item, context)] for key, item in value.items()]}
+    if isinstance(value, pd.DataFrame):
+        if value is df:
+            return {'generation': True}
+        if not isinstance(value.index, pd.RangeIndex) or value.index.start != 0 or value.index.step != 1:
+            raise TypeError("Estruturas derivadas só gravam DataFrames com o índice padrão.")
+        columns = []
+        for col in value.columns:
+            if isinstance(value[col].dtype, pd.CategoricalDtype):
+                node = {'codes': _dump_tree(np.asarray(value[col].array.codes), context),
+                        'categories': _dump_tree(value[col].cat.categories, context)}
+            else:
+                node = {'array': _dump_tree(value[col].to_numpy(), context)}
+            columns.append([col, node])
+        return {'frame': columns}
+    if isinstance(value, pd.Index):
+        for col in df.columns:
+            if isinstance(df[col].dtype, pd.CategoricalDtype) and value is df[col].cat.categories:
+                return {'categories': col}
+        return {'index': _dump_tree(value.to_numpy(dtype=None if value.dtype.kind in 'biufmM' else object), context)}
+    if isinstance(value, np.ndarray):
+        mapped = _mapped_file(value, directory)
+        if mapped is not None:
+            return {'file': mapped}
+        if value.dtype == object:
+            return {'strings': save(_encode_values(value)), 'n': len(value)}
+        return {'array': save(value)}
+    if isinstance(value, np.generic):
+        value = value.item()
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return {'value': value}
+    raise TypeError(f"Tipo não suportado numa estrutura derivada: {type(value).__name__}")
+
+
+def _load_tree(node, directory, df):
+    """Reconstrói a estrutura descrita por _dump_tree, com os arrays mapeados (somente leitura)."""
+    if 'dict' in node:
+        return {key: _load_tree(item, directory, df) for key, item in node['dict']}
+    if 'generation' in node:
+        return df
+    if 'frame' in node:
+        data = {}
+        for col, column in node['frame']:
+            if 'codes' in column:
+                data[col] = pd.Categorical.from_codes(
+                    _load_tree(column['codes'], directory, df), categories=_load_tree(column['categories'], directory, df)
+                )
+            else:
+                data[col] = _load_tree(column['array'], directory, df)
+        return pd.DataFrame(data, copy=False)
+    if 'categories' in node:
+        return df[node['categories']].cat.categories
+    if 'index' in node:
+        return pd.Index(_load_tree(node['index'], directory, df))
+    # np.asarray: arrays comuns (sem a subclasse memmap), ainda apontando para o arquivo
+    if 'file' in node:
+        return np.asarray(np.load(os.path.join(directory, os.pardir, os.pardir, node['file']), mmap_mode='r', allow_pickle=False))
+    if 'array' in node:
+        return np.asarray(np.load(os.path.join(directory, node['array']), mmap_mode='r', allow_pickle=False))
+    if 'strings' in node:
+        blob = np.load(os.path.join(directory, node['strings']), mmap_mode='r', allow_pickle=False)
+        return np.asarray(_decode_values(blob, node['n']), dtype=object)
+    return node['value']
+
+
+def read_derived(generation, name, df, path=DATA_PATH):
+    """Estrutura derivada gravada na geração (arrays mapeados), ou None se ainda não houver."""
+    directory = _derived_dir(generation, name, path)
+    try:
+        with open(os.path.join(directory, 'tree.json'), encoding='utf-8') as f:
+            tree = json.load(f)
+        return _load_tree(tree, directory, df)
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def write_derived(generation, name, value, df, path=DATA_PATH):
+    """Grava a estrutura derivada na geração e a devolve reaberta (mapeada).
+
+    Se outro processo gravou a mesma estrutura antes, vale a dele. Se a
+    geração já foi removida, devolve `value` como está.
+    """
+    directory = _derived_dir(generation, name, path)
+    tmp_dir = f'{directory}.{os.getpid()}.{threading.get_ident()}.tmp'
+    try:
+        # mkdir sem criar os pais: uma geração já removida não é recriada
+        with contextlib.suppress(FileExistsError):
+            os.mkdir(os.path.dirname(directory))
+        os.mkdir(tmp_dir)
+        context = {'df': df, 'directory': os.path.join(generations_dir(path), generation), 'tmp_dir': tmp_dir, 'files': 0}
+        tree = _dump_tree(value, context)
+        with open(os.path.join(tmp_dir, 'tree.json'), 'w', encoding='utf-8') as f:
+            json.dump(tree, f)
+        # Diretório completo antes de aparecer: ninguém lê uma estrutura pela metade
+        os.rename(tmp_dir, directory)
+    except OSError:
+        pass
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    loaded = read_derived(generation, name, df, path)
+    return value if loaded is None else loaded
+
+
+def _write_all_derived(generation, derived, df, path=DATA_PATH):
+    """Grava as estruturas {nome: estrutura} na geração e as devolve mapeadas."""
+    return {name: write_derived(generation, name, value, df, path) for name, value in derived.items()}
+
+
+# =====================================================================
+# ARQUIVOS DE ATUALIZAÇÃO (MESCLAGEM INCREMENTAL)
+# =====================================================================
+# Uploads no modo de mesclagem não reescrevem o CSV: cada um é guardado, na
+# ordem, em data/deltas/. A base é o CSV com os arquivos de atualização
+# aplicados em sequência (ver merge.merge_rows); um upload no modo de
+# substituição troca o CSV e descarta os arquivos de atualização.
+def deltas_dir(path=DATA_PATH):
+    """Diretório dos arquivos de atualização aplicados sobre o CSV."""
+    return os.path.join(os.path.dirname(path), 'deltas')
+
+
+def list_deltas(path=DATA_PATH):
+    """Arquivos de atualização, na ordem em que foram aplicados."""
+    try:
+        return sorted(entry for entry in os.listdir(deltas_dir(path)) if entry.endswith(('.csv', '.xlsx')))
+    except OSError:
+        return []
+
+
+def source_version(path=DATA_PATH, deltas=None):
+    """Versão da fonte dos dados: a do CSV mais a de cada arquivo de atualização."""
+    deltas = list_deltas(path) if deltas is None else deltas
+    versions = [data_version(path)]
+    versions += [f'{name}:{data_version(os.path.join(deltas_dir(path), name))}' for name in deltas]
+    return ';'.join(versions)
+
+
+def _clear_deltas(path=DATA_PATH):
+    for name in list_deltas(path):
+        os.remove(os.path.join(deltas_dir(path), name))
+
+
+def build_dataset(path=DATA_PATH):
+    """Lê o CSV e aplica os arquivos de atualização; retorna (DataFrame, hashes)."""
+    df = parse_file(path)
+    key_hash, key_pos = key_index(df)
+    hashes = {'row_hash': row_hashes(df), 'key_hash': key_hash, 'key_pos': key_pos}
+    for name in list_deltas(path):
+        df, hashes, _ = merge_rows(df, hashes, parse_file(os.path.join(deltas_dir(path), name)))
+    return df, hashes
+
+
+# =====================================================================
+# FUNÇÃO DE CARREGAMENTO DE DADOS
+# =====================================================================
+def load_generation(path=DATA_PATH):
+    """Abre a geração vigente; se não houver ou se a fonte mudou, publica uma nova.
+
+    Retorna (nome da geração, DataFrame). O tempo vai para as métricas,
+    separado entre abrir uma geração pronta ('open') e publicar ('publish').
+    """
+    start = time.perf_counter()
+    name = current_generation(path)
+    loaded = read_generation(name, path) if name else None
+    if loaded is not None and loaded[0]['source'] == source_version(path):
+        metrics.observe('dashboard_load_data_seconds', time.perf_counter() - start, outcome='open')
+        return name, loaded[1]
+
+    with _publish_lock(path):
+        # Outro worker pode ter publicado enquanto esperávamos o lock
+        name = current_generation(path)
+        loaded = read_generation(name, path) if name else None
+        outcome = 'open'
+        if loaded is None or loaded[0]['source'] != source_version(path):
+            df, hashes = build_dataset(path)
+            name = write_generation(df, source_version(path), path, hashes=hashes)
+            loaded = read_generation(name, path)
+            outcome = 'publish'
+    metrics.observe('dashboard_load_data_seconds', time.perf_counter() - start, outcome=outcome)
+    return name, loaded[1]
+
+
+def load_data(path=DATA_PATH):
+    """Carrega os dados da geração colunar vigente, publicando-a se estiver desatualizada."""
+    return load_generation(path)[1]
+
+
+def ingest_file(tmp_path, path=DATA_PATH, progress=None, prepare=None):
+    """Valida um arquivo exportado (CSV ou .xlsx) já gravado em arquivo temporário e o coloca
+    no lugar da base atual (modo substituição).
+
+    Etapas, informadas a `progress(etapa)`: 'parsed', 'validated', 'indexed'
+    e 'published'. A nova geração é gravada e preparada antes de virar a
+    vigente: até a troca, todos continuam vendo a versão anterior.
+    `prepare(df)` monta as estruturas derivadas ({nome: estrutura}, ver
+    get_derived) sobre a geração já mapeada; elas são gravadas na geração
+    antes da publicação, então nenhum worker as reconstrói.
+
+    O temporário deve estar no mesmo sistema de arquivos de `path`: a troca é
+    um os.replace. O arquivo é guardado como enviado (o formato é detectado
+    pelo conteúdo em parse_file). Retorna o nome da nova geração.
+    """
+    report = progress or (lambda stage: None)
+    # Processa antes de trocar: um arquivo inválido não substitui a base atual
+    df = parse_file(tmp_path)
+    report('parsed')
+    if df.empty:
+        raise ValueError("O arquivo não tem linhas com data de Recrutamento e Seleção válida.")
+    report('validated')
+
+    # os.replace preserva mtime e tamanho: a versão do temporário é a do CSV final
+    generation = write_generation(df, data_version(tmp_path), path, activate=False)
+    _, df = read_generation(generation, path)
+    derived = _write_all_derived(generation, prepare(df) if prepare else {}, df, path)
+    report('indexed')
+
+    with _publish_lock(path):
+        os.replace(tmp_path, path)
+        # A nova base substitui também as atualizações mescladas antes dela
+        _clear_deltas(path)
+        activate_generation(generation, path)
+    with _cache_lock:
+        _cache.update(version=generation, df=df, derived=dict(derived))
+    report('published')
+    return generation
+
+
+def merge_file(tmp_path, path=DATA_PATH, progress=None, update=None):
+    """Mescla um arquivo de atualização (CSV ou .xlsx, temporário) na base atual, por chave (modo mesclagem).
+
+    Mesmas etapas de ingest_file. `update(df_antigo, df_novo, plano)` atualiza
+    as estruturas derivadas a partir das da versão atual, usando o plano de
+    merge.merge_rows, em vez de reconstruí-las. As estruturas atualizadas
+    são gravadas na nova geração antes da publicação: os demais workers as
+    mapeiam (ver read_derived) em vez de remontá-las a partir do histórico.
+    Continuam proporcionais a todas as linhas, neste processo, a gravação da
+    geração mesclada (colunas e hashes) e a cópia dos arrays por linha para
+    as novas posições. Retorna (nome da geração, contagens de linhas
+    inseridas, atualizadas e sem mudança).
+    """
+    report = progress or (lambda stage: None)
+    delta = parse_file(tmp_path)
+    report('parsed')
+    if delta.empty:
+        raise ValueError("O arquivo não tem linhas com data de Recrutamento e Seleção válida.")
+    if delta[MERGE_KEY].isna().any(axis=None):
+        raise ValueError(f"Linhas sem {' ou '.join(MERGE_KEY)}: não é possível mesclar.")
+    report('validated')
+
+    # Base atual aberta fora do lock (load_generation pode precisar dele)
+    while True:
+        old_generation, old_df = load_generation(path)
+        with _publish_lock(path):
+            if current_generation(path) != old_generation:
+                continue # Outra versão foi publicada nesse meio tempo
+            df, hashes, plan = merge_rows(old_df, read_hashes(old_generation, path), delta)
+            counts = {key: plan[key] for key in ('inserted', 'updated', 'unchanged')}
+            if not plan['inserted'] and not plan['updated']:
+                # Nada mudou: a versão atual continua valendo
+                os.remove(tmp_path)
+                report('indexed')
+                report('published')
+                return old_generation, counts
+
+            # os.replace preserva mtime e tamanho: a versão do temporário é a do arquivo final
+            delta_name = f"d{time.time_ns()}.{'xlsx' if is_xlsx(tmp_path) else 'csv'}"
+            source = source_version(path) + f';{delta_name}:{data_version(tmp_path)}'
+            generation = write_generation(df, source, path, activate=False, hashes=hashes)
+            _, df = read_generation(generation, path)
+            derived = _write_all_derived(generation, update(old_df, df, plan) if update else {}, df, path)
+            report('indexed')
+
+            os.makedirs(deltas_dir(path), exist_ok=True)
+            os.replace(tmp_path, os.path.join(deltas_dir(path), delta_name))
+            activate_generation(generation, path)
+        with _cache_lock:
+            _cache.update(version=generation, df=df, derived=dict(derived))
+        break
+    report('published')
+    return generation, counts
+
+
+# =====================================================================
+# CACHE DO CONJUNTO DE DADOS (COMPARTILHADO POR TODAS AS SESSÕES)
+# =====================================================================
+# O DataFrame de cada geração é mapeado uma única vez por processo e
+# reaproveitado por todos os callbacks. A versão dos dados é o nome da geração
+# vigente: o ponteiro CURRENT é relido a cada chamada (um arquivo de poucos
+# bytes), então todos os workers trocam de geração juntos. O CSV em si só é
+# verificado de novo quando o 'data-update-signal' recebido muda, pelo
+# meta.json da geração e o stat da fonte: a geração só é reaberta quando
+# CURRENT aponta outra ou quando a fonte mudou fora do upload.
+#
+# As estruturas derivadas são montadas fora do lock do cache: sessões que
+# pedem a mesma estrutura da mesma versão esperam uma única montagem, e as
+# demais consultas seguem sem esperar. A estrutura montada é gravada na
+# geração e os outros workers só a mapeiam (ver read_derived).
+_MISSING = object()
+_cache_lock = threading.Lock()
+_cache = {'version': None, 'signal': None, 'df': None, 'derived': {}}
+_derived_flights = SingleFlight(generations_dir() if BUILD_LOCK else None)
+metrics.register_collector(
+    lambda: [('dashboard_singleflight_shared_total', {'cache': 'derivadas'}, _derived_flights.shared)]
+)
+
+
+def data_version(path=DATA_PATH):
+    """Identifica a versão do arquivo CSV pelo mtime e tamanho."""
+    stat = os.stat(path)
+    return f"{stat.st_mtime_ns}-{stat.st_size}"
+
+
+def _source_current(generation, path=DATA_PATH):
+    """Indica se a geração ainda corresponde à fonte (CSV e arquivos de atualização), sem abri-la."""
+    meta = read_meta(generation, path)
+    try:
+        return meta is not None and meta['source'] == source_version(path)
+    except OSError:
+        return False
+
+
+def _current_data(update_signal):
+    """Atualiza o cache se necessário. Deve ser chamada com o lock adquirido."""
+    generation = current_generation()
+    if _cache['df'] is not None and generation is not None and generation == _cache['version']:
+        # Sinal novo com a mesma geração (cada sessão tem o seu): basta conferir, pelo
+        # meta.json e o stat da fonte, se o CSV foi trocado fora do upload
+        if update_signal == _cache['signal'] or _source_current(generation):
+            _cache['signal'] = update_signal
+            return _cache['df']
+
+    generation, df = load_generation()
+    if generation != _cache['version'] or _cache['df'] is None:
+        _cache['df'] = df
+        _cache['derived'] = {}
+        _cache['version'] = generation
+    _cache['signal'] = update_signal
+    return _cache['df']
+
+
+def get_data(update_signal=None):
+    """Retorna o DataFrame da geração vigente, abrindo-a só quando ela muda."""
+    with _cache_lock:
+        return _current_data(update_signal)
+
+
+def get_derived(name, build, update_signal=None, with_version=False):
+    """Retorna uma estrutura derivada dos dados (índices, agregados), construída uma vez por versão.
+
+    Com with_version=True retorna a tupla (versão dos dados, estrutura).
+    """
+    with _cache_lock:
+        df = _current_data(update_signal)
+        version = _cache['version']
+        value = _cache['derived'].get(name, _MISSING)
+    if value is _MISSING:
+        value = _derived_flights.do(
+            (version, name), lambda: _build_derived(version, name, build, df), lock_name=f'build-{name}'
+        )
+    return (version, value) if with_version else value
+
+
+def _build_derived(version, name, build, df):
+    # Gravada na geração por outro worker (ou antes de publicá-la): só mapeia
+    value = read_derived(version, name, df)
+    if value is None:
+        value = write_derived(version, name, build(df), df)
+    with _cache_lock:
+        # Só guarda se a versão ainda for a vigente (um upload pode ter publicado outra)
+        if _cache['version'] == version:
+            value = _cache['derived'].setdefault(name, value)
+    return value
+
+
+def invalidate_cache():
+    """Força a verificação da versão na próxima chamada de get_data()."""
+    with _cache_lock:
+        _cache['version'] = None
@@ -0,0 +1,661 @@
+import hashlib
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+import metrics
+from cube import CUBE_DIMENSIONS, build_cube_index, index_cube, row_measures, summarize, update_cube
+from dataset import get_derived
+from indexes import (
+    FILTER_COLUMNS, TYPEAHEAD_COLUMNS, build_filter_index, build_prefix_index, date_slice, day_numbers,
+    prefix_lookup, value_lookup
+)
+from normalize import search_keys, text_key
+from rollups import ROLLUP_DIMENSIONS, build_rollups, period_edges, select_cells, trend_totals, update_rollups
+from search import build_search_index, search_rows, update_search_index
+from singleflight import SingleFlight
+
+
+# Limites do cache de consultas (compartilhado por todas as sessões)
+CACHE_MAX_ENTRIES = 512
+CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# Filtros gerais, comuns a todas as abas
+GLOBAL_FILTERS = ['Grupo Econômico', 'UF da OI'] + TYPEAHEAD_COLUMNS
+
+# Máximo de opções devolvidas por busca num filtro de alta cardinalidade
+TYPEAHEAD_LIMIT = 50
+
+# Tamanho padrão da página do gráfico de vagas abertas há mais tempo
+TOP_N = 15
+
+# Abaixo desta fração de linhas selecionadas, o Top N usa argpartition em vez da varredura
+TOP_SCAN_MIN_FRACTION = 1 / 8
+
+# Máximo de séries no gráfico de tendência quebrado por grupo ou UF (as de mais vagas)
+TREND_SERIES = 8
+
+
+# =====================================================================
+# CACHE LRU LIMITADO POR QUANTIDADE DE ENTRADAS E POR BYTES
+# =====================================================================
+def _sizeof(value):
+    """Estimativa do tamanho em memória de um valor guardado no cache."""
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        usage = value.memory_usage(deep=True, index=True)
+        return int(usage.sum()) if isinstance(usage, pd.Series) else int(usage)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(_sizeof(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(_sizeof(v) for v in value)
+    return sys.getsizeof(value)
+
+
+class LRUCache:
+    """Cache LRU thread-safe, limitado pelo número de entradas e pelo total de bytes."""
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, max_bytes=CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._data = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._flights = SingleFlight()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._data:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return self._data[key][0]
+
+    def put(self, key, value):
+        size = _sizeof(value)
+        if size > self.max_bytes:
+            return value
+        with self._lock:
+            if key in self._data:
+                self._bytes -= self._data.pop(key)[1]
+            self._data[key] = (value, size)
+            self._bytes += size
+            while len(self._data) > self.max_entries or self._bytes > self.max_bytes:
+                self._bytes -= self._data.popitem(last=False)[1][1]
+        return value
+
+    def get_or_compute(self, key, compute):
+        """Retorna o valor em cache ou calcula, guarda e retorna.
+
+        Chamadas simultâneas com a mesma chave esperam um único cálculo (ver singleflight.py).
+        """
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = self._flights.do(key, lambda: self._compute(key, compute))
+        return value
+
+    def _compute(self, key, compute):
+        # Outra thread pode ter terminado o mesmo cálculo entre o get e o início deste
+        with self._lock:
+            if key in self._data:
+                return self._data[key][0]
+        return self.put(key, compute())
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def counters(self, name):
+        """Acertos, faltas e chamadas coalescidas, no formato dos coletores de metrics.py."""
+        labels = {'cache': name}
+        return [
+            ('dashboard_cache_hits_total', labels, self.hits),
+            ('dashboard_cache_misses_total', labels, self.misses),
+            ('dashboard_singleflight_shared_total', labels, self._flights.shared),
+        ]
+
+
+_MISSING = object()
+_cache = LRUCache()
+metrics.register_collector(lambda: _cache.counters('consultas'))
+
+
+# =====================================================================
+# MOTOR DE CONSULTA DOS DASHBOARDS
+# =====================================================================
+# Colunas do índice das linhas: filtros, buscas e o motivo
+ROW_INDEX_COLUMNS = FILTER_COLUMNS + TYPEAHEAD_COLUMNS + ['Descrição do Motivo']
+
+
+def _row_index(df):
+    """Índice de filtros das linhas, com as colunas de busca e as medidas de cada linha."""
+    index = build_filter_index(df, ROW_INDEX_COLUMNS)
+    index['measures'] = row_measures(df, dtype=np.int8)
+    return index
+
+
+def _update_row_index(index, new_df, plan):
+    """Índice das linhas de uma versão mesclada: dias e medidas só são calculados para as linhas inseridas.
+
+    Os das linhas mantidas são copiados para as novas posições (plano de
+    merge.merge_rows); códigos e categorias são vistas da nova geração.
+    """
+    kept = np.flatnonzero(plan['old_to_new'] >= 0)
+
+    def moved(old, added):
+        values = np.empty(len(new_df), dtype=old.dtype)
+        values[plan['old_to_new'][kept]] = old[kept]
+        values[plan['added']] = added
+        return values
+
+    added = new_df.iloc[plan['added']]
+    updated = build_filter_index(new_df, ROW_INDEX_COLUMNS, days=moved(index['days'], day_numbers(added)))
+    measures = row_measures(added, dtype=np.int8)
+    updated['measures'] = {name: moved(index['measures'][name], measures[name]) for name in measures}
+    return updated
+
+
+def _build_state(df):
+    """Estruturas de consulta de uma versão dos dados: linhas, cubo e vagas abertas indexados."""
+    return {'rows': _row_index(df), 'cube': build_cube_index(df), 'open': build_open_index(df)}
+
+
+def warm_state(df):
+    """Estruturas derivadas de uma nova versão dos dados, montadas antes de publicá-la (ver dataset.ingest_file)."""
+    return {'engine_state': _build_state(df), 'search_index': build_search_index(df), 'rollups': build_rollups(df)}
+
+
+def update_state(old_df, new_df, plan):
+    """Estruturas derivadas de uma versão mesclada, a partir das da versão atual.
+
+    `plan` vem de merge.merge_rows. Cubo, vagas abertas e rollups são
+    atualizados apenas pelas linhas inseridas e retiradas, o índice de busca
+    só calcula os valores de texto novos e o índice das linhas só calcula
+    dias e medidas das inseridas (as demais são copiadas para as novas
+    posições). dataset.merge_file grava o resultado na nova geração: os
+    outros workers o mapeiam em vez de remontá-lo.
+    """
+    state = get_derived('engine_state', _build_state)
+    added, removed = new_df.iloc[plan['added']], old_df.iloc[plan['removed']]
+    return {'engine_state': {
+        'rows': _update_row_index(state['rows'], new_df, plan),
+        'cube': index_cube(update_cube(state['cube']['df'], added, removed)),
+        'open': update_open_index(state['open'], new_df, plan),
+    }, 'search_index': update_search_index(get_derived('search_index', build_search_index), new_df),
+        'rollups': update_rollups(get_derived('rollups', build_rollups), added, removed)}
+
+
+def normalize_filters(start_date, end_date, filters):
+    """Chave canônica dos filtros: datas ISO e valores ordenados (vazio vira None)."""
+    return (
+        start_date[:10], end_date[:10],
+        tuple((col, tuple(sorted(map(str, values))) if values else None) for col, values in sorted(filters.items()))
+    )
+
+
+def query_digest(key):
+    """Resumo curto e estável de uma chave de consulta (para guardar no navegador)."""
+    return hashlib.sha1(repr(key).encode('utf-8')).hexdigest()[:16]
+
+
+def _global_rows(version, table, index, start_date, end_date, global_key):
+    """Posições que atendem ao período e aos filtros gerais (em cache)."""
+    def compute():
+        start, stop = date_slice(index, start_date, end_date)
+        mask = np.ones(stop - start, dtype=bool)
+        for col, selected in global_key:
+            if selected:
+                mask &= value_lookup(index, col, selected)[index['codes'][col][start:stop]]
+        rows = start + np.flatnonzero(mask)
+        rows.flags.writeable = False
+        return rows
+
+    return _cache.get_or_compute((version, 'global_rows', table, start_date[:10], end_date[:10], global_key), compute)
+
+
+def _table(filters, search=None):
+    """Tabela que responde aos filtros: o cubo, ou as linhas se houver busca ou filtro fora das dimensões do cubo."""
+    if search is not None:
+        return 'rows'
+    return 'cube' if all(col in CUBE_DIMENSIONS for col, values in filters.items() if values) else 'rows'
+
+
+def _query_state(update_signal=None, search=None):
+    """Versão dos dados, estado de consulta e índice de busca (None sem termos), todos da mesma geração.
+
+    Cada get_derived relê CURRENT: se um upload publicar entre as duas
+    chamadas, o par é pedido de novo.
+    """
+    while True:
+        version, state = get_derived('engine_state', _build_state, update_signal, with_version=True)
+        if not text_key(search or ''):
+            return version, state, None
+        index_version, index = get_derived('search_index', build_search_index, update_signal, with_version=True)
+        if index_version == version:
+            return version, state, index
+
+
+def _search_mask(version, index, text):
+    """Linhas que casam com a busca textual, como máscara booleana (em cache); None sem termos.
+
+    `index` é o índice de busca da versão `version` (ver _query_state).
+    """
+    key = text_key(text or '')
+    if not key:
+        return None
+
+    def compute():
+        mask = np.zeros(index['rows'], dtype=bool)
+        mask[search_rows(index, key)] = True
+        mask.flags.writeable = False
+        return mask
+
+    return _cache.get_or_compute((version, 'search', key), compute)
+
+
+def _select(version, table, index, start_date, end_date, filters, search=None):
+    """Aplica os filtros gerais (reaproveitados entre abas), a busca textual e os filtros da aba.
+
+    `search` é a máscara de _search_mask (só para a tabela de linhas).
+    """
+    global_key = tuple((col, tuple(sorted(map(str, filters[col]))) if filters.get(col) else None) for col in GLOBAL_FILTERS)
+    rows = _global_rows(version, table, index, start_date, end_date, global_key)
+    if search is not None:
+        rows = rows[search[rows]]
+    for col, selected in filters.items():
+        if col in GLOBAL_FILTERS or not selected:
+            continue
+        rows = rows[value_lookup(index, col, selected)[index['codes'][col][rows]]]
+    return rows
+
+
+def _observe_rows(query, table, index, start_date, end_date, selected):
+    """Registra as linhas (ou células do cubo) no período e as que sobraram após os filtros."""
+    start, stop = date_slice(index, start_date, end_date)
+    metrics.observe('dashboard_query_rows_scanned', stop - start, query=query, table=table)
+    metrics.observe('dashboard_query_rows_selected', len(selected), query=query, table=table)
+
+
+def _measured(query, compute):
+    """compute() com o tempo de cálculo registrado (só roda nas faltas do cache)."""
+    def run():
+        with metrics.timed('dashboard_query_seconds', query=query):
+            return compute()
+    return run
+
+
+# =====================================================================
+# ÍNDICE DAS VAGAS ABERTAS (TOP N SEM ORDENAR A CADA CONSULTA)
+# =====================================================================
+# As vagas abertas são ordenadas por 'Dias em Aberto' (decrescente) uma vez
+# por versão dos dados. O Top N de qualquer seleção de linhas são os
+# primeiros N acertos nessa ordem: uma varredura por blocos quando a
+# seleção é grande, ou argpartition sobre as posições na ordem quando a
+# seleção é pequena. Os rótulos saem das colunas só para a página pedida.
+def vaga_labels(df, with_status=False):
+    """Rótulo de cada vaga no Top N: código, (status interno) e cargo."""
+    codigos = df['Código da Vaga'].astype(str)
+    cargos = df['Título do Cargo'].astype(str)
+    if with_status:
+        return codigos + ' [' + df['STATUS'].astype(str) + '] (' + cargos + ')'
+    return codigos + ' (' + cargos + ')'
+
+
+def build_open_index(df):
+    """Vagas abertas em ordem decrescente de dias em aberto, com os dias prontos."""
+    abertas = np.flatnonzero((df['Status da Vaga'] != 'Finalizado - Vaga Preenchida').to_numpy())
+    # Ordenação estável; dias ausentes vão para o fim, como em sort_values
+    order = abertas[np.argsort(_open_sort_key(df, abertas), kind='stable')]
+    return _open_index(df, order)
+
+
+def _open_sort_key(df, rows):
+    """Chave de ordenação das vagas abertas: dias em aberto decrescentes, ausentes no fim."""
+    dias = df['Dias em Aberto'].to_numpy(dtype=float, na_value=np.nan)[rows]
+    return np.where(np.isnan(dias), np.inf, -dias)
+
+
+def _open_index(df, order):
+    ranks = np.full(len(df), -1, dtype=np.int64)
+    ranks[order] = np.arange(len(order))
+    index = {
+        'df': df,
+        'order': order,
+        'ranks': ranks,
+        'dias': df['Dias em Aberto'].to_numpy()[order],
+    }
+    for arr in (index['order'], index['ranks']):
+        arr.flags.writeable = False
+    return index
+
+
+def update_open_index(open_index, new_df, plan):
+    """Índice das vagas abertas após uma mesclagem, sem reordenar o histórico.
+
+    As vagas mantidas seguem na mesma ordem (com as novas posições) e as
+    inseridas ou alteradas entram por busca binária na chave (dias, posição),
+    a mesma ordem de uma ordenação estável completa.
+    """
+    mapped = plan['old_to_new'][open_index['order']]
+    kept = mapped[mapped >= 0]
+
+    added = plan['added']
+    added = added[(new_df['Status da Vaga'].iloc[added] != 'Finalizado - Vaga Preenchida').to_numpy()]
+    # Dias e posição numa chave inteira só (dias ausentes no fim)
+    def composite(rows):
+        key = _open_sort_key(new_df, rows)
+        key = np.where(np.isinf(key), 1 << 20, key).astype(np.int64)
+        return key * (len(new_df) + 1) + rows
+
+    added_key = composite(added)
+    sort = np.argsort(added_key, kind='stable')
+    added, added_key = added[sort], added_key[sort]
+    at = np.searchsorted(composite(kept), added_key) + np.arange(len(added))
+
+    size = len(kept) + len(added)
+    slots = np.ones(size, dtype=bool)
+    slots[at] = False
+    order = np.empty(size, dtype=np.int64)
+    order[slots], order[at] = kept, added
+    return _open_index(new_df, order)
+
+
+def _open_mask(open_index, rows):
+    """Marca, na ordem das vagas abertas, as que estão entre as linhas dadas."""
+    selected = np.zeros(len(open_index['ranks']), dtype=bool)
+    selected[rows] = True
+    return selected[open_index['order']]
+
+
+def open_ranks(open_index, rows):
+    """Todas as posições (crescentes) na ordem das vagas abertas das linhas dadas."""
+    if len(rows) < len(open_index['order']) * TOP_SCAN_MIN_FRACTION:
+        ranks = open_index['ranks'][rows]
+        return np.sort(ranks[ranks >= 0])
+    return np.flatnonzero(_open_mask(open_index, rows))
+
+
+def top_open_ranks(open_index, rows, n=TOP_N, offset=0):
+    """Página [offset, offset + n) das vagas abertas com mais dias em aberto entre as linhas dadas.
+
+    Retorna as posições na ordem das vagas abertas e o total de vagas abertas
+    na seleção (para a paginação).
+    """
+    stop = offset + n
+    if len(rows) < len(open_index['order']) * TOP_SCAN_MIN_FRACTION:
+        # Seleção pequena: seleção parcial sobre as posições na ordem
+        ranks = open_index['ranks'][rows]
+        ranks = ranks[ranks >= 0]
+        total = len(ranks)
+        if stop < total:
+            ranks = ranks[np.argpartition(ranks, stop - 1)[:stop]]
+        return np.sort(ranks)[offset:stop], total
+
+    # Seleção grande: os primeiros acertos na ordem, varrendo em blocos
+    hits = _open_mask(open_index, rows)
+    found = []
+    needed = stop
+    block = max(4 * stop, 4096)
+    for start in range(0, len(hits), block):
+        if needed <= 0:
+            break
+        positions = start + np.flatnonzero(hits[start:start + block])[:needed]
+        found.append(positions)
+        needed -= len(positions)
+    ranks = np.concatenate(found) if found else np.empty(0, dtype=np.int64)
+    return ranks[offset:stop], int(np.count_nonzero(hits))
+
+
+def top_page(open_index, ranks):
+    """Dias e rótulos (sem e com status interno) das vagas nas posições dadas da ordem.
+
+    Os rótulos são montados só para as vagas da página, a partir das colunas.
+    """
+    dff = open_index['df'].iloc[open_index['order'][ranks]]
+    return {
+        'dias': open_index['dias'][ranks].tolist(),
+        'labels': vaga_labels(dff).tolist(),
+        'labels_status': vaga_labels(dff, with_status=True).tolist(),
+    }
+
+
+def query_dashboard(start_date, end_date, filters, group_col, update_signal=None, top_n=TOP_N, top_offset=0, search=None):
+    """Resultado de uma aba do dashboard para os filtros dados.
+
+    `filters` mapeia coluna -> valores selecionados (vazio = sem filtro) e
+    `group_col` é a coluna usada no gráfico de barras. Retorna os totais do
+    cubo (ver cube.summarize), em 'key' a chave de cache da consulta (versão
+    dos dados + filtros normalizados + página) e em 'top' a página
+    [top_offset, top_offset + top_n) das vagas abertas há mais tempo: dias,
+    rótulos (com e sem status interno) e o total de vagas abertas. `search`
+    é o texto da caixa de busca (ver search.py), combinado com os filtros.
+    """
+    version, state, search_index = _query_state(update_signal, search)
+    key = (version, 'dashboard', group_col, normalize_filters(start_date, end_date, filters), top_n, top_offset,
+           text_key(search or '') or None)
+
+    def compute():
+        mask = _search_mask(version, search_index, search)
+        table = _table(filters, mask)
+        selected = _select(version, table, state[table], start_date, end_date, filters, mask)
+        _observe_rows('dashboard', table, state[table], start_date, end_date, selected)
+        result = summarize(state[table], selected, group_col)
+        rows = _select(version, 'rows', state['rows'], start_date, end_date, filters, mask)
+        ranks, total = top_open_ranks(state['open'], rows, top_n, top_offset)
+        result['top'] = {**top_page(state['open'], ranks), 'total': total}
+        result['key'] = key
+        return result
+
+    return _cache.get_or_compute(key, _measured('dashboard', compute))
+
+
+# =====================================================================
+# AGREGADO POR STATUS PARA O FILTRO NO NAVEGADOR
+# =====================================================================
+def status_breakdown(start_date, end_date, filters, group_col, with_status=False, n=TOP_N, update_signal=None, search=None):
+    """Totais por valor de `group_col` para os filtros gerais (período, grupo, UF, buscas).
+
+    O resultado é compacto e serializável em JSON: o navegador combina os
+    status marcados no checklist sem voltar ao servidor. Para cada status
+    (na ordem de 'status') há as medidas do cubo, as contagens por motivo
+    como pares [índice em 'motivos', quantidade], o total de vagas abertas
+    e as n primeiras vagas abertas há mais tempo como [posição na ordem das
+    vagas abertas, dias, rótulo].
+    """
+    version, state, search_index = _query_state(update_signal, search)
+    global_filters = {col: filters.get(col) for col in GLOBAL_FILTERS}
+    key = (version, 'breakdown', group_col, with_status, n, normalize_filters(start_date, end_date, global_filters),
+           text_key(search or '') or None)
+
+    def compute():
+        mask = _search_mask(version, search_index, search)
+        table = _table(global_filters, mask)
+        cube_index = state[table]
+        measures = cube_index['measures']
+        rows = _select(version, table, cube_index, start_date, end_date, global_filters, mask)
+        _observe_rows('breakdown', table, cube_index, start_date, end_date, rows)
+        # Códigos compactos (int8) estourariam no produto status x motivo
+        status_codes = cube_index['codes'][group_col][rows].astype(np.intp)
+        motivo_codes = cube_index['codes']['Descrição do Motivo'][rows].astype(np.intp)
+        n_status = len(cube_index['categories'][group_col])
+        n_motivos = len(cube_index['categories']['Descrição do Motivo'])
+
+        # Código -1 (valor ausente) fica na posição 0 e é descartado: não casa com o checklist
+        def by_status(values):
+            return np.bincount(status_codes + 1, weights=values[rows], minlength=n_status + 1)[1:]
+
+        count = by_status(measures['count'])
+        present = np.flatnonzero(count > 0)
+        sum_dias = by_status(measures['sum_dias'])
+        n_dias = by_status(measures['n_dias'])
+        fora_sla = by_status(measures['fora_sla'])
+
+        matrix = np.bincount(
+            (status_codes + 1) * (n_motivos + 1) + motivo_codes + 1,
+            weights=measures['count'][rows], minlength=(n_status + 1) * (n_motivos + 1)
+        ).reshape(n_status + 1, n_motivos + 1)[1:]
+
+        # Primeiras n vagas abertas de cada status, na ordem das vagas abertas
+        open_index = state['open']
+        rows_index = state['rows']
+        linhas = _select(version, 'rows', rows_index, start_date, end_date, global_filters, mask)
+        ranks = open_ranks(open_index, linhas)
+        codes = rows_index['codes'][group_col][open_index['order'][ranks]]
+        ranks, codes = ranks[codes >= 0], codes[codes >= 0]
+        status_names = rows_index['categories'][group_col]
+        abertas = np.bincount(codes, minlength=len(status_names))
+        by_code = np.argsort(codes, kind='stable')
+        first = np.concatenate(([0], np.cumsum(abertas)[:-1]))
+        keep = by_code[np.arange(len(by_code)) - first[codes[by_code]] < n]
+        page = top_page(open_index, ranks[keep])
+        labels = page['labels_status'] if with_status else page['labels']
+        tops = {}
+        for code, rank, dias, label in zip(codes[keep].tolist(), ranks[keep].tolist(), page['dias'], labels):
+            tops.setdefault(status_names[code], []).append([rank, dias, label])
+
+        categories = cube_index['categories'][group_col]
+        motivos = cube_index['categories']['Descrição do Motivo']
+        return {
+            'status': [str(categories[i]) for i in present],
+            'count': count[present].astype(np.int64).tolist(),
+            'sum_dias': sum_dias[present].tolist(),
+            'n_dias': n_dias[present].astype(np.int64).tolist(),
+            'fora_sla': fora_sla[present].astype(np.int64).tolist(),
+            'motivos': [str(m) for m in motivos],
+            # Motivo ausente (coluna 0) fica fora da rosca, como no servidor
+            'motivo_counts': [
+                [[int(m), int(c)] for m, c in enumerate(matrix[i][1:]) if c > 0] for i in present
+            ],
+            'abertas': [int(abertas[status_names.get_loc(categories[i])]) for i in present],
+            'top': [tops.get(categories[i], []) for i in present],
+        }
+
+    return _cache.get_or_compute(key, _measured('breakdown', compute))
+
+
+# =====================================================================
+# TENDÊNCIA POR SEMANA OU MÊS (ROLLUPS DIÁRIOS, VER rollups.py)
+# =====================================================================
+def _rate(fora_sla, opened):
+    """Percentual fora do SLA por período (None nos períodos sem vagas abertas)."""
+    return [round(100 * f / o, 2) if o else None for f, o in zip(fora_sla.tolist(), opened.tolist())]
+
+
+def query_trend(start_date, end_date, filters, period='month', breakdown=None, update_signal=None, n=TREND_SERIES):
+    """Série temporal de vagas abertas, finalizadas, backlog e taxa fora do SLA.
+
+    Considera só o período e os filtros de grupo e UF (as dimensões dos
+    rollups). `period` é 'week' ou 'month'; com `breakdown` ('Grupo
+    Econômico' ou 'UF da OI') a taxa fora do SLA também vem por valor da
+    coluna, para os n valores com mais vagas abertas na janela. A taxa é a
+    fração das vagas abertas no período que estão fora do SLA.
+    """
+    version, rollups = get_derived('rollups', build_rollups, update_signal, with_version=True)
+    trend_filters = {col: filters.get(col) for col in ROLLUP_DIMENSIONS}
+    key = (version, 'trend', period, breakdown, n, normalize_filters(start_date, end_date, trend_filters))
+
+    def compute():
+        labels, starts, ends = period_edges(rollups, start_date, end_date, period)
+        cells = select_cells(rollups, trend_filters)
+        totals = trend_totals(rollups, cells, starts, ends)
+        total = {name: values.sum(axis=0) for name, values in totals.items()}
+        series = []
+        if breakdown:
+            categories = rollups['categories'][breakdown]
+            codes = rollups['codes'][breakdown][cells] + 1
+            grouped = {}
+            for name in ('opened', 'fora_sla'):
+                grouped[name] = np.zeros((len(categories) + 1, len(labels)), dtype=np.int64)
+                np.add.at(grouped[name], codes, totals[name])
+            volume = grouped['opened'][1:].sum(axis=1)
+            for i in np.argsort(-volume, kind='stable')[:n]:
+                if volume[i]:
+                    series.append({
+                        'name': str(categories[i]),
+                        'rate': _rate(grouped['fora_sla'][i + 1], grouped['opened'][i + 1]),
+                    })
+        return {
+            'key': key,
+            'labels': labels,
+            **{name: values.tolist() for name, values in total.items()},
+            'rate': _rate(total['fora_sla'], total['opened']),
+            'series': series,
+        }
+
+    return _cache.get_or_compute(key, _measured('trend', compute))
+
+
+# =====================================================================
+# OPÇÕES DOS FILTROS (POR VERSÃO DOS DADOS, COM QUANTIDADES)
+# =====================================================================
+# As opções saem do índice de filtros da versão vigente, com a quantidade
+# de vagas de cada valor, e ficam em cache até a próxima versão. Colunas de
+# alta cardinalidade (indexes.TYPEAHEAD_COLUMNS) nunca vão inteiras para o
+# navegador: cada busca devolve só os valores com alguma palavra começando
+# pelo texto digitado (sem diferença de acentos ou caixa).
+def _value_counts(version, state, col):
+    """Quantidade de vagas por categoria da coluna, em toda a versão dos dados."""
+    def compute():
+        index = state['rows']
+        counts = np.bincount(index['codes'][col] + 1, minlength=len(index['categories'][col]) + 1)[1:]
+        counts.flags.writeable = False
+        return counts
+
+    return _cache.get_or_compute((version, 'value_counts', col), compute)
+
+
+def _option(value, count):
+    return {'label': f'{value} ({count})', 'value': value}
+
+
+def filter_options(col, update_signal=None):
+    """Opções de um filtro (valores presentes, em ordem alfabética) com a quantidade de vagas."""
+    version, state = get_derived('engine_state', _build_state, update_signal, with_version=True)
+
+    def compute():
+        categories = state['rows']['categories'][col]
+        counts = _value_counts(version, state, col)
+        return [_option(str(categories[i]), int(counts[i])) for i in np.flatnonzero(counts)]
+
+    return _cache.get_or_compute((version, 'options', col), compute)
+
+
+def search_options(col, text, selected=None, update_signal=None, limit=TYPEAHEAD_LIMIT):
+    """Opções de um filtro de busca para o texto digitado, as mais frequentes primeiro.
+
+    Sem texto, devolve os valores mais frequentes. Os valores já selecionados
+    vêm sempre no início (o Dropdown só mostra selecionados que estão nas
+    opções). Cada opção traz em 'search' a chave sem acentos, usada pela
+    busca do próprio Dropdown no navegador.
+    """
+    version, state = get_derived('engine_state', _build_state, update_signal, with_version=True)
+    categories = state['rows']['categories'][col]
+    counts = _value_counts(version, state, col)
+    keys = _cache.get_or_compute(
+        (version, 'search_keys', col), lambda: search_keys(pd.Series(categories, dtype='str')).to_numpy(dtype=object)
+    )
+
+    key = text_key(text or '')
+    if key:
+        prefixes = _cache.get_or_compute((version, 'prefix_index', col), lambda: build_prefix_index(keys))
+        hits = prefix_lookup(prefixes, key)
+    else:
+        hits = np.flatnonzero(counts)
+    hits = hits[counts[hits] > 0]
+    hits = hits[np.argsort(-counts[hits], kind='stable')][:limit]
+
+    chosen = categories.get_indexer(list(selected or []))
+    chosen = chosen[chosen >= 0]
+    positions = np.concatenate([chosen, hits[~np.isin(hits, chosen)]])
+    return [
+        {**_option(str(categories[i]), int(counts[i])), 'search': keys[i]}
+        for i in positions.tolist()
+    ]
@@ -0,0 +1,210 @@
+import plotly.io as pio
+from dash import Patch
+
+import metrics
+from engine import LRUCache
+
+
+# Limites do cache de figuras prontas
+FIGURE_CACHE_MAX_ENTRIES = 256
+FIGURE_CACHE_MAX_BYTES = 32 * 1024 * 1024
+
+
+# =====================================================================
+# MODELOS DAS FIGURAS (MONTADOS UMA ÚNICA VEZ NA IMPORTAÇÃO)
+# =====================================================================
+# As figuras são dicionários no formato do plotly.js. O estilo escuro e o
+# template padrão são montados aqui uma vez; a cada requisição só os arrays
+# de dados são preenchidos, sem a validação do plotly.express.
+_TEMPLATE = pio.templates[pio.templates.default].to_plotly_json()
+
+_BASE_LAYOUT = {
+    'template': _TEMPLATE,
+    'paper_bgcolor': 'rgba(0,0,0,0)', # Fundo transparente
+    'plot_bgcolor': 'rgba(0,0,0,0)', # Fundo transparente
+    'font': {'color': 'white'}, # Cor da fonte
+}
+
+_BAR_TRACE = {
+    'type': 'bar',
+    'orientation': 'h',
+    'textposition': 'outside',
+    'marker': {'color': '#636efa'},
+    'showlegend': False,
+    'name': '',
+    'hovertemplate': 'Quantidade=%{x}<br>%{y}<extra></extra>',
+}
+
+_TOP_TRACE = {**_BAR_TRACE, 'hovertemplate': 'Dias em Aberto=%{x}<br>%{y}<extra></extra>'}
+
+_STATUS_LAYOUT = {
+    **_BASE_LAYOUT,
+    'barmode': 'relative',
+    'xaxis': {'title': {'text': 'Quantidade de Vagas'}},
+    'yaxis': {'title': {}},
+}
+
+_MOTIVO_TRACE = {
+    'type': 'pie',
+    'hole': .4,
+    'hovertemplate': 'Descrição do Motivo=%{label}<br>Quantidade=%{value}<extra></extra>',
+    'insidetextfont': {'color': 'white', 'size': 14},
+    'textfont': {'size': 12},
+    'name': '',
+}
+
+_MOTIVO_LAYOUT = {
+    **_BASE_LAYOUT,
+    'title': {'text': 'Distribuição por Motivo'},
+    'legend': {'orientation': 'h', 'yanchor': 'bottom', 'y': 1.02, 'xanchor': 'right', 'x': 1},
+}
+
+_TOP_LAYOUT = {
+    **_BASE_LAYOUT,
+    'barmode': 'relative',
+    'height': 600, # Altura fixa para o gráfico
+    'xaxis': {'title': {'text': 'Dias em Aberto'}},
+    'yaxis': {'title': {}, 'tickfont': {'size': 10}}, # Fonte menor para caber mais texto
+}
+
+_EMPTY_ANNOTATION = {'text': 'Sem dados para os filtros selecionados', 'xref': 'paper', 'yref': 'paper', 'showarrow': False, 'font': {'size': 16}}
+
+# Modelo de traço e de layout de cada gráfico do dashboard
+FIGURES = {
+    'status': (_BAR_TRACE, _STATUS_LAYOUT),
+    'motivo': (_MOTIVO_TRACE, _MOTIVO_LAYOUT),
+    'top': (_TOP_TRACE, _TOP_LAYOUT),
+}
+
+
+# =====================================================================
+# DADOS DAS FIGURAS (A ÚNICA PARTE QUE MUDA COM OS FILTROS)
+# =====================================================================
+def status_bar_data(counts):
+    """Arrays das barras de quantidade de vagas por status (menor embaixo)."""
+    counts = counts.sort_values(ascending=True, kind='stable')
+    values = counts.tolist()
+    return {'x': values, 'y': [str(label) for label in counts.index], 'text': values}
+
+
+def motivo_donut_data(counts):
+    """Arrays da rosca com a distribuição das vagas por motivo."""
+    return {'labels': [str(label) for label in counts.index], 'values': counts.tolist()}
+
+
+def top_vagas_data(top, with_status=False):
+    """Arrays das barras com as vagas abertas há mais tempo (maior no topo)."""
+    dias = top['dias'][::-1]
+    # Rótulo informativo para o eixo Y (já montado no índice de vagas abertas)
+    labels = top['labels_status'] if with_status else top['labels']
+    return {'x': dias, 'y': labels[::-1], 'text': dias}
+
+
+def top_vagas_title(n, offset=0):
+    """Título do gráfico de vagas abertas: 'Top N' na primeira página, faixa de posições nas demais."""
+    if offset == 0:
+        return f'Top {n} Vagas com Mais Tempo em Aberto'
+    return f'Vagas com Mais Tempo em Aberto ({offset + 1}ª a {offset + n}ª)'
+
+
+def empty_data(kind):
+    """Arrays vazios para o estado 'sem dados'."""
+    return {'labels': [], 'values': []} if kind == 'motivo' else {'x': [], 'y': [], 'text': []}
+
+
+# =====================================================================
+# FIGURA COMPLETA OU ATUALIZAÇÃO PARCIAL (dash.Patch)
+# =====================================================================
+# A figura completa só é enviada na primeira renderização ou após um novo
+# upload. Nas mudanças de filtro vai apenas um Patch com os arrays de dados
+# e a alternância do aviso de 'sem dados'.
+def full_figure(kind, data, empty=False, title=None):
+    """Monta a figura completa a partir do modelo e dos arrays de dados."""
+    trace, layout = FIGURES[kind]
+    layout = {**layout, 'annotations': [_EMPTY_ANNOTATION] if empty else []}
+    if title:
+        layout['title'] = {'text': title}
+    if kind != 'motivo':
+        layout['xaxis'] = {**layout['xaxis'], 'visible': not empty}
+        layout['yaxis'] = {**layout['yaxis'], 'visible': not empty}
+    return {'data': [{**trace, **data}], 'layout': layout}
+
+
+def patch_figure(kind, data, empty=False, title=None):
+    """Atualização parcial da figura: só os arrays de dados, o estado vazio e o título."""
+    patch = Patch()
+    for prop, values in data.items():
+        patch['data'][0][prop] = values
+    patch['layout']['annotations'] = [_EMPTY_ANNOTATION] if empty else []
+    if title:
+        patch['layout']['title'] = {'text': title}
+    if kind != 'motivo':
+        patch['layout']['xaxis']['visible'] = not empty
+        patch['layout']['yaxis']['visible'] = not empty
+    return patch
+
+
+# =====================================================================
+# TENDÊNCIA (VER engine.query_trend)
+# =====================================================================
+# O número de séries muda com a quebra por grupo ou UF, então estas figuras
+# são sempre enviadas completas (sem Patch).
+_FLOW_LAYOUT = {
+    **_BASE_LAYOUT,
+    'title': {'text': 'Vagas Abertas, Finalizadas e Backlog'},
+    'barmode': 'group',
+    'hovermode': 'x unified',
+    'xaxis': {'type': 'category', 'title': {'text': 'Período'}},
+    'yaxis': {'title': {'text': 'Vagas no período'}},
+    'yaxis2': {'title': {'text': 'Backlog'}, 'overlaying': 'y', 'side': 'right', 'showgrid': False},
+    'legend': {'orientation': 'h', 'yanchor': 'bottom', 'y': 1.02, 'xanchor': 'right', 'x': 1},
+}
+
+_RATE_LAYOUT = {
+    **_BASE_LAYOUT,
+    'title': {'text': 'Taxa Fora do SLA (vagas abertas no período)'},
+    'hovermode': 'x unified',
+    'xaxis': {'type': 'category', 'title': {'text': 'Período'}},
+    'yaxis': {'title': {'text': '% fora do SLA'}, 'ticksuffix': '%', 'rangemode': 'tozero'},
+    'legend': {'orientation': 'h', 'yanchor': 'bottom', 'y': 1.02, 'xanchor': 'right', 'x': 1},
+}
+
+
+def _empty_layout(layout, empty):
+    return {**layout, 'annotations': [_EMPTY_ANNOTATION] if empty else []}
+
+
+def trend_flow_figure(trend):
+    """Barras de vagas abertas e finalizadas por período, com a linha do backlog ao fim de cada um."""
+    x = trend['labels']
+    data = [
+        {'type': 'bar', 'name': 'Abertas', 'x': x, 'y': trend['opened'], 'marker': {'color': '#636efa'}},
+        {'type': 'bar', 'name': 'Finalizadas', 'x': x, 'y': trend['finished'], 'marker': {'color': '#00cc96'}},
+        {'type': 'scatter', 'mode': 'lines+markers', 'name': 'Backlog', 'x': x, 'y': trend['backlog'],
+         'yaxis': 'y2', 'line': {'color': '#ffa15a'}},
+    ]
+    return {'data': data, 'layout': _empty_layout(_FLOW_LAYOUT, not any(trend['opened']) and not any(trend['backlog']))}
+
+
+def trend_rate_figure(trend):
+    """Linha da taxa fora do SLA por período: o total e, com quebra, uma por grupo ou UF."""
+    x = trend['labels']
+    data = [{'type': 'scatter', 'mode': 'lines+markers', 'name': 'Total', 'x': x, 'y': trend['rate'],
+             'connectgaps': False, 'line': {'width': 3, 'color': 'white'}}]
+    data += [
+        {'type': 'scatter', 'mode': 'lines', 'name': series['name'], 'x': x, 'y': series['rate'], 'connectgaps': False}
+        for series in trend['series']
+    ]
+    return {'data': data, 'layout': _empty_layout(_RATE_LAYOUT, not any(trend['opened']))}
+
+
+# =====================================================================
+# CACHE DOS DADOS DAS FIGURAS
+# =====================================================================
+_figure_cache = LRUCache(FIGURE_CACHE_MAX_ENTRIES, FIGURE_CACHE_MAX_BYTES)
+metrics.register_collector(lambda: _figure_cache.counters('figuras'))
+
+
+def cached_figures(key, build):
+    """Retorna os dados das figuras em cache para a chave (versão + filtros) ou os monta."""
+    return _figure_cache.get_or_compute(key, build)
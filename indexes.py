@@ -0,0 +1,97 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+
+DATE_COLUMN = 'Recrutamento e Seleção'
+
+# Colunas que podem ser usadas nos filtros dos dashboards
+FILTER_COLUMNS = ['Status da Vaga', 'STATUS', 'Grupo Econômico', 'UF da OI']
+
+# Colunas de alta cardinalidade filtradas por busca (typeahead): só as
+# opções que casam com o texto digitado vão para o navegador
+TYPEAHEAD_COLUMNS = [
+    'Contrato', 'Cidade da OI', 'Título do Cargo', 'RECRUTADOR',
+    'COO', 'Executivo', 'Diretor', 'Gerente', 'Coordenador', 'Supervisor',
+]
+
+
+# =====================================================================
+# ÍNDICE DE FILTROS (CONSTRUÍDO UMA VEZ POR VERSÃO DOS DADOS)
+# =====================================================================
+# As linhas já vêm ordenadas por data (ver dataset.parse_csv), então um
+# período vira um recorte [início, fim) achado por busca binária. Cada coluna
+# de filtro guarda seus códigos inteiros; uma seleção de valores vira uma
+# tabela booleana indexada pelo código, e os filtros são combinados com AND.
+def day_numbers(df):
+    """Dia (número inteiro) de cada linha na coluna de data."""
+    return df[DATE_COLUMN].to_numpy().astype('datetime64[D]').astype(np.int64)
+
+
+def build_filter_index(df, columns=FILTER_COLUMNS, days=None):
+    """Monta o índice de filtros para um DataFrame ordenado por data.
+
+    `days` são os dias de cada linha, se já calculados (ver day_numbers).
+    """
+    days = day_numbers(df) if days is None else days
+    if len(days) > 1 and np.any(days[1:] < days[:-1]):
+        raise ValueError("O DataFrame precisa estar ordenado por data para o índice de filtros.")
+
+    codes = {}
+    categories = {}
+    for col in columns:
+        values = df[col] if isinstance(df[col].dtype, pd.CategoricalDtype) else df[col].astype('category')
+        # .array.codes não copia: com a geração mapeada, os códigos ficam no arquivo
+        codes[col] = np.asarray(values.array.codes)
+        categories[col] = values.cat.categories
+    return {'df': df, 'days': days, 'codes': codes, 'categories': categories}
+
+
+def date_slice(index, start_date, end_date):
+    """Converte o período (datas ISO, inclusivas) no recorte de linhas correspondente.
+
+    Um período invertido (fim antes do início) dá um recorte vazio.
+    """
+    start = np.datetime64(start_date[:10], 'D').astype(np.int64)
+    end = np.datetime64(end_date[:10], 'D').astype(np.int64)
+    first = int(np.searchsorted(index['days'], start, side='left'))
+    return first, max(first, int(np.searchsorted(index['days'], end, side='right')))
+
+
+def value_lookup(index, col, selected):
+    """Tabela booleana por código: True para os valores selecionados."""
+    categories = index['categories'][col]
+    positions = categories.get_indexer(list(selected))
+    # Posição extra no fim para o código -1 (valor ausente), que nunca casa
+    lookup = np.zeros(len(categories) + 1, dtype=bool)
+    lookup[positions[positions >= 0]] = True
+    return lookup
+
+
+# =====================================================================
+# ÍNDICE DE PREFIXOS PARA BUSCA DE OPÇÕES (TYPEAHEAD)
+# =====================================================================
+# Para cada valor distinto da coluna, guarda o trecho do texto normalizado
+# (ver normalize.search_keys) que começa em cada palavra, num array ordenado.
+# Os valores com alguma palavra começando pelo texto digitado formam um
+# intervalo contíguo, achado por busca binária: 'drog' encontra
+# '400110130-DROGARIA ARAUJO'. O índice tem o tamanho do dicionário de
+# valores, não o das linhas.
+def build_prefix_index(keys):
+    """Índice de prefixos de palavras para as chaves normalizadas de cada categoria."""
+    suffixes, owners = [], []
+    for position, key in enumerate(keys):
+        for word in re.finditer(r'\w+', key):
+            suffixes.append(key[word.start():])
+            owners.append(position)
+    suffixes = np.asarray(suffixes, dtype=object)
+    order = np.argsort(suffixes, kind='stable')
+    return {'keys': suffixes[order], 'owners': np.asarray(owners, dtype=np.int64)[order]}
+
+
+def prefix_lookup(index, prefix):
+    """Posições (categorias) com alguma palavra começando por `prefix` (já normalizado)."""
+    start = np.searchsorted(index['keys'], prefix, side='left')
+    stop = np.searchsorted(index['keys'], prefix + '\U0010ffff', side='left')
+    return np.unique(index['owners'][start:stop])
@@ -0,0 +1,152 @@
+import numpy as np
+import pandas as pd
+
+from indexes import DATE_COLUMN
+
+
+# Chave de uma vaga para a mesclagem incremental (upsert)
+MERGE_KEY = ['Código da Requisição', 'Código da Vaga']
+
+
+# =====================================================================
+# HASHES DE LINHA E DE CHAVE
+# =====================================================================
+# O hash da linha detecta vagas alteradas; o hash da chave localiza a vaga na
+# base. Numéricos e datas são normalizados antes do hash, para que o mesmo
+# valor dê o mesmo hash mesmo que o tipo compacto mude entre arquivos (ex.:
+# int8 em um, float32 em outro por causa de um valor ausente).
+def _hashable(df):
+    columns = {}
+    for col in df.columns:
+        kind = df[col].dtype.kind if not isinstance(df[col].dtype, pd.CategoricalDtype) else 'O'
+        if kind in 'iuf':
+            columns[col] = df[col].to_numpy(dtype=np.float64, na_value=np.nan)
+        elif kind == 'M':
+            columns[col] = df[col].to_numpy().astype('datetime64[s]').astype(np.int64)
+        else:
+            columns[col] = df[col]
+    return pd.DataFrame(columns, index=df.index)
+
+
+def row_hashes(df):
+    """Hash de 64 bits de cada linha (todas as colunas)."""
+    return pd.util.hash_pandas_object(_hashable(df), index=False).to_numpy()
+
+
+def key_index(df):
+    """Índice das chaves: hashes ordenados e a posição da linha de cada um."""
+    hashes = pd.util.hash_pandas_object(df[MERGE_KEY], index=False).to_numpy()
+    order = np.argsort(hashes, kind='stable')
+    return hashes[order], order.astype(np.int64)
+
+
+# =====================================================================
+# MESCLAGEM INCREMENTAL (UPSERT POR CHAVE)
+# =====================================================================
+# As linhas do arquivo de atualização são localizadas pela chave na base
+# atual: chaves novas são inseridas, linhas com hash diferente substituem a
+# anterior e linhas iguais são ignoradas. Nada é reordenado do zero: as
+# linhas mantidas continuam em ordem de data e as novas (já ordenadas pelo
+# parse) entram pelas posições de busca binária, como numa ordenação
+# estável de [mantidas, novas]. O custo de hash, parse e ordenação é o do
+# arquivo de atualização; o histórico só é copiado para a nova geração.
+def _insert_positions(kept_keys, added_keys):
+    """Posições finais de itens ordenados inseridos (após os iguais) numa sequência ordenada."""
+    return np.searchsorted(kept_keys, added_keys, side='right') + np.arange(len(added_keys))
+
+
+def _merge_column(old, new, kept, added, kept_pos, added_pos, size):
+    """Coluna da base mesclada: linhas mantidas da base e linhas novas nas posições finais."""
+    if isinstance(old.dtype, pd.CategoricalDtype) or isinstance(new.dtype, pd.CategoricalDtype):
+        old, new = old.astype('category'), new.astype('category')
+        categories = old.cat.categories.union(new.cat.categories)
+        # Posição extra no fim para o código -1 (valor ausente)
+        old_map = np.append(categories.get_indexer(old.cat.categories), -1)
+        new_map = np.append(categories.get_indexer(new.cat.categories), -1)
+        codes = np.empty(size, dtype=np.int8 if len(categories) < 127 else np.int32)
+        codes[kept_pos] = old_map[np.asarray(old.array.codes)[kept]]
+        codes[added_pos] = new_map[np.asarray(new.array.codes)[added]]
+        return pd.Categorical.from_codes(codes, categories=categories)
+
+    old_values, new_values = old.to_numpy(), new.to_numpy()
+    if old_values.dtype.kind == 'M' or old_values.dtype.kind in 'iuf' and new_values.dtype.kind in 'iuf':
+        dtype = np.result_type(old_values.dtype, new_values.dtype)
+    else:
+        dtype = object
+    values = np.empty(size, dtype=dtype)
+    values[kept_pos] = old_values[kept]
+    values[added_pos] = new_values[added]
+    return values
+
+
+def merge_rows(old_df, old_hashes, delta_df):
+    """Aplica o arquivo de atualização `delta_df` sobre a base `old_df`.
+
+    `old_hashes` tem 'row_hash' (por linha), 'key_hash' e 'key_pos' (ver
+    key_index) da base. Retorna (nova base, hashes da nova base, plano), onde
+    o plano descreve a mudança para atualizar as estruturas derivadas:
+      'old_to_new' -> nova posição de cada linha da base (-1 se substituída)
+      'removed'    -> posições (na base antiga) das linhas substituídas
+      'added'      -> posições (na nova base) das linhas inseridas ou alteradas
+      'inserted', 'updated', 'unchanged' -> contagens por tipo de linha
+    """
+    # Chave repetida no arquivo: vale a última ocorrência
+    delta_df = delta_df[~delta_df.duplicated(MERGE_KEY, keep='last')].reset_index(drop=True)
+    delta_rows = row_hashes(delta_df)
+    delta_keys = pd.util.hash_pandas_object(delta_df[MERGE_KEY], index=False).to_numpy()
+
+    key_hash, key_pos = old_hashes['key_hash'], old_hashes['key_pos']
+    found_at = np.minimum(np.searchsorted(key_hash, delta_keys), max(len(key_hash) - 1, 0))
+    found = (key_hash[found_at] == delta_keys) if len(key_hash) else np.zeros(len(delta_df), dtype=bool)
+    matched = key_pos[found_at[found]]
+    same = np.zeros(len(delta_df), dtype=bool)
+    same[found] = np.asarray(old_hashes['row_hash'])[matched] == delta_rows[found]
+
+    added = np.flatnonzero(~same)
+    removed = np.sort(matched[~same[found]])
+    kept = np.ones(len(old_df), dtype=bool)
+    kept[removed] = False
+    kept = np.flatnonzero(kept)
+
+    # Novas linhas entram após as mantidas de mesma data (ordenação estável)
+    size = len(kept) + len(added)
+    old_dates = old_df[DATE_COLUMN].to_numpy()
+    delta_dates = delta_df[DATE_COLUMN].to_numpy().astype(old_dates.dtype)
+    added_pos = _insert_positions(old_dates[kept], delta_dates[added])
+    is_added = np.zeros(size, dtype=bool)
+    is_added[added_pos] = True
+    kept_pos = np.flatnonzero(~is_added)
+    old_to_new = np.full(len(old_df), -1, dtype=np.int64)
+    old_to_new[kept] = kept_pos
+
+    merged = pd.DataFrame({
+        col: _merge_column(old_df[col], delta_df[col], kept, added, kept_pos, added_pos, size)
+        for col in old_df.columns
+    })
+
+    row_hash = np.empty(size, dtype=np.uint64)
+    row_hash[kept_pos] = np.asarray(old_hashes['row_hash'])[kept]
+    row_hash[added_pos] = delta_rows[added]
+
+    # Índice das chaves: remove as substituídas e insere as novas, sem reordenar tudo
+    still = old_to_new[key_pos] >= 0
+    kept_keys, kept_key_pos = key_hash[still], old_to_new[key_pos[still]]
+    order = np.argsort(delta_keys[added], kind='stable')
+    new_keys = delta_keys[added][order]
+    at = _insert_positions(kept_keys, new_keys)
+    new_key_hash = np.empty(size, dtype=np.uint64)
+    new_key_pos = np.empty(size, dtype=np.int64)
+    slots = np.ones(size, dtype=bool)
+    slots[at] = False
+    new_key_hash[slots], new_key_pos[slots] = kept_keys, kept_key_pos
+    new_key_hash[at], new_key_pos[at] = new_keys, added_pos[order]
+
+    plan = {
+        'old_to_new': old_to_new,
+        'removed': removed,
+        'added': added_pos,
+        'inserted': int((~found).sum()),
+        'updated': len(removed),
+        'unchanged': int(same.sum()),
+    }
+    return merged, {'row_hash': row_hash, 'key_hash': new_key_hash, 'key_pos': new_key_pos}, plan
@@ -0,0 +1,298 @@
+import collections
+import contextlib
+import glob
+import json
+import os
+import sys
+import threading
+import time
+
+import flask
+
+
+# Diretório dos snapshots de cada processo e dos perfis de requisições lentas
+METRICS_DIR = os.path.join('data', 'metrics')
+PROFILES_DIR = os.path.join('data', 'profiles')
+
+# Intervalo mínimo entre gravações do snapshot de um processo (s)
+FLUSH_INTERVAL = 1.0
+
+# Limites dos histogramas: tempo (s), bytes e linhas
+TIME_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (1e3, 5e3, 1e4, 5e4, 1e5, 2.5e5, 5e5, 1e6, 5e6)
+ROW_BUCKETS = (10, 100, 1e3, 1e4, 1e5, 1e6, 1e7)
+
+# Com DASHBOARD_PROFILE_SLOW_MS=<ms>, requisições de callback mais lentas que isso gravam um perfil
+PROFILE_SLOW_MS = float(os.environ.get('DASHBOARD_PROFILE_SLOW_MS') or 0)
+
+# Intervalo entre amostras da pilha no perfil (s)
+PROFILE_INTERVAL = 0.005
+
+# Rotas medidas: callbacks (rótulo = primeiro Output) e layout inicial
+INSTRUMENTED_PATHS = ('/_dash-update-component', '/_dash-layout')
+
+
+# =====================================================================
+# MÉTRICAS NO FORMATO TEXTO DO PROMETHEUS
+# =====================================================================
+# Contadores e histogramas ficam em memória, por processo. Cada processo
+# grava de tempos em tempos (no fim das requisições) um snapshot em
+# METRICS_DIR/<pid>.json; a rota /metrics, atendida por qualquer worker do
+# gunicorn, soma os snapshots dos processos vivos. Os contadores que já
+# existem em outros objetos (acertos do cache, chamadas coalescidas) entram
+# por coletores, lidos a cada snapshot.
+METRICS = {
+    'dashboard_callback_seconds': ('histogram', "Tempo de resposta dos callbacks (s)", TIME_BUCKETS),
+    'dashboard_callback_response_bytes': ('histogram', "Tamanho da resposta serializada dos callbacks", SIZE_BUCKETS),
+    'dashboard_callback_wire_bytes': ('histogram', "Bytes enviados nas respostas dos callbacks, por codificação", SIZE_BUCKETS),
+    'dashboard_callback_requests_total': ('counter', "Requisições de callback por status HTTP", None),
+    'dashboard_load_data_seconds': ('histogram', "Tempo de abertura (ou publicação) da geração dos dados (s)", TIME_BUCKETS),
+    'dashboard_query_seconds': ('histogram', "Tempo de cálculo das consultas fora do cache (s)", TIME_BUCKETS),
+    'dashboard_query_rows_scanned': ('histogram', "Linhas (ou células do cubo) no período da consulta", ROW_BUCKETS),
+    'dashboard_query_rows_selected': ('histogram', "Linhas (ou células do cubo) após os filtros", ROW_BUCKETS),
+    'dashboard_ingestion_seconds': ('histogram', "Duração da ingestão de um upload (s)", TIME_BUCKETS),
+    'dashboard_ingestion_errors_total': ('counter', "Ingestões de upload com erro", None),
+    'dashboard_cache_hits_total': ('counter', "Acertos dos caches em memória", None),
+    'dashboard_cache_misses_total': ('counter', "Faltas dos caches em memória", None),
+    'dashboard_singleflight_shared_total': ('counter', "Chamadas que esperaram um cálculo idêntico em andamento", None),
+    'dashboard_profiles_total': ('counter', "Perfis gravados de requisições lentas", None),
+}
+
+_lock = threading.Lock()
+_series = {name: {} for name in METRICS} # nome -> {rótulos: valor ou [contagens por faixa..., soma]}
+_collectors = []
+_last_flush = [0.0]
+
+
+def _labels(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def inc(name, value=1, **labels):
+    """Soma ao contador."""
+    key = _labels(labels)
+    with _lock:
+        _series[name][key] = _series[name].get(key, 0) + value
+
+
+def observe(name, value, **labels):
+    """Registra um valor no histograma."""
+    buckets = METRICS[name][2]
+    key = _labels(labels)
+    with _lock:
+        counts = _series[name].get(key)
+        if counts is None:
+            counts = _series[name][key] = [0] * (len(buckets) + 2)
+        for i, limit in enumerate(buckets):
+            if value <= limit:
+                counts[i] += 1
+                break
+        else:
+            counts[len(buckets)] += 1
+        counts[-1] += value
+
+
+@contextlib.contextmanager
+def timed(name, **labels):
+    """Mede o tempo do bloco no histograma (também quando o bloco levanta exceção)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start, **labels)
+
+
+def register_collector(collect):
+    """Registra uma função que devolve [(nome do contador, {rótulos}, valor acumulado)]."""
+    _collectors.append(collect)
+
+
+def snapshot():
+    """Valores atuais deste processo (serializáveis em JSON)."""
+    with _lock:
+        series = {name: [[list(key), value] for key, value in values.items()] for name, values in _series.items()}
+    for collect in _collectors:
+        for name, labels, value in collect():
+            series[name].append([list(_labels(labels)), value])
+    return series
+
+
+def flush(force=False):
+    """Grava o snapshot deste processo (no máximo a cada FLUSH_INTERVAL, salvo com force)."""
+    now = time.monotonic()
+    if not force and now - _last_flush[0] < FLUSH_INTERVAL:
+        return
+    _last_flush[0] = now
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    path = os.path.join(METRICS_DIR, f'{os.getpid()}.json')
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(snapshot(), f)
+    os.replace(tmp_path, path)
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _merged():
+    """Soma dos snapshots de todos os processos vivos (os de processos encerrados são apagados)."""
+    flush(force=True)
+    merged = {name: {} for name in METRICS}
+    for path in glob.glob(os.path.join(METRICS_DIR, '*.json')):
+        pid = int(os.path.basename(path).split('.')[0])
+        if not _alive(pid):
+            with contextlib.suppress(OSError):
+                os.remove(path)
+            continue
+        try:
+            with open(path, encoding='utf-8') as f:
+                series = json.load(f)
+        except (OSError, ValueError):
+            continue
+        for name, values in series.items():
+            if name not in merged:
+                continue
+            for labels, value in values:
+                key = tuple(map(tuple, labels))
+                current = merged[name].get(key)
+                if current is None:
+                    merged[name][key] = value
+                elif isinstance(value, list):
+                    merged[name][key] = [a + b for a, b in zip(current, value)]
+                else:
+                    merged[name][key] = current + value
+    return merged
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+def render():
+    """Todas as métricas no formato texto do Prometheus (versão 0.0.4)."""
+    lines = []
+    for name, values in _merged().items():
+        kind, description, buckets = METRICS[name]
+        lines.append(f'# HELP {name} {description}')
+        lines.append(f'# TYPE {name} {kind}')
+        for labels, value in sorted(values.items()):
+            if kind == 'counter':
+                lines.append(f'{name}{_format_labels(labels)} {value}')
+                continue
+            cumulative = 0
+            for limit, count in zip(list(buckets) + ['+Inf'], value[:-1]):
+                cumulative += count
+                le = limit if limit == '+Inf' else f'{limit:g}'
+                lines.append(f'{name}_bucket{_format_labels(labels, [("le", le)])} {cumulative}')
+            lines.append(f'{name}_sum{_format_labels(labels)} {value[-1]}')
+            lines.append(f'{name}_count{_format_labels(labels)} {cumulative}')
+    return '\n'.join(lines) + '\n'
+
+
+# =====================================================================
+# PERFIL POR AMOSTRAGEM DAS REQUISIÇÕES LENTAS (OPCIONAL)
+# =====================================================================
+# Com DASHBOARD_PROFILE_SLOW_MS definido, cada requisição de callback ganha
+# uma thread que lê a pilha da thread da requisição a cada PROFILE_INTERVAL
+# (sys._current_frames, sem instrumentar as funções). Se a requisição
+# passar do limite, as pilhas amostradas vão para PROFILES_DIR no formato
+# "folded" (uma pilha por linha com a contagem), lido por flamegraph.pl ou
+# speedscope; senão, são descartadas.
+class SamplingProfiler:
+    """Amostra a pilha de uma thread em intervalos fixos, até stop()."""
+
+    def __init__(self, thread_id, interval=PROFILE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = collections.Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='perfil', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                module = frame.f_globals.get('__name__') or os.path.basename(frame.f_code.co_filename)
+                stack.append(f'{module}:{frame.f_code.co_name}')
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self.stacks
+
+
+def _save_profile(label, elapsed, stacks):
+    os.makedirs(PROFILES_DIR, exist_ok=True)
+    safe = ''.join(c if c.isalnum() or c in '-_.' else '_' for c in label)[:60]
+    path = os.path.join(PROFILES_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{safe}.folded")
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(f'# {label} {elapsed * 1000:.0f} ms, amostras a cada {PROFILE_INTERVAL * 1000:g} ms\n')
+        for stack, count in stacks.most_common():
+            f.write(f'{stack} {count}\n')
+    inc('dashboard_profiles_total', callback=label)
+
+
+# =====================================================================
+# MEDIÇÃO DAS REQUISIÇÕES DO DASH NO SERVIDOR FLASK
+# =====================================================================
+def callback_label(payload):
+    """Rótulo de um callback: o primeiro Output ('id.propriedade'; ids de padrão pelo 'type')."""
+    output = (payload or {}).get('output') or ''
+    first = output.strip('.').split('...')[0].split('@')[0]
+    component_id, _, prop = first.rpartition('.')
+    if component_id.startswith('{'):
+        with contextlib.suppress(ValueError):
+            component_id = json.loads(component_id).get('type', component_id)
+    return f'{component_id}.{prop}' if prop else 'desconhecido'
+
+
+def instrument_server(server):
+    """Mede tempo, status e tamanho (serializado e enviado) das respostas dos callbacks e do layout no servidor Flask."""
+    @server.before_request
+    def _start_metrics():
+        request = flask.request
+        if request.path not in INSTRUMENTED_PATHS:
+            return
+        if request.path == '/_dash-layout':
+            label = 'layout'
+        else:
+            label = callback_label(request.get_json(silent=True))
+        profiler = SamplingProfiler(threading.get_ident()) if PROFILE_SLOW_MS else None
+        flask.g.metrics = (label, time.perf_counter(), profiler)
+
+    @server.after_request
+    def _finish_metrics(response):
+        started = flask.g.pop('metrics', None)
+        if started is None:
+            return response
+        label, start, profiler = started
+        elapsed = time.perf_counter() - start
+        observe('dashboard_callback_seconds', elapsed, callback=label)
+        inc('dashboard_callback_requests_total', callback=label, status=response.status_code)
+        if not response.direct_passthrough:
+            wire = response.calculate_content_length() or 0
+            # Tamanho antes da compressão, guardado por compression.py (sem compressão, é o mesmo)
+            observe('dashboard_callback_response_bytes', flask.g.pop('uncompressed_bytes', wire), callback=label)
+            observe('dashboard_callback_wire_bytes', wire, callback=label, encoding=response.content_encoding or 'identity')
+        if profiler is not None:
+            stacks = profiler.stop()
+            if elapsed * 1000 >= PROFILE_SLOW_MS and stacks:
+                _save_profile(label, elapsed, stacks)
+        flush()
+        return response
@@ -0,0 +1,103 @@
+import re
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+
+# =====================================================================
+# NORMALIZAÇÃO NA INGESTÃO (PORTE DAS MACROS DE Dashboard_BI.bas)
+# =====================================================================
+# Roda uma única vez por arquivo, antes da gravação da geração: os valores
+# já limpos ficam no snapshot e nenhuma consulta repete a limpeza. Em colunas
+# categóricas só o dicionário de valores distintos é tratado (centenas de
+# itens, não milhões de linhas) e os códigos são remapeados de uma vez.
+# Toda regra é função apenas do próprio valor, então base e arquivos de
+# atualização normalizados em momentos diferentes continuam batendo na
+# mesclagem (ver merge.py).
+
+# Colunas de pessoas (recrutador e hierarquia de gestão): nomes canônicos
+PEOPLE_COLUMNS = ['RECRUTADOR', 'COO', 'Executivo', 'Diretor', 'Gerente', 'Coordenador', 'Supervisor']
+
+# Variações conhecidas de nomes, já sem acentos e em maiúsculas: todo nome que
+# começa com o prefixo vira o nome canônico (como LimparNomesRecrutadores)
+NAME_ALIASES = {
+    'BRUNA SO': 'BRUNA SOUZA',
+}
+
+# Valor atribuído a células vazias, por coluna (as demais ficam ausentes)
+FILL_VALUES = {'STATUS': 'Não especificado'}
+
+# Caracteres de controle (quebras de linha, tabulações), removidos como no CLEAN do Excel
+_CONTROL = r'[\x00-\x1f\x7f]+'
+
+
+def fold_accents(values):
+    """Remove acentos e cedilhas (decomposição Unicode), como RemoverAcentos."""
+    return values.str.normalize('NFKD').str.replace(r'[\u0300-\u036f]', '', regex=True)
+
+
+def collapse_spaces(values):
+    """TRIM(CLEAN()): sem caracteres de controle, espaços repetidos nem nas pontas."""
+    return values.str.replace(_CONTROL, ' ', regex=True).str.replace(r'\s+', ' ', regex=True).str.strip()
+
+
+def canonical_names(values):
+    """Nome canônico de pessoas: sem acentos, maiúsculas, espaços simples e aliases."""
+    values = fold_accents(collapse_spaces(values)).str.upper()
+    for prefix, name in NAME_ALIASES.items():
+        values = values.where(~values.str.startswith(prefix), name)
+    return values
+
+
+def search_keys(values):
+    """Chaves de comparação de textos: sem acentos, espaços extras nem diferença de caixa."""
+    return fold_accents(collapse_spaces(values)).str.casefold()
+
+
+def text_key(text):
+    """Mesma chave de search_keys, para um único texto (ex.: o digitado numa busca)."""
+    text = unicodedata.normalize('NFKD', str(text))
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    return re.sub(r'\s+', ' ', re.sub(_CONTROL, ' ', text)).strip().casefold()
+
+
+def header_key(name):
+    """Chave de comparação de um cabeçalho (ver text_key).
+
+    Aceita tanto o cabeçalho original quanto o padronizado por
+    PadronizarCabecalhos (ex.: 'Grupo Economico').
+    """
+    return text_key(name)
+
+
+def _recode(series, values, fill_value=None):
+    """Coluna categórica com as categorias trocadas por `values`, unindo as que ficarem iguais.
+
+    Valores vazios viram `fill_value` (ou ausentes, se None).
+    """
+    # Posição extra no fim para o código -1 (valor ausente)
+    values = np.append(np.asarray(values, dtype=object), None)
+    missing = pd.isna(values) | (values == '')
+    if fill_value is not None:
+        values[missing] = fill_value
+        missing[:] = False
+    uniques, inverse = np.unique(values[~missing], return_inverse=True)
+    mapping = np.full(len(values), -1, dtype=np.int64)
+    mapping[~missing] = inverse
+    codes = mapping.take(series.cat.codes.to_numpy())
+    return pd.Series(pd.Categorical.from_codes(codes, categories=uniques), index=series.index)
+
+
+def normalize_frame(df):
+    """Normaliza as colunas de texto e categorias do DataFrame lido (no lugar)."""
+    for name in df.columns:
+        series = df[name]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            categories = pd.Series(series.cat.categories, dtype='str')
+            clean = canonical_names(categories) if name in PEOPLE_COLUMNS else collapse_spaces(categories)
+            df[name] = _recode(series, clean, FILL_VALUES.get(name))
+        elif pd.api.types.is_string_dtype(series.dtype):
+            # Texto livre (ex.: Anotações) mantém as quebras de linha internas
+            df[name] = series.str.strip().replace('', np.nan)
+    return df
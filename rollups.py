@@ -0,0 +1,171 @@
+import numpy as np
+import pandas as pd
+
+from indexes import DATE_COLUMN
+
+
+# Data em que a vaga foi finalizada (vazia ou anterior à abertura: ainda aberta)
+FINISH_COLUMN = 'Finalizada'
+
+# Dimensões das séries de tendência
+ROLLUP_DIMENSIONS = ['Grupo Econômico', 'UF da OI']
+
+# Medidas contadas por dia
+ROLLUP_MEASURES = ['opened', 'finished', 'fora_sla']
+
+# Granularidades da tendência (frequências do pandas)
+PERIODS = {'week': 'W-SUN', 'month': 'M'}
+
+
+# =====================================================================
+# ROLLUPS DIÁRIOS COM SOMAS ACUMULADAS (TENDÊNCIA DO SLA)
+# =====================================================================
+# Para cada combinação observada de grupo x UF (uma "célula") e cada dia do
+# histórico, conta:
+#   opened   -> vagas abertas no dia ('Recrutamento e Seleção')
+#   finished -> vagas finalizadas no dia ('Finalizada')
+#   fora_sla -> vagas abertas no dia que estão fora do SLA
+# Os contadores são guardados já acumulados (uma coluna de zeros na frente),
+# então o total de qualquer período é a diferença de duas posições e o
+# backlog ao fim de um dia é abertas - finalizadas acumuladas até ele. Uma
+# janela do filtro de datas custa O(dias x células selecionadas), sem
+# voltar às linhas; as somas são montadas uma vez por versão dos dados.
+def _day_numbers(values):
+    return values.to_numpy().astype('datetime64[D]').astype(np.int64)
+
+
+def build_rollups(df):
+    """Contadores diários acumulados por célula (grupo x UF) de um DataFrame."""
+    opened = _day_numbers(df[DATE_COLUMN])
+    finish = df[FINISH_COLUMN]
+    # A exportação usa 31/12/1900 para 'sem data': só vale finalização a partir da abertura
+    finished = finish.notna().to_numpy() & (finish >= df[DATE_COLUMN]).to_numpy()
+    finish_days = _day_numbers(finish.where(finished, df[DATE_COLUMN]))
+
+    first = int(opened.min()) if len(opened) else 0
+    days = (int(max(opened.max(), finish_days.max())) - first + 1) if len(opened) else 0
+
+    categories, cell_key = {}, np.zeros(len(df), dtype=np.int64)
+    for col in ROLLUP_DIMENSIONS:
+        values = df[col] if isinstance(df[col].dtype, pd.CategoricalDtype) else df[col].astype('category')
+        categories[col] = values.cat.categories
+        # +1: o código -1 (valor ausente) também forma células
+        cell_key = cell_key * (len(categories[col]) + 1) + np.asarray(values.array.codes) + 1
+    keys, cell = np.unique(cell_key, return_inverse=True)
+    cells = len(keys)
+
+    cell_codes = {}
+    for col in reversed(ROLLUP_DIMENSIONS):
+        keys, code = np.divmod(keys, len(categories[col]) + 1)
+        cell_codes[col] = code - 1
+
+    def prefix(day, weights):
+        counts = np.bincount(cell * days + (day - first), weights=weights, minlength=cells * days).astype(np.int32)
+        totals = np.zeros((cells, days + 1), dtype=np.int32)
+        np.cumsum(counts.reshape(cells, days), axis=1, out=totals[:, 1:])
+        return totals
+
+    return {
+        'first': first,
+        'days': days,
+        'codes': cell_codes,
+        'categories': categories,
+        'prefix': {
+            'opened': prefix(opened, None),
+            'finished': prefix(finish_days, finished),
+            'fora_sla': prefix(opened, (df['Situação Vagas'] == 'Fora do SLA').to_numpy()),
+        },
+    }
+
+
+def update_rollups(rollups, added, removed):
+    """Rollups atualizados por linhas inseridas (`added`) e retiradas (`removed`) da base.
+
+    As somas das linhas retiradas são subtraídas e as das inseridas somadas,
+    célula a célula, no calendário que cobre as três partes (antes do
+    primeiro dia as somas são zero, depois do último repetem o total).
+    Células sem vagas saem. O custo é o do tamanho dos rollups e da
+    atualização, não o das linhas do histórico.
+    """
+    parts = [(rollups, 1), (build_rollups(added), 1), (build_rollups(removed), -1)]
+    parts = [(part, sign) for part, sign in parts if part['days']]
+    if not parts:
+        return build_rollups(added)
+    first = min(part['first'] for part, _ in parts)
+    days = max(part['first'] + part['days'] for part, _ in parts) - first
+
+    # Mesmas categorias nas três partes (a atualização pode trazer valores novos)
+    categories = {}
+    for col in ROLLUP_DIMENSIONS:
+        categories[col] = parts[0][0]['categories'][col]
+        for part, _ in parts[1:]:
+            categories[col] = categories[col].union(part['categories'][col])
+    part_keys = []
+    for part, _ in parts:
+        cell_key = np.zeros(len(part['codes'][ROLLUP_DIMENSIONS[0]]), dtype=np.int64)
+        for col in ROLLUP_DIMENSIONS:
+            positions = np.append(categories[col].get_indexer(part['categories'][col]), -1)
+            cell_key = cell_key * (len(categories[col]) + 1) + positions[part['codes'][col]] + 1
+        part_keys.append(cell_key)
+    keys, cell = np.unique(np.concatenate(part_keys), return_inverse=True)
+    cell = np.split(cell, np.cumsum([len(k) for k in part_keys])[:-1])
+
+    prefix = {name: np.zeros((len(keys), days + 1), dtype=np.int32) for name in ROLLUP_MEASURES}
+    for (part, sign), rows in zip(parts, cell):
+        before = part['first'] - first
+        after = days - before - part['days']
+        for name in ROLLUP_MEASURES:
+            # As células de uma mesma parte são distintas: a soma por índice não repete linhas
+            prefix[name][rows] += sign * np.pad(part['prefix'][name], ((0, 0), (before, after)), mode='edge')
+
+    keep = prefix['opened'][:, -1] > 0
+    keys = keys[keep]
+    cell_codes = {}
+    for col in reversed(ROLLUP_DIMENSIONS):
+        keys, code = np.divmod(keys, len(categories[col]) + 1)
+        cell_codes[col] = code - 1
+    return {
+        'first': first,
+        'days': days,
+        'codes': cell_codes,
+        'categories': categories,
+        'prefix': {name: values[keep] for name, values in prefix.items()},
+    }
+
+
+def select_cells(rollups, filters):
+    """Células que atendem aos filtros de grupo e UF (listas de valores; vazio = todos)."""
+    mask = np.ones(len(rollups['codes'][ROLLUP_DIMENSIONS[0]]), dtype=bool)
+    for col in ROLLUP_DIMENSIONS:
+        selected = filters.get(col)
+        if selected:
+            wanted = rollups['categories'][col].get_indexer(pd.Index(selected))
+            mask &= np.isin(rollups['codes'][col], wanted[wanted >= 0])
+    return np.flatnonzero(mask)
+
+
+def period_edges(rollups, start_date, end_date, period):
+    """Rótulos dos períodos da janela e seus limites em posições das somas acumuladas.
+
+    Cada período vai de `starts[i]` (exclusivo) a `ends[i]` (inclusivo) na
+    numeração das colunas acumuladas; o primeiro e o último são cortados
+    pela janela.
+    """
+    start, end = pd.Timestamp(start_date[:10]), pd.Timestamp(end_date[:10])
+    if end < start:
+        return [], np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    periods = pd.period_range(start, end, freq=PERIODS[period])
+    first_days = np.maximum(periods.start_time.normalize(), start)
+    last_days = np.minimum(periods.end_time.normalize(), end)
+    starts = _day_numbers(pd.Series(first_days)) - rollups['first']
+    ends = _day_numbers(pd.Series(last_days)) - rollups['first'] + 1
+    labels = [day.strftime('%Y-%m-%d') for day in first_days]
+    return labels, np.clip(starts, 0, rollups['days']), np.clip(ends, 0, rollups['days'])
+
+
+def trend_totals(rollups, cells, starts, ends):
+    """Abertas, finalizadas e fora do SLA de cada período, e o backlog ao fim dele, por célula."""
+    prefix = {name: rollups['prefix'][name][cells] for name in ROLLUP_MEASURES}
+    totals = {name: values[:, ends] - values[:, starts] for name, values in prefix.items()}
+    totals['backlog'] = prefix['opened'][:, ends] - prefix['finished'][:, ends]
+    return totals
@@ -0,0 +1,137 @@
+import numpy as np
+import pandas as pd
+
+from normalize import search_keys, text_key
+
+
+# Colunas pesquisadas pela caixa de busca do dashboard
+SEARCH_COLUMNS = ['Anotações', 'Título do Cargo', 'Endereço Completo da OI', 'Localidade']
+
+# Termos com menos caracteres que isto não usam o índice de trigramas
+TRIGRAM = 3
+
+
+# =====================================================================
+# ÍNDICE INVERTIDO DE TRIGRAMAS (BUSCA TEXTUAL SEM ACENTOS)
+# =====================================================================
+# O texto se repete muito entre vagas (o mesmo cargo, endereço ou bloco de
+# benefícios em centenas de linhas), então o índice é montado sobre os
+# valores distintos de cada coluna, não sobre as linhas: cada valor vira
+# uma chave normalizada (ver normalize.search_keys) e cada trigrama da chave
+# aponta para os valores que o contêm. Uma busca intersecta as listas dos
+# trigramas de cada termo, confirma os candidatos com a busca do termo na
+# chave e leva os valores encontrados às linhas pelos códigos da coluna
+# (uma tabela booleana indexada pelo código, como em indexes.value_lookup).
+# Termos são combinados com AND; colunas, com OR.
+def _trigram_postings(keys):
+    """Trigramas distintos (ordenados) e, para cada um, os valores que o contêm."""
+    grams, owners = [], []
+    for position, key in enumerate(keys):
+        for gram in {key[i:i + TRIGRAM] for i in range(len(key) - TRIGRAM + 1)}:
+            grams.append(gram)
+            owners.append(position)
+    grams = np.asarray(grams, dtype=object)
+    owners = np.asarray(owners, dtype=np.int64)
+    # Ordenação estável: dentro de cada trigrama, os valores ficam em ordem crescente
+    order = np.argsort(grams, kind='stable')
+    grams, owners = grams[order], owners[order]
+    distinct, starts = np.unique(grams, return_index=True)
+    return {'grams': distinct, 'starts': np.append(starts, len(grams)), 'owners': owners}
+
+
+def _column_codes(values):
+    """Códigos por linha e valores distintos de uma coluna (categórica: sem copiar os códigos)."""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return np.asarray(values.array.codes), values.cat.categories
+    codes, uniques = pd.factorize(values)
+    return codes.astype(np.int32), uniques
+
+
+def build_search_index(df, columns=SEARCH_COLUMNS):
+    """Índice de busca textual das colunas dadas de um DataFrame."""
+    index = {'rows': len(df), 'columns': {}}
+    for col in columns:
+        codes, uniques = _column_codes(df[col])
+        keys = search_keys(pd.Series(uniques, dtype='str')).to_numpy(dtype=object)
+        index['columns'][col] = {'codes': codes, 'values': uniques, 'keys': keys, 'postings': _trigram_postings(keys)}
+    return index
+
+
+def _merge_postings(postings, old_to_new, added, added_positions):
+    """Listas de trigramas com os valores renumerados, sem os retirados e com os novos."""
+    grams = np.union1d(postings['grams'], added['grams'])
+    gram_codes = np.concatenate([
+        np.repeat(np.searchsorted(grams, part['grams']), np.diff(part['starts'])) for part in (postings, added)
+    ])
+    owners = np.concatenate([old_to_new[postings['owners']], added_positions[added['owners']]])
+    keep = owners >= 0
+    gram_codes, owners = gram_codes[keep], owners[keep]
+    order = np.lexsort((owners, gram_codes))
+    gram_codes, owners = gram_codes[order], owners[order]
+    used, starts = np.unique(gram_codes, return_index=True)
+    return {'grams': grams[used], 'starts': np.append(starts, len(owners)), 'owners': owners}
+
+
+def update_search_index(index, df, columns=SEARCH_COLUMNS):
+    """Índice de busca de uma nova versão dos dados, a partir do índice da versão anterior.
+
+    Só os valores distintos que não existiam têm a chave e os trigramas
+    calculados; os demais são renumerados. Os códigos por linha são os da
+    nova versão (vistas da geração mapeada).
+    """
+    updated = {'rows': len(df), 'columns': {}}
+    for col in columns:
+        column = index['columns'][col]
+        codes, uniques = _column_codes(df[col])
+        old_to_new = pd.Index(uniques).get_indexer(column['values'])
+        reused = pd.Index(column['values']).get_indexer(uniques)
+        fresh = np.flatnonzero(reused < 0)
+        keys = np.empty(len(uniques), dtype=object)
+        keys[reused >= 0] = column['keys'][reused[reused >= 0]]
+        keys[fresh] = search_keys(pd.Series(uniques[fresh], dtype='str')).to_numpy(dtype=object)
+        postings = _merge_postings(column['postings'], old_to_new, _trigram_postings(keys[fresh]), fresh)
+        updated['columns'][col] = {'codes': codes, 'values': uniques, 'keys': keys, 'postings': postings}
+    return updated
+
+
+def _matching_values(column, term):
+    """Posições dos valores distintos cuja chave contém o termo (já normalizado)."""
+    keys = column['keys']
+    if len(term) < TRIGRAM:
+        candidates = range(len(keys))
+    else:
+        postings = column['postings']
+        candidates = None
+        for gram in {term[i:i + TRIGRAM] for i in range(len(term) - TRIGRAM + 1)}:
+            found = np.searchsorted(postings['grams'], gram)
+            if found == len(postings['grams']) or postings['grams'][found] != gram:
+                return np.empty(0, dtype=np.int64)
+            owners = postings['owners'][postings['starts'][found]:postings['starts'][found + 1]]
+            candidates = owners if candidates is None else np.intersect1d(candidates, owners, assume_unique=True)
+            if not len(candidates):
+                return candidates
+        candidates = candidates.tolist()
+    # Trigramas em comum não garantem o termo inteiro: confirma na chave
+    return np.asarray([i for i in candidates if term in keys[i]], dtype=np.int64)
+
+
+def search_rows(index, text):
+    """Posições das linhas em que todos os termos do texto aparecem em alguma coluna.
+
+    Retorna None se o texto não tiver termos (busca vazia: não filtra).
+    """
+    terms = text_key(text or '').split()
+    if not terms:
+        return None
+    mask = None
+    for term in terms:
+        hits = np.zeros(index['rows'], dtype=bool)
+        for column in index['columns'].values():
+            matched = _matching_values(column, term)
+            if len(matched):
+                # Posição extra no fim para o código -1 (valor ausente), que nunca casa
+                lookup = np.zeros(len(column['keys']) + 1, dtype=bool)
+                lookup[matched] = True
+                hits |= lookup[column['codes']]
+        mask = hits if mask is None else mask & hits
+    return np.flatnonzero(mask)
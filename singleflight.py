@@ -0,0 +1,88 @@
+import contextlib
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError: # Windows: sem lock entre processos
+    fcntl = None
+
+
+# =====================================================================
+# COALESCÊNCIA DE CÁLCULOS IDÊNTICOS SIMULTÂNEOS (SINGLE-FLIGHT)
+# =====================================================================
+# Quando várias sessões pedem a mesma coisa ao mesmo tempo (ex.: todos
+# abrindo o dashboard com os filtros padrão logo após a publicação de uma
+# versão), só a primeira chamada de cada chave executa o cálculo: as demais
+# esperam por ela e recebem o mesmo resultado (ou a mesma exceção). O mapa
+# das chamadas em andamento vale para as threads do processo.
+#
+# Opcionalmente, quem executa também segura um lock de arquivo com o nome
+# dado, para que processos diferentes (workers do gunicorn) façam o mesmo
+# cálculo um de cada vez em vez de disputarem a CPU. O resultado em si não
+# é compartilhado entre processos: cada um guarda o seu.
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SingleFlight:
+    """Executa uma única vez os cálculos simultâneos com a mesma chave (thread-safe).
+
+    `lock_dir` é o diretório dos locks de arquivo entre processos (None = só
+    dentro do processo).
+    """
+
+    def __init__(self, lock_dir=None):
+        self.lock_dir = lock_dir
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.shared = 0
+
+    @contextlib.contextmanager
+    def _file_lock(self, lock_name):
+        if lock_name is None or self.lock_dir is None or fcntl is None:
+            yield
+            return
+        os.makedirs(self.lock_dir, exist_ok=True)
+        with open(os.path.join(self.lock_dir, f'{lock_name}.lock'), 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def do(self, key, fn, lock_name=None):
+        """Resultado de fn() para a chave, esperando a execução em andamento se houver.
+
+        Com `lock_name` (e lock_dir), a execução também é exclusiva entre processos.
+        """
+        with self._lock:
+            self.calls += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.shared += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value
+
+        try:
+            with self._file_lock(lock_name):
+                call.value = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.value
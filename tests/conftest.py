@@ -0,0 +1,37 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'tools'))
+
+import dataset # noqa: E402
+import engine # noqa: E402
+import figures # noqa: E402
+from gen_data import generate # noqa: E402
+
+
+# Linhas da base sintética usada nos testes (ver tools/gen_data.py)
+TEST_ROWS = 3000
+
+
+@pytest.fixture(scope='session')
+def base_csv(tmp_path_factory):
+    """CSV sintético gerado uma vez por sessão de testes."""
+    path = tmp_path_factory.mktemp('base') / 'dados.csv'
+    return generate(str(path), TEST_ROWS, random_seed=0)
+
+
+@pytest.fixture
+def data_dir(base_csv, tmp_path, monkeypatch):
+    """Diretório de trabalho com data/dados.csv e caches vazios (cada teste publica sua geração)."""
+    os.makedirs(tmp_path / 'data')
+    with open(base_csv, 'rb') as src, open(tmp_path / 'data' / 'dados.csv', 'wb') as dst:
+        dst.write(src.read())
+    monkeypatch.chdir(tmp_path)
+    dataset.invalidate_cache()
+    engine._cache.clear()
+    figures._figure_cache.clear()
+    return tmp_path
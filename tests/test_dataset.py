@@ -0,0 +1,97 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+import dataset
+import engine
+
+
+def test_signal_change_does_not_reopen_generation(data_dir, monkeypatch):
+    df = dataset.get_data(update_signal='a')
+    calls = []
+    monkeypatch.setattr(dataset, 'load_generation', lambda *args: calls.append(args))
+    for signal in ('b', 'a', 'c'):
+        assert dataset.get_data(update_signal=signal) is df
+    assert calls == []
+
+
+def test_source_change_reopens_generation(data_dir):
+    df = dataset.get_data(update_signal='a')
+    with open(dataset.DATA_PATH, 'ab') as f:
+        f.write(b'\n')
+    assert dataset.get_data(update_signal='a') is df
+    assert dataset.get_data(update_signal='b') is not df
+
+
+def test_text_columns_are_categorical_codes(data_dir):
+    df = dataset.get_data()
+    for name, spec in dataset.SCHEMA.items():
+        if spec['load'] and spec['dtype'] == 'text':
+            assert isinstance(df[name].dtype, pd.CategoricalDtype), name
+
+
+DERIVED = (
+    ('engine_state', engine._build_state), ('search_index', engine.build_search_index), ('rollups', engine.build_rollups),
+)
+
+
+def _arrays(value):
+    if isinstance(value, dict):
+        for item in value.values():
+            yield from _arrays(item)
+    elif isinstance(value, np.ndarray):
+        yield value
+
+
+def _mapped(array):
+    while isinstance(array, np.ndarray):
+        if isinstance(array, np.memmap):
+            return True
+        array = array.base
+    return False
+
+
+def _new_worker():
+    """Estado de um processo que ainda não abriu nenhuma geração."""
+    dataset._cache.update(version=None, signal=None, df=None, derived={})
+    engine._cache.clear()
+
+
+def test_derived_structures_are_mapped_from_generation(data_dir):
+    df = dataset.get_data()
+    per_row = 0
+    for name, build in DERIVED:
+        arrays = list(_arrays(dataset.get_derived(name, build)))
+        # Só os textos (valores distintos) são copiados; os arrays numéricos vêm de arquivos da geração
+        for array in arrays:
+            assert array.dtype == object or (_mapped(array) and not array.flags.writeable), name
+            assert array.dtype != object or len(array) < len(df), name
+        per_row += sum(len(array) == len(df) for array in arrays)
+    assert per_row
+
+
+def test_other_workers_map_derived_structures_without_building(data_dir):
+    built = {name: dataset.get_derived(name, build) for name, build in DERIVED}
+    start, end = '2000-01-01', '2100-01-01'
+    filters = {'Status da Vaga': [], 'STATUS': [], 'Grupo Econômico': [], 'UF da OI': []}
+    expected = engine.query_dashboard(start, end, filters, 'STATUS', search='rua')
+
+    _new_worker()
+
+    def fail(df):
+        raise AssertionError("estrutura remontada")
+
+    for name, _ in DERIVED:
+        for a, b in zip(_arrays(built[name]), _arrays(dataset.get_derived(name, fail))):
+            np.testing.assert_array_equal(a, b)
+    result = engine.query_dashboard(start, end, filters, 'STATUS', search='rua')
+    assert result['total'] == expected['total'] > 0
+    assert result['top'] == expected['top']
+
+
+def test_write_derived_does_not_recreate_removed_generation(data_dir):
+    df = dataset.get_data()
+    value = {'days': np.arange(3)}
+    assert dataset.write_derived('g0-removida', 'teste', value, df) is value
+    assert not os.path.exists(os.path.join(dataset.generations_dir(), 'g0-removida'))
@@ -0,0 +1,74 @@
+import numpy as np
+
+import dataset
+import engine
+
+
+FILTERS = {'Status da Vaga': [], 'STATUS': [], 'Grupo Econômico': [], 'UF da OI': []}
+
+
+def _period(df):
+    dates = df['Recrutamento e Seleção']
+    return dates.min().strftime('%Y-%m-%d'), dates.max().strftime('%Y-%m-%d')
+
+
+def test_query_dashboard_reversed_period_is_empty(data_dir):
+    start, end = _period(dataset.get_data())
+    assert engine.query_dashboard(start, end, FILTERS, 'Status da Vaga')['total'] > 0
+
+    result = engine.query_dashboard(end, start, FILTERS, 'Status da Vaga')
+    assert result['total'] == 0
+    assert result['by_status'].empty
+    assert result['top']['total'] == 0
+
+
+def test_reversed_period_with_search_and_row_filters(data_dir):
+    df = dataset.get_data()
+    start, end = _period(df)
+    cargo = str(df['Título do Cargo'].value_counts().index[0])
+    filters = dict(FILTERS, **{'Título do Cargo': [cargo]})
+    assert engine.query_dashboard(end, start, filters, 'STATUS')['total'] == 0
+    assert engine.query_dashboard(end, start, FILTERS, 'STATUS', search='a')['total'] == 0
+
+
+def test_status_breakdown_reversed_period_is_empty(data_dir):
+    start, end = _period(dataset.get_data())
+    result = engine.status_breakdown(end, start, FILTERS, 'Status da Vaga')
+    assert result['status'] == []
+    assert result['top'] == []
+
+
+def test_query_dashboard_matches_pandas(data_dir):
+    df = dataset.get_data()
+    start, end = _period(df)
+    grupo = str(df['Grupo Econômico'].value_counts().index[0])
+    filters = dict(FILTERS, **{'Grupo Econômico': [grupo]})
+    dates = df['Recrutamento e Seleção']
+    expected = df[(df['Grupo Econômico'] == grupo) & (dates >= start) & (dates <= end + ' 23:59:59')]
+
+    result = engine.query_dashboard(start, end, filters, 'Status da Vaga')
+    assert result['total'] == len(expected)
+    by_status = expected['Status da Vaga'].value_counts()
+    assert result['by_status'].to_dict() == by_status[by_status > 0].to_dict()
+    assert np.isclose(result['sum_dias'], expected['Dias em Aberto'].sum())
+
+
+def test_search_uses_index_of_the_same_version(data_dir, monkeypatch):
+    start, end = _period(dataset.get_data())
+    expected = engine.query_dashboard(start, end, FILTERS, 'STATUS', search='rua')
+    engine._cache.clear()
+
+    # Um upload publicado entre as duas leituras: o índice de busca vem de outra versão
+    get_derived, calls = engine.get_derived, []
+
+    def racing(name, build, update_signal=None, with_version=False):
+        calls.append(name)
+        if name == 'search_index' and calls.count(name) == 1:
+            return 'outra-geracao', {'rows': 1, 'columns': {}}
+        return get_derived(name, build, update_signal, with_version)
+
+    monkeypatch.setattr(engine, 'get_derived', racing)
+    result = engine.query_dashboard(start, end, FILTERS, 'STATUS', search='rua')
+    assert calls == ['engine_state', 'search_index', 'engine_state', 'search_index']
+    assert result['total'] == expected['total'] > 0
+    assert result['key'] == expected['key']
@@ -0,0 +1,115 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import dataset
+import engine
+from gen_data import generate
+
+
+FILTERS = {'Status da Vaga': [], 'STATUS': [], 'Grupo Econômico': [], 'UF da OI': []}
+
+
+def _read(path):
+    return pd.read_csv(path, sep=';', encoding='utf-8-sig', dtype=str, keep_default_na=False)
+
+
+@pytest.fixture
+def delta_csv(data_dir, base_csv):
+    """Atualização com vagas novas, vagas da base alteradas e vagas repetidas sem mudança."""
+    base = _read(base_csv)
+    # Mesmos códigos de requisição da base: parte cai no mesmo ano (alteração), parte é vaga nova
+    fresh = _read(generate(str(data_dir / 'novas.csv'), 300, random_seed=1))
+    changed = base.iloc[100:160].copy()
+    changed['Status da Vaga'] = 'Finalizado - Vaga Preenchida'
+    changed['Dias em Aberto'] = '999'
+    delta = pd.concat([fresh, changed, base.iloc[200:240]]).sample(frac=1, random_state=0)
+    path = data_dir / 'data' / 'delta.tmp'
+    delta.to_csv(path, sep=';', index=False, encoding='utf-8-sig')
+    return str(path)
+
+
+def _queries(df):
+    dates = df['Recrutamento e Seleção']
+    start, end = dates.min().strftime('%Y-%m-%d'), dates.max().strftime('%Y-%m-%d')
+    middle = (dates.min() + (dates.max() - dates.min()) / 2).strftime('%Y-%m-%d')
+    group = str(df['Grupo Econômico'].value_counts().index[0])
+    filters = dict(FILTERS, **{'Grupo Econômico': [group]})
+    results = []
+    for first, last in ((start, end), (middle, end)):
+        for search in (None, 'rua', 'analista'):
+            result = engine.query_dashboard(first, last, filters, 'Status da Vaga', search=search)
+            results.append({k: v.to_dict() if isinstance(v, pd.Series) else v for k, v in result.items() if k != 'key'})
+        results.append(engine.status_breakdown(first, last, FILTERS, 'UF da OI', with_status=True))
+        for period in ('week', 'month'):
+            trend = engine.query_trend(first, last, filters, period, breakdown='UF da OI')
+            results.append({k: v for k, v in trend.items() if k != 'key'})
+    return results
+
+
+def _assert_same(a, b):
+    if isinstance(a, dict):
+        assert a.keys() == b.keys()
+        for key in a:
+            _assert_same(a[key], b[key])
+    elif isinstance(a, (list, tuple, np.ndarray)):
+        assert len(a) == len(b)
+        for x, y in zip(a, b):
+            _assert_same(x, y)
+    else:
+        assert a == b or (a != a and b != b)
+
+
+def test_update_state_matches_build_state(data_dir, delta_csv):
+    dataset.get_data()
+    generation, counts = dataset.merge_file(delta_csv, update=engine.update_state)
+    assert counts['inserted'] and counts['updated'] and counts['unchanged']
+
+    df = dataset.get_data()
+    assert dataset.current_generation() == generation
+    updated = {name: dataset.get_derived(name, build) for name, build in (
+        ('engine_state', engine._build_state), ('search_index', engine.build_search_index),
+        ('rollups', engine.build_rollups),
+    )}
+    merged = _queries(df)
+
+    fresh = engine.warm_state(df)
+    cube_a, cube_b = updated['engine_state']['cube']['df'], fresh['engine_state']['cube']['df']
+    pd.testing.assert_frame_equal(cube_a, cube_b, check_dtype=False, check_categorical=False)
+    rows_a, rows_b = updated['engine_state']['rows'], fresh['engine_state']['rows']
+    np.testing.assert_array_equal(rows_a['days'], rows_b['days'])
+    for name, values in rows_b['measures'].items():
+        np.testing.assert_array_equal(rows_a['measures'][name], values)
+    for key in ('order', 'ranks', 'dias'):
+        np.testing.assert_array_equal(updated['engine_state']['open'][key], fresh['engine_state']['open'][key])
+    for col, column in fresh['search_index']['columns'].items():
+        column_a = updated['search_index']['columns'][col]
+        np.testing.assert_array_equal(column_a['codes'], column['codes'])
+        np.testing.assert_array_equal(column_a['keys'], column['keys'])
+        for key in ('grams', 'starts', 'owners'):
+            np.testing.assert_array_equal(column_a['postings'][key], column['postings'][key])
+
+    # As mesmas consultas com as estruturas remontadas do zero
+    dataset.invalidate_cache()
+    engine._cache.clear()
+    rebuilt = dataset.get_data()
+    assert dataset.current_generation() == generation
+    _assert_same(merged, _queries(rebuilt))
+
+
+def test_merged_structures_are_published_with_the_generation(data_dir, delta_csv, monkeypatch):
+    dataset.get_data()
+    dataset.merge_file(delta_csv, update=engine.update_state)
+    expected = _queries(dataset.get_data())
+
+    # Outro worker: abre a nova geração e mapeia as estruturas gravadas pela mesclagem
+    dataset._cache.update(version=None, signal=None, df=None, derived={})
+    engine._cache.clear()
+
+    def fail(df):
+        raise AssertionError("estrutura remontada a partir do histórico")
+
+    monkeypatch.setattr(engine, '_build_state', fail)
+    monkeypatch.setattr(engine, 'build_search_index', fail)
+    monkeypatch.setattr(engine, 'build_rollups', fail)
+    _assert_same(expected, _queries(dataset.get_data()))
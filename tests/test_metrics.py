@@ -0,0 +1,40 @@
+import json
+
+import flask
+
+import metrics
+from compression import install_compression
+
+
+def _server():
+    server = flask.Flask(__name__)
+    metrics.instrument_server(server)
+    install_compression(server)
+
+    @server.route('/_dash-update-component', methods=['POST'])
+    def update():
+        return flask.jsonify({'response': {'grafico': {'figure': {'data': [{'y': list(range(2000))}]}}}})
+    return server
+
+
+def _histogram(name, **labels):
+    counts = metrics._series[name][metrics._labels(labels)]
+    return counts[-1], sum(counts[:-1])
+
+
+def test_response_bytes_before_compression(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(metrics, '_series', {name: {} for name in metrics.METRICS})
+    client = _server().test_client()
+    payload = {'output': 'grafico.figure'}
+
+    plain = client.post('/_dash-update-component', json=payload)
+    compressed = client.post('/_dash-update-component', json=payload, headers={'Accept-Encoding': 'gzip'})
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert len(compressed.data) < len(plain.data)
+
+    # Tamanho serializado: o mesmo com ou sem compressão
+    assert _histogram('dashboard_callback_response_bytes', callback='grafico.figure') == (2 * len(plain.data), 2)
+    assert _histogram('dashboard_callback_wire_bytes', callback='grafico.figure', encoding='identity') == (len(plain.data), 1)
+    assert _histogram('dashboard_callback_wire_bytes', callback='grafico.figure', encoding='gzip') == (len(compressed.data), 1)
+    assert json.loads(plain.data)['response']['grafico']['figure']['data'][0]['y'][-1] == 1999
@@ -0,0 +1,22 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from normalize import canonical_names, normalize_frame
+
+
+@pytest.mark.parametrize('dtype', ['str', object])
+def test_normalize_frame_strips_text_columns(dtype):
+    df = pd.DataFrame({
+        'Anotações': pd.Series(['  linha 1\nlinha 2  ', '   ', np.nan], dtype=dtype),
+        'Dias em Aberto': [1.0, np.nan, 3.0],
+    })
+    normalize_frame(df)
+    assert df['Anotações'].iloc[0] == 'linha 1\nlinha 2'
+    assert df['Anotações'].iloc[1:].isna().all()
+    assert df['Dias em Aberto'].tolist()[::2] == [1.0, 3.0]
+
+
+def test_canonical_names_aliases():
+    names = pd.Series(['Bruna  Sousa', 'BRUNA SOUZA', 'Cariene Spínola', 'José\tda Silva'])
+    assert canonical_names(names).tolist() == ['BRUNA SOUZA', 'BRUNA SOUZA', 'CARIENE SPINOLA', 'JOSE DA SILVA']
@@ -0,0 +1,42 @@
+import numpy as np
+
+import dataset
+import engine
+from normalize import search_keys, text_key
+from search import SEARCH_COLUMNS, search_rows
+
+
+def _mapped(array):
+    while array is not None and not isinstance(array, np.memmap):
+        array = array.base
+    return array is not None
+
+
+def test_search_index_uses_generation_codes(data_dir):
+    df = dataset.get_data()
+    index = dataset.get_derived('search_index', engine.build_search_index)
+    for col in SEARCH_COLUMNS:
+        column = index['columns'][col]
+        # Só o dicionário de valores distintos vira texto; os códigos por linha são os da geração
+        assert _mapped(column['codes']), col
+        assert len(column['keys']) == len(df[col].cat.categories) < len(df)
+
+
+def test_search_rows_matches_row_scan(data_dir):
+    df = dataset.get_data()
+    index = dataset.get_derived('search_index', engine.build_search_index)
+    keys = {col: search_keys(df[col].astype('str')).fillna('') for col in SEARCH_COLUMNS}
+    cargo = str(df['Título do Cargo'].value_counts().index[0])
+    endereco = str(df['Endereço Completo da OI'].value_counts().index[0])
+    texts = ['rua', cargo.upper(), f'  {cargo.split()[0]}  {endereco.split()[-1]}', endereco[2:9], 'xyzzy']
+    found = []
+    for text in texts:
+        expected = np.ones(len(df), dtype=bool)
+        for term in text_key(text).split():
+            hits = np.zeros(len(df), dtype=bool)
+            for values in keys.values():
+                hits |= values.str.contains(term, regex=False).to_numpy()
+            expected &= hits
+        np.testing.assert_array_equal(search_rows(index, text), np.flatnonzero(expected))
+        found.append(expected.sum())
+    assert all(found[:-1]) and not found[-1]
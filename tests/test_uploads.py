@@ -0,0 +1,74 @@
+import io
+import os
+import time
+
+import pytest
+
+import dataset
+import uploads
+
+
+def _upload(path):
+    with open(path, 'rb') as f:
+        raw = f.read()
+    state = uploads.start_upload('dados.csv', len(raw))
+    for offset in range(0, len(raw), uploads.CHUNK_SIZE):
+        uploads.append_chunk(state['id'], offset, io.BytesIO(raw[offset:offset + uploads.CHUNK_SIZE]))
+    return state['id']
+
+
+def _wait(upload_id, timeout=60):
+    limit = time.monotonic() + timeout
+    while time.monotonic() < limit:
+        job = uploads.ingestion_status(upload_id)
+        if job['finished']:
+            return job
+        time.sleep(0.05)
+    raise AssertionError("ingestão não terminou")
+
+
+def test_second_finish_does_not_start_another_ingestion(data_dir):
+    upload_id = _upload(dataset.DATA_PATH)
+    job = uploads.finish_upload(upload_id)
+    with pytest.raises(uploads.IngestionStarted) as started:
+        uploads.finish_upload(upload_id)
+    assert started.value.job['id'] == job['id']
+
+    job = _wait(upload_id)
+    assert job['error'] is None
+    assert job['version'] == dataset.current_generation()
+    # Depois de terminada, uma nova chamada devolve o resultado em vez de um erro de upload inexistente
+    with pytest.raises(uploads.IngestionStarted) as started:
+        uploads.finish_upload(upload_id)
+    assert started.value.job['finished']
+
+
+def test_stale_ingestion_is_reported_as_error(data_dir):
+    upload_id = _upload(dataset.DATA_PATH)
+    job = {
+        'id': upload_id, 'stage': 'parsed', 'done': ['received', 'parsed'], 'message': '', 'stages': [],
+        'labels': {}, 'error': None, 'version': None, 'finished': False, 'mode': 'replace', 'summary': None,
+    }
+    uploads._write_job(upload_id, job)
+    assert not uploads.ingestion_status(upload_id)['finished']
+
+    # Worker interrompido: o arquivo de progresso para de ser renovado
+    job_path = uploads._job_path(upload_id)
+    old = time.time() - uploads.JOB_STALE_AFTER - 1
+    os.utime(job_path, (old, old))
+    job = uploads.ingestion_status(upload_id)
+    assert job['finished'] and job['error']
+    assert uploads.ingestion_status(upload_id)['error'] == job['error']
+    with pytest.raises(uploads.UploadNotFound):
+        uploads.upload_status(upload_id)
+
+
+def test_heartbeat_keeps_running_ingestion_fresh(data_dir, monkeypatch):
+    monkeypatch.setattr(uploads, 'JOB_HEARTBEAT', 0.05)
+    monkeypatch.setattr(uploads, 'JOB_STALE_AFTER', 0.5)
+    monkeypatch.setattr(uploads, 'ingest_file', lambda *args: time.sleep(1.5) or 'g')
+    upload_id = _upload(dataset.DATA_PATH)
+    uploads.finish_upload(upload_id)
+    time.sleep(1)
+    assert not uploads.ingestion_status(upload_id)['finished']
+    assert _wait(upload_id)['error'] is None
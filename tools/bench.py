@@ -0,0 +1,228 @@
+"""Micro-benchmarks do pipeline do dashboard sobre bases sintéticas (ver gen_data.py).
+
+Uso:
+    python tools/bench.py --rows 10000 100000 1000000 [--repeat 3] [--output res.json] [--compare base.json]
+
+Para cada tamanho, gera a base num diretório temporário e mede: leitura
+(load_data com e sem geração publicada), estruturas derivadas, filtro,
+agregação dos KPIs, cada montagem de figura e os callbacks completos das
+abas, com o cache de consultas vazio ('cold') e já preenchido ('warm').
+Os tempos (em ms) vão para um JSON; com --compare, cada medida é comparada
+com a de um resultado anterior e o código de saída é 1 se alguma piorou
+além de --threshold.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from gen_data import generate # noqa: E402
+
+
+RESULTS_DIR = os.path.join(ROOT, 'tools', 'results')
+
+
+def _timings(fn, repeat, setup=None):
+    """Tempos (ms) de `repeat` execuções de fn(), chamando setup() antes de cada uma."""
+    runs = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        fn()
+        runs.append((time.perf_counter() - start) * 1000)
+    return {'median_ms': float(np.median(runs)), 'min_ms': min(runs), 'runs_ms': runs}
+
+
+def _most_frequent(df, col):
+    return [str(df[col].value_counts().index[0])]
+
+
+def bench_size(rows, repeat, encoding, workdir):
+    """Mede todas as etapas numa base de `rows` linhas; retorna {medida: tempos}."""
+    os.makedirs(os.path.join(workdir, 'data'))
+    generate(os.path.join(workdir, 'data', 'dados.csv'), rows, encoding)
+    os.chdir(workdir)
+
+    import dataset
+    import engine
+    import figures
+    from indexes import DATE_COLUMN
+    results = {}
+
+    def drop_generations():
+        shutil.rmtree(dataset.generations_dir(), ignore_errors=True)
+
+    # --- Leitura ---
+    results['load_data.cold'] = _timings(dataset.load_data, repeat, setup=drop_generations)
+    results['load_data.warm'] = _timings(dataset.load_data, repeat)
+    dataset.invalidate_cache()
+    df = dataset.get_data()
+
+    # --- Estruturas derivadas (uma vez por versão dos dados) ---
+    results['derived.engine_state'] = _timings(lambda: engine._build_state(df), repeat)
+    results['derived.search_index'] = _timings(lambda: engine.build_search_index(df), repeat)
+    results['derived.rollups'] = _timings(lambda: engine.build_rollups(df), repeat)
+
+    # Daqui em diante, os módulos usam esta base (o app é importado só agora: lê os dados na importação)
+    import app
+    version, state = dataset.get_derived('engine_state', engine._build_state, with_version=True)
+    # As consultas medem só o uso das estruturas, não a montagem (medida acima)
+    dataset.get_derived('search_index', engine.build_search_index)
+    dataset.get_derived('rollups', engine.build_rollups)
+    # Consultas sobre todo o período da base, com os valores mais frequentes de grupo e UF
+    dates = df[DATE_COLUMN]
+    start, end = dates.min().strftime('%Y-%m-%d'), dates.max().strftime('%Y-%m-%d')
+    statuses = [o['value'] for o in engine.filter_options('Status da Vaga')]
+    statuses_interno = [o['value'] for o in engine.filter_options('STATUS')]
+    filters = {
+        'Status da Vaga': statuses,
+        'Grupo Econômico': _most_frequent(df, 'Grupo Econômico'),
+        'UF da OI': _most_frequent(df, 'UF da OI'),
+    }
+    typeahead = dict(filters, **{'Título do Cargo': _most_frequent(df, 'Título do Cargo')})
+
+    def clear_caches():
+        engine._cache.clear()
+        figures._figure_cache.clear()
+
+    # --- Filtro e agregação ---
+    for table, query_filters in (('cube', filters), ('rows', typeahead)):
+        selected = engine._select(version, table, state[table], start, end, query_filters)
+        results[f'filter.{table}'] = _timings(
+            lambda: engine._select(version, table, state[table], start, end, query_filters),
+            repeat, setup=clear_caches
+        )
+        results[f'kpi.summarize.{table}'] = _timings(
+            lambda: engine.summarize(state[table], selected, 'Status da Vaga'), repeat
+        )
+    results['query.search'] = _timings(
+        lambda: engine.query_dashboard(start, end, filters, 'Status da Vaga', search='limpeza'),
+        repeat, setup=clear_caches
+    )
+    results['query.trend'] = _timings(
+        lambda: engine.query_trend(start, end, filters, 'week', 'UF da OI'), repeat, setup=clear_caches
+    )
+
+    # --- Figuras ---
+    resumo = engine.query_dashboard(start, end, filters, 'Status da Vaga')
+    trend = engine.query_trend(start, end, filters, 'week', 'UF da OI')
+    status_data = figures.status_bar_data(resumo['by_status'])
+    results['figure.status_bar_data'] = _timings(lambda: figures.status_bar_data(resumo['by_status']), repeat)
+    results['figure.motivo_donut_data'] = _timings(lambda: figures.motivo_donut_data(resumo['by_motivo']), repeat)
+    results['figure.top_vagas_data'] = _timings(lambda: figures.top_vagas_data(resumo['top'], True), repeat)
+    results['figure.full_figure'] = _timings(lambda: figures.full_figure('status', status_data), repeat)
+    results['figure.patch_figure'] = _timings(lambda: figures.patch_figure('status', status_data), repeat)
+    results['figure.trend'] = _timings(
+        lambda: (figures.trend_flow_figure(trend), figures.trend_rate_figure(trend)), repeat
+    )
+
+    # --- Callbacks completos das abas ---
+    for name, callback, tab, selected_status in (
+        ('status_vaga', app.update_dashboard_status_vaga, 'tab-status-vaga', statuses),
+        ('status_interno', app.update_dashboard_status_interno, 'tab-status-interno', statuses_interno),
+    ):
+        def run():
+            callback(start, end, filters['Grupo Econômico'], filters['UF da OI'], None, None, None,
+                     tab, engine.TOP_N, 1, selected_status, None)
+        results[f'callback.{name}.cold'] = _timings(run, repeat, setup=clear_caches)
+        results[f'callback.{name}.warm'] = _timings(run, repeat)
+    return results
+
+
+def _git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current, baseline, threshold, min_ms=1.0):
+    """Imprime a comparação com um resultado anterior; retorna as medidas que pioraram.
+
+    Diferenças abaixo de `min_ms` não contam como piora (ruído de medidas muito curtas).
+    """
+    regressions = []
+    print(f"{'medida':<48} {'antes':>10} {'agora':>10} {'razão':>7}")
+    for key, timing in current['results'].items():
+        before = baseline['results'].get(key)
+        if before is None:
+            continue
+        ratio = timing['median_ms'] / before['median_ms'] if before['median_ms'] else float('inf')
+        flag = ' <<' if ratio > 1 + threshold and timing['median_ms'] - before['median_ms'] > min_ms else ''
+        if flag:
+            regressions.append(key)
+        print(f"{key:<48} {before['median_ms']:>10.2f} {timing['median_ms']:>10.2f} {ratio:>7.2f}{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000])
+    parser.add_argument('--repeat', type=int, default=3, help="execuções por medida (vale a mediana)")
+    parser.add_argument('--encoding', choices=['utf-8', 'latin1'], default='utf-8')
+    parser.add_argument('--output', help="JSON de saída (padrão: tools/results/bench-<data>.json)")
+    parser.add_argument('--compare', help="JSON de uma execução anterior para comparar")
+    parser.add_argument('--threshold', type=float, default=0.2, help="piora relativa tolerada na comparação")
+    parser.add_argument('--min-ms', type=float, default=1.0, help="piora absoluta mínima (ms) para contar na comparação")
+    args = parser.parse_args(argv)
+
+    import dash
+    import pandas as pd
+    results = {}
+    cwd = os.getcwd()
+    for rows in args.rows:
+        workdir = tempfile.mkdtemp(prefix=f'bench-{rows}-')
+        try:
+            for name, timing in bench_size(rows, args.repeat, args.encoding, workdir).items():
+                results[f'{rows}/{name}'] = timing
+                print(f"{rows:>9} {name:<36} {timing['median_ms']:>10.2f} ms")
+        finally:
+            os.chdir(cwd)
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    output = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'revision': _git_revision(),
+            'rows': args.rows,
+            'repeat': args.repeat,
+            'encoding': args.encoding,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'pandas': pd.__version__,
+            'numpy': np.__version__,
+            'dash': dash.__version__,
+        },
+        'results': results,
+    }
+    path = args.output or os.path.join(RESULTS_DIR, f"bench-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(output, f, indent=2)
+    print(f"Resultados gravados em {path}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            regressions = compare(output, json.load(f), args.threshold, args.min_ms)
+        if regressions:
+            print(f"{len(regressions)} medida(s) piorou(aram) mais de {args.threshold:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,153 @@
+"""Gera bases sintéticas no formato da exportação de vagas (42 colunas, separador ';').
+
+Uso:
+    python tools/gen_data.py saida.csv --rows 100000 [--encoding latin1] [--seed 0]
+
+As distribuições vêm de uma base real (a planilha vagas_ori.xlsx, se
+existir, ou o CSV de exemplo): cada linha gerada combina um perfil de
+operação (hierarquia, grupo, contrato, endereço), um perfil de cargo e um
+perfil de andamento (status, dias em aberto, SLA, motivo) sorteados de
+linhas reais, com datas novas e códigos únicos. Em bases grandes, grupos,
+contratos e endereços ganham variantes numeradas, para que a cardinalidade
+cresça com o tamanho como na base real.
+"""
+import argparse
+import math
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from dataset import SCHEMA, _cell_text, _open_sheet, is_xlsx # noqa: E402
+
+
+# Bases reais usadas como referência, na ordem de preferência
+SEED_FILES = [os.path.join(ROOT, 'vagas_ori.xlsx'), os.path.join(ROOT, 'vagas_ori_BRUNA.csv')]
+
+# Linhas geradas e gravadas por vez
+CHUNK_ROWS = 100_000
+
+# Colunas sorteadas juntas, da mesma linha real
+OPERATION_COLUMNS = [
+    'RECRUTADOR', 'Empresa', 'COO', 'Executivo', 'Diretor', 'Gerente', 'Coordenador', 'Supervisor',
+    'Grupo Econômico', 'Grupo Econômico com Menor Gestor', 'Contrato', 'UF da OI', 'Cidade da OI',
+    'Microrregiões', 'Localidade', 'Cep da OI', 'Endereço Completo da OI', 'Hub de Vagas',
+    'Data de Início da OI', 'Abrangência Vagas',
+]
+JOB_COLUMNS = ['Título do Cargo', 'Descrição do Sexo', 'Descrição da Escala', 'Salário', 'Habilitação Técnica']
+PROGRESS_COLUMNS = [
+    'STATUS', 'NOME', 'PREVISÃO INÍCIO', 'STATUS DO PROCESO', 'Status da Vaga Agrupadas', 'Status da Vaga',
+    'Situação Vagas', 'Dias em Aberto', 'Qtd em Andamento', 'Qtd Finalizadas', 'Descrição do Motivo',
+]
+
+# Colunas de operação que ganham variantes numeradas em bases grandes
+VARIANT_COLUMNS = ['Grupo Econômico', 'Grupo Econômico com Menor Gestor', 'Contrato', 'Endereço Completo da OI']
+
+# Encodings de saída: o do sistema de origem (UTF-8 com BOM) e o de planilhas antigas
+ENCODINGS = {'utf-8': 'utf-8-sig', 'latin1': 'latin1'}
+
+
+def read_seed(path):
+    """Base real como texto (todas as colunas do esquema), CSV ou .xlsx."""
+    if is_xlsx(path):
+        with _open_sheet(path) as sheet:
+            rows = sheet.iter_rows(values_only=True)
+            header = [str(name) if name is not None else '' for name in next(rows)]
+            dtypes = [SCHEMA.get(name, {}).get('dtype') for name in header]
+            data = [[_cell_text(value, dtype) for value, dtype in zip(row, dtypes)] for row in rows]
+        seed = pd.DataFrame(data, columns=header, dtype=object)
+    else:
+        seed = pd.read_csv(path, sep=';', dtype=str, keep_default_na=False, encoding='utf-8-sig')
+    seed = seed.reindex(columns=list(SCHEMA)).fillna('')
+    dates = pd.to_datetime(seed['Recrutamento e Seleção'], format='%d/%m/%Y', errors='coerce')
+    return seed[dates.notna()].reset_index(drop=True)
+
+
+def _days(values):
+    return pd.to_datetime(values, format='%d/%m/%Y', errors='coerce').to_numpy().astype('datetime64[D]')
+
+
+def _format_days(days):
+    return pd.Series(days).dt.strftime('%d/%m/%Y').fillna('').to_numpy(dtype=object)
+
+
+def generate_chunk(seed, rng, first_id, size, start, end, variety):
+    """DataFrame de `size` linhas sintéticas (códigos a partir de `first_id`)."""
+    columns = {}
+    operation = rng.integers(0, len(seed), size)
+    job = rng.integers(0, len(seed), size)
+    progress = rng.integers(0, len(seed), size)
+    for names, rows in ((OPERATION_COLUMNS, operation), (JOB_COLUMNS, job), (PROGRESS_COLUMNS, progress)):
+        for name in names:
+            columns[name] = seed[name].to_numpy(dtype=object)[rows]
+
+    variant = rng.integers(0, variety, size)
+    for name in VARIANT_COLUMNS:
+        values = columns[name]
+        suffixed = (variant > 0) & (values != '')
+        values[suffixed] = values[suffixed] + ' ' + variant[suffixed].astype(str).astype(object)
+
+    opened = start + rng.integers(0, (end - start).astype(int) + 1, size).astype('timedelta64[D]')
+    columns['Recrutamento e Seleção'] = _format_days(opened)
+
+    # Finalização: mesmo intervalo após a abertura da linha real; '31/12/1900' e vazios ficam
+    seed_opened = _days(seed['Recrutamento e Seleção'])[progress]
+    seed_finished_text = seed['Finalizada'].to_numpy(dtype=object)[progress]
+    seed_finished = _days(seed['Finalizada'])[progress]
+    valid = ~np.isnat(seed_finished) & (seed_finished >= seed_opened)
+    finished = seed_finished_text.copy()
+    finished[valid] = _format_days(np.minimum(opened[valid] + (seed_finished[valid] - seed_opened[valid]), end))
+    columns['Finalizada'] = finished
+
+    notes = seed['Anotações'].to_numpy(dtype=object)
+    columns['Anotações'] = notes[rng.integers(0, len(notes), size)]
+
+    ids = np.arange(first_id, first_id + size)
+    years = opened.astype('datetime64[Y]').astype(int) + 1970
+    columns['Código da Requisição'] = (200_000 + ids).astype(str)
+    columns['Código da Vaga'] = np.char.add(np.char.add(ids.astype(str), '/'), (years % 100).astype(str))
+    columns['IDPV'] = (500_000 + ids).astype(str)
+    return pd.DataFrame(columns, columns=list(SCHEMA))
+
+
+def generate(path, rows, encoding='utf-8', seed_path=None, random_seed=0, start=None, end=None, variety=None):
+    """Grava uma base sintética de `rows` linhas em `path` (CSV ';')."""
+    seed_path = seed_path or next(p for p in SEED_FILES if os.path.exists(p))
+    seed = read_seed(seed_path)
+    seed_dates = _days(seed['Recrutamento e Seleção'])
+    start = np.datetime64(start, 'D') if start else seed_dates.min()
+    end = np.datetime64(end, 'D') if end else seed_dates.max()
+    if variety is None:
+        variety = max(1, round(math.sqrt(rows / len(seed))))
+
+    rng = np.random.default_rng(random_seed)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    # O codec grava o BOM uma única vez, no início do arquivo
+    with open(path, 'w', encoding=ENCODINGS[encoding], errors='replace', newline='') as f:
+        for first in range(0, rows, CHUNK_ROWS):
+            chunk = generate_chunk(seed, rng, first, min(CHUNK_ROWS, rows - first), start, end, variety)
+            chunk.to_csv(f, sep=';', index=False, header=first == 0, lineterminator='\n')
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('output', help="arquivo CSV de saída")
+    parser.add_argument('--rows', type=int, default=10_000, help="quantidade de linhas (ex.: 10000, 100000, 1000000)")
+    parser.add_argument('--encoding', choices=sorted(ENCODINGS), default='utf-8')
+    parser.add_argument('--seed', type=int, default=0, help="semente do sorteio (mesma semente, mesma base)")
+    parser.add_argument('--seed-file', help="base real de referência (.csv ou .xlsx)")
+    parser.add_argument('--start', help="primeira data de abertura (AAAA-MM-DD)")
+    parser.add_argument('--end', help="última data de abertura (AAAA-MM-DD)")
+    parser.add_argument('--variety', type=int, help="variantes por grupo/contrato/endereço (padrão: cresce com --rows)")
+    args = parser.parse_args(argv)
+    generate(args.output, args.rows, args.encoding, args.seed_file, args.seed, args.start, args.end, args.variety)
+    print(f"{args.rows} linhas gravadas em {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,469 @@
+"""Teste de carga com sessões simultâneas contra o endpoint de callbacks do Dash.
+
+Uso:
+    python tools/loadtest.py [--url http://127.0.0.1:8050] --sessions 20 --duration 60 [--output res.json]
+
+Sem --url, o app é importado no próprio processo (diretório atual, com
+data/dados.csv) e as requisições vão pelo cliente de testes do Flask; com
+--url, vão por HTTP para uma instância local (ex.: gunicorn app:server).
+Nada externo é usado.
+
+Cada sessão faz login pelo callback de login (como o navegador), abre o
+dashboard e repete um roteiro sorteado de interações: período, grupo, UF,
+marcações do checklist de status (só no navegador: mudam apenas o estado
+enviado nas próximas requisições), troca de aba, busca nos filtros de
+alta cardinalidade, busca textual, paginação do Top N e agrupamento da
+tendência. Como o renderer do Dash, cada mudança dispara todos os callbacks
+do servidor que têm a propriedade como Input. No meio da execução uma
+sessão de administrador envia um arquivo pelas rotas de upload em partes
+(--upload-file, --upload-mode) e, publicada a nova versão, dispara o
+'data-update-signal'. Ao fim, imprime vazão e latências p50/p95/p99 por
+callback.
+"""
+import argparse
+import http.cookiejar
+import io
+import json
+import os
+import random
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from datetime import date, timedelta
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+# Peso de cada ação no roteiro das sessões
+ACTIONS = {
+    'periodo': 3,
+    'grupo': 3,
+    'uf': 3,
+    'checklist': 2,
+    'aba': 2,
+    'filtro_busca': 2,
+    'texto': 1,
+    'pagina': 1,
+    'tendencia': 1,
+}
+
+# Propriedades que o navegador guarda do layout e das respostas
+_SKIPPED_PROPS = {'children', 'style', 'className'}
+
+
+# =====================================================================
+# TRANSPORTE: HTTP (INSTÂNCIA LOCAL) OU CLIENTE DE TESTES DO FLASK
+# =====================================================================
+class HttpTransport:
+    """Requisições HTTP com cookies próprios (uma sessão do navegador)."""
+
+    def __init__(self, url):
+        self.url = url.rstrip('/')
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+
+    def request(self, method, path, body=None, content_type=None):
+        headers = {'Content-Type': content_type} if content_type else {}
+        req = urllib.request.Request(self.url + path, data=body, method=method, headers=headers)
+        try:
+            with self.opener.open(req) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+
+    def json(self, method, path, payload=None):
+        body = json.dumps(payload).encode('utf-8') if payload is not None else None
+        return self.request(method, path, body, 'application/json' if body is not None else None)
+
+    def multipart(self, path, fields, file_field, file_bytes):
+        boundary = uuid.uuid4().hex
+        parts = [
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode('utf-8')
+            for name, value in fields.items()
+        ]
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{file_field}"; filename="blob"\r\n'
+            'Content-Type: application/octet-stream\r\n\r\n'.encode('utf-8') + file_bytes + b'\r\n'
+        )
+        parts.append(f'--{boundary}--\r\n'.encode('utf-8'))
+        return self.request('POST', path, b''.join(parts), f'multipart/form-data; boundary={boundary}')
+
+
+class FlaskTransport:
+    """Mesma interface, pelo cliente de testes do Flask (app no próprio processo)."""
+
+    def __init__(self, server):
+        self.client = server.test_client()
+
+    def json(self, method, path, payload=None):
+        response = self.client.open(path, method=method, json=payload)
+        return response.status_code, response.get_data()
+
+    def multipart(self, path, fields, file_field, file_bytes):
+        data = dict(fields, **{file_field: (io.BytesIO(file_bytes), 'blob')})
+        response = self.client.post(path, data=data, content_type='multipart/form-data')
+        return response.status_code, response.get_data()
+
+
+# =====================================================================
+# ESTATÍSTICAS POR CALLBACK
+# =====================================================================
+class Stats:
+    """Latências (s) e resultados por rótulo, thread-safe."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = {}
+        self.errors = {}
+        self.noop = {}
+
+    def record(self, label, seconds, status):
+        with self._lock:
+            self.latencies.setdefault(label, []).append(seconds)
+            if status >= 400:
+                self.errors[label] = self.errors.get(label, 0) + 1
+            elif status == 204:
+                self.noop[label] = self.noop.get(label, 0) + 1
+
+    def report(self, elapsed):
+        """Resumo por rótulo: quantidade, erros, sem atualização (204), vazão e percentis em ms."""
+        rows = {}
+        with self._lock:
+            for label, values in sorted(self.latencies.items()):
+                ms = np.asarray(values) * 1000
+                rows[label] = {
+                    'count': len(values),
+                    'errors': self.errors.get(label, 0),
+                    'noop': self.noop.get(label, 0),
+                    'rps': len(values) / elapsed,
+                    'p50_ms': float(np.percentile(ms, 50)),
+                    'p95_ms': float(np.percentile(ms, 95)),
+                    'p99_ms': float(np.percentile(ms, 99)),
+                    'max_ms': float(ms.max()),
+                }
+        return rows
+
+
+# =====================================================================
+# SESSÃO SIMULADA (ESTADO DOS COMPONENTES E DISPARO DOS CALLBACKS)
+# =====================================================================
+def _wildcard(component_id):
+    """Id de padrão ({"col":["ALL"],...}) como dict, ou None para ids simples."""
+    if not component_id.startswith('{'):
+        return None
+    return json.loads(component_id)
+
+
+class Session:
+    """Um navegador: valores dos componentes e disparo dos callbacks do servidor."""
+
+    def __init__(self, transport, dependencies, stats, rng):
+        self.transport = transport
+        self.stats = stats
+        self.rng = rng
+        self.values = {}
+        self.patterns = {} # tipo do id de padrão -> valores de 'col' presentes no layout
+        self.dependencies = [d for d in dependencies if not d.get('clientside_function')]
+
+    # --- Estado dos componentes ---
+    def _absorb_layout(self, node):
+        if isinstance(node, list):
+            for child in node:
+                self._absorb_layout(child)
+            return
+        if not isinstance(node, dict):
+            return
+        props = node.get('props', {})
+        component_id = props.get('id')
+        if isinstance(component_id, dict):
+            self.patterns.setdefault(component_id['type'], []).append(component_id['col'])
+        for prop, value in props.items():
+            if prop == 'id':
+                continue
+            if component_id is not None and prop not in _SKIPPED_PROPS:
+                self.values[self._key(component_id, prop)] = value
+            if isinstance(value, (dict, list)):
+                self._absorb_layout(value)
+
+    @staticmethod
+    def _key(component_id, prop):
+        if isinstance(component_id, dict):
+            return f"{component_id['type']}:{component_id['col']}.{prop}"
+        return f'{component_id}.{prop}'
+
+    def _spec(self, item, match=None):
+        pattern = _wildcard(item['id'])
+        if pattern is None:
+            return {'id': item['id'], 'property': item['property'], 'value': self.values.get(f"{item['id']}.{item['property']}")}
+        cols = self.patterns.get(pattern['type'], [])
+        specs = [
+            {'id': {'type': pattern['type'], 'col': col}, 'property': item['property'],
+             'value': self.values.get(self._key({'type': pattern['type'], 'col': col}, item['property']))}
+            for col in cols
+        ]
+        if pattern['col'] == ['ALL']:
+            return specs
+        return next(s for s in specs if s['id']['col'] == match)
+
+    @staticmethod
+    def _label(dependency):
+        first = dependency['output'].strip('.').split('...')[0].split('@')[0]
+        pattern = _wildcard(first.rsplit('.', 1)[0])
+        return f"{pattern['type']}.{first.rsplit('.', 1)[1]}" if pattern else first
+
+    # --- Requisições ---
+    def call(self, dependency, changed, match=None):
+        """Executa um callback do servidor e guarda as propriedades devolvidas."""
+        outputs = [
+            {'id': o.split('@')[0].rsplit('.', 1)[0], 'property': o.split('@')[0].rsplit('.', 1)[1]}
+            for o in dependency['output'].strip('.').split('...')
+        ]
+        for output in outputs:
+            pattern = _wildcard(output['id'])
+            if pattern is not None:
+                output['id'] = {'type': pattern['type'], 'col': match}
+        body = {
+            'output': dependency['output'],
+            'outputs': outputs if dependency['output'].startswith('..') else outputs[0],
+            'inputs': [self._spec(i, match) for i in dependency['inputs']],
+            'state': [self._spec(s, match) for s in dependency['state']],
+            'changedPropIds': changed,
+        }
+        start = time.perf_counter()
+        status, raw = self.transport.json('POST', '/_dash-update-component', body)
+        self.stats.record(self._label(dependency), time.perf_counter() - start, status)
+        if status == 200:
+            for component_id, props in json.loads(raw).get('response', {}).items():
+                component_id = _wildcard(component_id) or component_id
+                for prop, value in props.items():
+                    # Atualizações parciais (dash.Patch) não mudam o estado guardado aqui
+                    if not (isinstance(value, dict) and '__dash_patch_update' in value):
+                        self.values[self._key(component_id, prop)] = value
+                        if prop == 'children':
+                            self._absorb_layout(value)
+        return status
+
+    def fire(self, component_id, prop, match=None, initial=False):
+        """Dispara, como o renderer, todos os callbacks do servidor que têm a propriedade como Input.
+
+        Com `initial`, simula a carga da página: pula os callbacks com prevent_initial_call.
+        """
+        if isinstance(component_id, dict):
+            changed = f"{json.dumps(component_id, sort_keys=True, separators=(',', ':'))}.{prop}"
+        else:
+            changed = f'{component_id}.{prop}'
+        for dependency in self.dependencies:
+            if initial and dependency.get('prevent_initial_call'):
+                continue
+            for item in dependency['inputs']:
+                pattern = _wildcard(item['id'])
+                if pattern is None:
+                    same_id = item['id'] == component_id
+                else:
+                    same_id = isinstance(component_id, dict) and pattern['type'] == component_id['type']
+                if same_id and item['property'] == prop:
+                    matches = [match]
+                    if match is None and 'MATCH' in dependency['output']:
+                        # Callback MATCH disparado por um Input simples: roda para cada componente do padrão
+                        output_id = dependency['output'].strip('.').split('...')[0].rsplit('.', 1)[0]
+                        matches = self.patterns.get(_wildcard(output_id)['type'], [])
+                    for each in matches:
+                        self.call(dependency, [changed], each)
+                    break
+
+    def set(self, component_id, prop, value, match=None):
+        self.values[self._key(component_id, prop)] = value
+        self.fire(component_id, prop, match)
+
+    def find(self, output):
+        """Callback cujo Output (sem allow_duplicate) é a propriedade dada."""
+        return next(d for d in self.dependencies if output in d['output'].strip('.').split('...'))
+
+    # --- Roteiro ---
+    def login(self, username, password):
+        self.values.update({'login-button.n_clicks': 1, 'username.value': username, 'password.value': password})
+        self.call(self.find('session.data'), ['login-button.n_clicks'])
+        if not (self.values.get('session.data') or {}).get('authenticated'):
+            raise RuntimeError(f"Login recusado para {username}")
+        # Abertura do dashboard e callbacks iniciais dos componentes da página
+        self.values['url.pathname'] = '/dashboard'
+        self.call(self.find('page-content.children'), ['url.pathname'])
+        for component_id, prop in (('session', 'data'), ('data-update-signal', 'data'), ('tabs-principal', 'value')):
+            self.fire(component_id, prop, initial=True)
+
+    def _options(self, key):
+        return [o['value'] for o in self.values.get(key) or []]
+
+    def act(self, action):
+        rng = self.rng
+        if action == 'periodo':
+            first = date.fromisoformat(str(self.values['filtro-data.min_date_allowed'])[:10])
+            last = date.fromisoformat(str(self.values['filtro-data.max_date_allowed'])[:10])
+            start = first + timedelta(days=rng.randrange(max(1, (last - first).days)))
+            self.set('filtro-data', 'start_date', start.isoformat())
+        elif action in ('grupo', 'uf'):
+            component_id = f'filtro-{action}'
+            options = self._options(f'{component_id}.options')
+            value = rng.sample(options, min(len(options), rng.randint(1, 2))) if options and rng.random() < .7 else None
+            self.set(component_id, 'value', value)
+        elif action == 'checklist':
+            options = self._options('filtro-status.options')
+            selected = set(self.values.get('filtro-status.value') or [])
+            if options:
+                selected ^= {rng.choice(options)}
+            self.set('filtro-status', 'value', sorted(selected))
+        elif action == 'aba':
+            self.set('tabs-principal', 'value', rng.choice(['tab-status-vaga', 'tab-status-interno', 'tab-tendencia']))
+        elif action == 'filtro_busca':
+            cols = self.patterns.get('filtro-busca', [])
+            if not cols:
+                return
+            col = rng.choice(cols)
+            component_id = {'type': 'filtro-busca', 'col': col}
+            self.set(component_id, 'search_value', rng.choice('aeiou'), match=col)
+            options = self._options(self._key(component_id, 'options'))
+            self.set(component_id, 'value', [rng.choice(options)] if options and rng.random() < .7 else None, match=col)
+        elif action == 'texto':
+            self.set('busca-texto', 'value', rng.choice([None, 'rua', 'limp', 'vale', 'centro']))
+        elif action == 'pagina':
+            self.set('top-pagina', 'active_page', rng.randint(1, 3))
+        elif action == 'tendencia':
+            self.set('tendencia-periodo', 'value', rng.choice(['week', 'month']))
+
+    def run(self, stop_at, think):
+        actions, weights = list(ACTIONS), list(ACTIONS.values())
+        while time.time() < stop_at:
+            self.act(self.rng.choices(actions, weights)[0])
+            if think:
+                time.sleep(self.rng.expovariate(1 / think))
+
+
+def admin_upload(session, path, mode, stats):
+    """Envia o arquivo pelas rotas de upload em partes e dispara o sinal de atualização ao publicar."""
+    with open(path, 'rb') as f:
+        content = f.read()
+    start = time.perf_counter()
+    status, raw = session.transport.json('POST', '/upload/csv', {
+        'filename': os.path.basename(path), 'size': len(content), 'mode': mode
+    })
+    stats.record('upload.start', time.perf_counter() - start, status)
+    if status != 200:
+        raise RuntimeError(f"Upload recusado ({status}): {raw[:200]!r}")
+    upload = json.loads(raw)
+    for offset in range(0, len(content), upload['chunk_size']):
+        t = time.perf_counter()
+        status, _ = session.transport.multipart(
+            f"/upload/csv/{upload['id']}/chunk", {'offset': offset}, 'chunk',
+            content[offset:offset + upload['chunk_size']]
+        )
+        stats.record('upload.chunk', time.perf_counter() - t, status)
+    t = time.perf_counter()
+    status, _ = session.transport.json('POST', f"/upload/csv/{upload['id']}/finish")
+    stats.record('upload.finish', time.perf_counter() - t, status)
+    while True:
+        status, raw = session.transport.json('GET', f"/upload/csv/{upload['id']}/ingestion")
+        job = json.loads(raw) if status == 200 else {'finished': True, 'error': raw[:200]}
+        if job.get('finished'):
+            break
+        time.sleep(0.2)
+    stats.record('upload.total', time.perf_counter() - start, 500 if job.get('error') else 200)
+    if not job.get('error'):
+        session.set('data-update-signal', 'data', job.get('version'))
+    return job
+
+
+# =====================================================================
+# EXECUÇÃO
+# =====================================================================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', help="instância local (sem --url, o app roda no próprio processo)")
+    parser.add_argument('--sessions', type=int, default=10, help="sessões simultâneas")
+    parser.add_argument('--duration', type=float, default=30, help="duração em segundos")
+    parser.add_argument('--ramp-up', type=float, default=5, help="segundos para iniciar todas as sessões")
+    parser.add_argument('--think', type=float, default=1.0, help="pausa média entre ações (s); 0 = sem pausa")
+    parser.add_argument('--user', default='visitante')
+    parser.add_argument('--password', default=None, help="padrão: a do usuário em app.USERS")
+    parser.add_argument('--admin-user', default='verzani')
+    parser.add_argument('--admin-password', default=None, help="padrão: a do usuário em app.USERS")
+    parser.add_argument('--upload-file', default=os.path.join('data', 'dados.csv'))
+    parser.add_argument('--upload-mode', choices=['replace', 'merge'], default='merge')
+    parser.add_argument('--upload-at', type=float, help="segundo do envio (padrão: metade da duração)")
+    parser.add_argument('--no-upload', action='store_true', help="sem envio de arquivo durante o teste")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="JSON com o resumo por callback")
+    args = parser.parse_args(argv)
+
+    server = None
+    if args.url is None or args.password is None or args.admin_password is None:
+        import app
+        server = app.server
+        args.password = args.password or app.USERS[args.user]['password']
+        args.admin_password = args.admin_password or app.USERS[args.admin_user]['password']
+
+    def transport():
+        return HttpTransport(args.url) if args.url else FlaskTransport(server)
+
+    status, raw = transport().json('GET', '/_dash-dependencies')
+    if status != 200:
+        raise SystemExit(f"Não foi possível ler as dependências dos callbacks ({status})")
+    dependencies = json.loads(raw)
+
+    stats = Stats()
+    failures = []
+    started = time.time()
+    stop_at = started + args.duration
+
+    def session_main(index):
+        rng = random.Random(args.seed * 100_003 + index)
+        time.sleep(args.ramp_up * index / max(1, args.sessions))
+        session = Session(transport(), dependencies, stats, rng)
+        try:
+            session.login(args.user, args.password)
+            session.run(stop_at, args.think)
+        except Exception as e:
+            failures.append(f"sessão {index}: {e!r}")
+
+    def upload_main():
+        time.sleep(args.duration / 2 if args.upload_at is None else args.upload_at)
+        session = Session(transport(), dependencies, stats, random.Random(args.seed))
+        try:
+            session.login(args.admin_user, args.admin_password)
+            job = admin_upload(session, args.upload_file, args.upload_mode, stats)
+            print(f"Upload: versão {job.get('version')} {job.get('error') or ''}".rstrip())
+        except Exception as e:
+            failures.append(f"upload: {e!r}")
+
+    threads = [threading.Thread(target=session_main, args=(i,), daemon=True) for i in range(args.sessions)]
+    if not args.no_upload:
+        threads.append(threading.Thread(target=upload_main, daemon=True))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.time() - started
+
+    report = stats.report(elapsed)
+    total = sum(row['count'] for row in report.values())
+    print(f"{args.sessions} sessões, {elapsed:.1f} s, {total} requisições ({total / elapsed:.1f}/s)")
+    print(f"{'callback':<44} {'qtd':>6} {'erros':>6} {'204':>5} {'req/s':>7} {'p50':>8} {'p95':>8} {'p99':>8} {'máx':>8}")
+    for label, row in report.items():
+        print(f"{label:<44} {row['count']:>6} {row['errors']:>6} {row['noop']:>5} {row['rps']:>7.2f} "
+              f"{row['p50_ms']:>8.1f} {row['p95_ms']:>8.1f} {row['p99_ms']:>8.1f} {row['max_ms']:>8.1f}")
+    for failure in failures:
+        print(f"Falha: {failure}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'sessions': args.sessions, 'duration_s': elapsed, 'requests': total,
+                       'failures': failures, 'callbacks': report}, f, indent=2)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,342 @@
+import json
+import os
+import threading
+import time
+import uuid
+
+import pandas as pd
+
+import metrics
+from dataset import DATA_PATH, check_header, decode_csv, ingest_file, is_xlsx, merge_file, xlsx_header
+
+
+# Partes enviadas pelo navegador (o servidor aceita até MAX_CHUNK_SIZE por parte)
+CHUNK_SIZE = 2 * 1024 * 1024
+MAX_CHUNK_SIZE = 8 * 1024 * 1024
+
+# O cabeçalho precisa aparecer inteiro nos primeiros bytes do arquivo
+HEADER_MAX_BYTES = 64 * 1024
+
+# Modos de ingestão: substituir a base inteira ou mesclar por chave (ver merge.py)
+MODES = ('replace', 'merge')
+
+# Extensões aceitas: o CSV exportado ou a planilha .xlsx original
+EXTENSIONS = ('.csv', '.xlsx')
+
+# Uploads parados há mais tempo que isso são descartados
+UPLOAD_MAX_AGE = 24 * 60 * 60
+
+# Intervalo da pulsação da ingestão em andamento e tempo sem pulsação para considerá-la interrompida (s)
+JOB_HEARTBEAT = 5
+JOB_STALE_AFTER = 60
+
+# Bloco de cópia do corpo da requisição para o arquivo temporário
+_COPY_BLOCK = 256 * 1024
+
+# Etapas da ingestão em segundo plano, na ordem, com o texto mostrado ao admin
+STAGES = {
+    'received': 'Arquivo recebido',
+    'parsed': 'Arquivo lido',
+    'validated': 'Dados validados',
+    'indexed': 'Índices montados',
+    'published': 'Nova versão publicada',
+}
+
+
+class UploadNotFound(LookupError):
+    """Upload inexistente ou já descartado."""
+
+
+class IngestionStarted(Exception):
+    """A ingestão do upload já foi iniciada (ex.: clique duplo ou requisição repetida)."""
+
+    def __init__(self, job):
+        super().__init__("A ingestão deste arquivo já foi iniciada.")
+        self.job = job
+
+
+class OffsetMismatch(Exception):
+    """A parte não começa onde o arquivo temporário termina (envio fora de ordem)."""
+
+    def __init__(self, received):
+        super().__init__(f"Parte fora de ordem: o servidor já recebeu {received} bytes.")
+        self.received = received
+
+
+# =====================================================================
+# UPLOAD EM PARTES, RETOMÁVEL (ESTADO EM DISCO, VÁLIDO ENTRE WORKERS)
+# =====================================================================
+# Cada upload tem um arquivo temporário <id>.part e um <id>.json com o nome
+# do arquivo, o tamanho total e se o cabeçalho já foi validado. Ficam ao lado
+# do CSV (mesmo sistema de arquivos), então a troca final é um os.replace.
+# Como o estado está em disco, partes seguidas podem cair em workers
+# diferentes do gunicorn, e o navegador retoma um envio interrompido a partir
+# de 'received'.
+def uploads_dir(path=DATA_PATH):
+    """Diretório dos uploads em andamento."""
+    return os.path.join(os.path.dirname(path), 'uploads')
+
+
+def _base_path(upload_id, path=DATA_PATH):
+    # O id vem da URL: só aceita o formato gerado por start_upload
+    if len(upload_id) != 32 or any(c not in '0123456789abcdef' for c in upload_id):
+        raise UploadNotFound(upload_id)
+    return os.path.join(uploads_dir(path), upload_id)
+
+
+def _paths(upload_id, path=DATA_PATH):
+    base = _base_path(upload_id, path)
+    return base + '.part', base + '.json'
+
+
+def _read_meta(upload_id, path=DATA_PATH):
+    part, meta_path = _paths(upload_id, path)
+    try:
+        with open(meta_path, encoding='utf-8') as f:
+            meta = json.load(f)
+        meta['received'] = os.path.getsize(part)
+    except OSError:
+        raise UploadNotFound(upload_id) from None
+    return meta
+
+
+def _write_meta(upload_id, meta, path=DATA_PATH):
+    _, meta_path = _paths(upload_id, path)
+    tmp_path = f'{meta_path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({k: v for k, v in meta.items() if k != 'received'}, f)
+    os.replace(tmp_path, meta_path)
+
+
+def discard_upload(upload_id, path=DATA_PATH):
+    """Remove os arquivos de um upload."""
+    for file_path in _paths(upload_id, path):
+        try:
+            os.remove(file_path)
+        except OSError:
+            pass
+
+
+def _discard_stale(path=DATA_PATH):
+    """Descarta uploads abandonados há mais de UPLOAD_MAX_AGE segundos."""
+    directory = uploads_dir(path)
+    limit = time.time() - UPLOAD_MAX_AGE
+    for entry in os.listdir(directory):
+        file_path = os.path.join(directory, entry)
+        try:
+            if os.path.getmtime(file_path) < limit:
+                os.remove(file_path)
+        except OSError:
+            pass
+
+
+def start_upload(filename, size, path=DATA_PATH, mode='replace'):
+    """Registra um novo upload e retorna seu estado (com 'id' e 'chunk_size').
+
+    `mode` é 'replace' (o arquivo vira a nova base) ou 'merge' (o arquivo só
+    traz vagas novas ou alteradas, mescladas à base atual).
+    """
+    if not filename or not filename.lower().endswith(EXTENSIONS):
+        raise ValueError("O arquivo deve ser no formato .csv ou .xlsx")
+    if size <= 0:
+        raise ValueError("O arquivo está vazio.")
+    if mode not in MODES:
+        raise ValueError(f"Modo de envio inválido: {mode}")
+
+    os.makedirs(uploads_dir(path), exist_ok=True)
+    _discard_stale(path)
+    upload_id = uuid.uuid4().hex
+    part, _ = _paths(upload_id, path)
+    open(part, 'wb').close()
+    meta = {'filename': filename, 'size': size, 'mode': mode, 'header_ok': False}
+    _write_meta(upload_id, meta, path)
+    return {'id': upload_id, 'chunk_size': CHUNK_SIZE, 'received': 0, **meta}
+
+
+def upload_status(upload_id, path=DATA_PATH):
+    """Estado de um upload: nome, tamanho total e bytes já recebidos."""
+    return {'id': upload_id, 'chunk_size': CHUNK_SIZE, **_read_meta(upload_id, path)}
+
+
+def _check_upload_header(part, complete=False):
+    """Valida o cabeçalho assim que a primeira linha estiver completa.
+
+    Retorna True se validado, False se a primeira linha ainda não chegou. Uma
+    planilha .xlsx (zip, com o índice no fim) só é conferida completa.
+    """
+    if is_xlsx(part):
+        if complete:
+            check_header(xlsx_header(part))
+        return complete
+    with open(part, 'rb') as f:
+        head = f.read(HEADER_MAX_BYTES)
+    end = head.find(b'\n')
+    if end < 0:
+        if len(head) >= HEADER_MAX_BYTES:
+            raise ValueError("Cabeçalho não encontrado no início do arquivo.")
+        return False
+    names = decode_csv(head[:end].rstrip(b'\r')).split(';')
+    check_header(pd.Index(names).str.strip('"'))
+    return True
+
+
+def append_chunk(upload_id, offset, stream, path=DATA_PATH):
+    """Acrescenta uma parte (lida de `stream`) ao arquivo temporário do upload.
+
+    `offset` é a posição da parte no arquivo; se não for o fim do que já foi
+    recebido, levanta OffsetMismatch com o tamanho atual (para retomar). Um
+    cabeçalho inválido descarta o upload e levanta ValueError.
+    """
+    meta = _read_meta(upload_id, path)
+    if offset != meta['received']:
+        raise OffsetMismatch(meta['received'])
+
+    part, _ = _paths(upload_id, path)
+    written = 0
+    with open(part, 'ab') as f:
+        while True:
+            block = stream.read(_COPY_BLOCK)
+            if not block:
+                break
+            written += len(block)
+            if written > MAX_CHUNK_SIZE or meta['received'] + written > meta['size']:
+                f.truncate(meta['received'])
+                raise ValueError("Parte maior que o permitido ou além do tamanho declarado.")
+            f.write(block)
+    meta['received'] += written
+
+    if not meta['header_ok']:
+        try:
+            meta['header_ok'] = _check_upload_header(part, complete=meta['received'] == meta['size'])
+        except ValueError:
+            discard_upload(upload_id, path)
+            raise
+        if meta['header_ok']:
+            _write_meta(upload_id, meta, path)
+    return meta['received']
+
+
+# =====================================================================
+# INGESTÃO EM SEGUNDO PLANO, COM PROGRESSO POR ETAPA
+# =====================================================================
+# Ao fim do upload, leitura, validação, gravação da geração e montagem dos
+# índices rodam numa thread, fora da requisição. O progresso vai para
+# <id>.job.json (lido por qualquer worker) e o navegador o consulta até a
+# etapa 'published' ou um erro. Até a publicação, todos os usuários
+# continuam vendo a versão anterior dos dados.
+#
+# Enquanto a thread roda, o mtime do <id>.job.json é renovado a cada
+# JOB_HEARTBEAT segundos. Se o worker morrer no meio (reinício do gunicorn),
+# a pulsação para e, passados JOB_STALE_AFTER segundos, ingestion_status
+# passa a informar o erro em vez de 'processando' para sempre.
+def _job_path(upload_id, path=DATA_PATH):
+    return _base_path(upload_id, path) + '.job.json'
+
+
+def _write_job(upload_id, job, path=DATA_PATH):
+    job_path = _job_path(upload_id, path)
+    tmp_path = f'{job_path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(job, f)
+    os.replace(tmp_path, job_path)
+
+
+def ingestion_status(upload_id, path=DATA_PATH):
+    """Progresso da ingestão: etapa atual, etapas concluídas, erro e versão publicada.
+
+    Uma ingestão sem pulsação há mais de JOB_STALE_AFTER segundos é dada
+    como interrompida (finalizada com erro).
+    """
+    job_path = _job_path(upload_id, path)
+    try:
+        with open(job_path, encoding='utf-8') as f:
+            job = json.load(f)
+        stale = time.time() - os.path.getmtime(job_path) > JOB_STALE_AFTER
+    except OSError:
+        raise UploadNotFound(upload_id) from None
+    if not job['finished'] and stale:
+        job['error'] = "O processamento do arquivo foi interrompido no servidor. Envie o arquivo novamente."
+        job['finished'] = True
+        _write_job(upload_id, job, path)
+        discard_upload(upload_id, path)
+    return job
+
+
+def _heartbeat(upload_id, path, stop):
+    """Renova o mtime do arquivo de progresso até `stop` ser sinalizado."""
+    while not stop.wait(JOB_HEARTBEAT):
+        try:
+            os.utime(_job_path(upload_id, path))
+        except OSError:
+            pass
+
+
+def _run_ingestion(upload_id, part, job, path, mode, prepare, update):
+    def progress(stage):
+        job['stage'] = stage
+        job['done'].append(stage)
+        job['message'] = STAGES[stage]
+        _write_job(upload_id, job, path)
+
+    stop = threading.Event()
+    threading.Thread(target=_heartbeat, args=(upload_id, path, stop), name=f'pulsacao-{upload_id}', daemon=True).start()
+    try:
+        with metrics.timed('dashboard_ingestion_seconds', mode=mode):
+            if mode == 'merge':
+                job['version'], job['summary'] = merge_file(part, path, progress, update)
+            else:
+                job['version'] = ingest_file(part, path, progress, prepare)
+    except Exception as e:
+        print(e)
+        metrics.inc('dashboard_ingestion_errors_total', mode=mode)
+        job['error'] = f"Houve um erro ao processar o arquivo: {e}"
+    finally:
+        stop.set()
+    job['finished'] = True
+    _write_job(upload_id, job, path)
+    # Em caso de sucesso o .part já foi movido; sobra só o .json
+    discard_upload(upload_id, path)
+
+
+def finish_upload(upload_id, path=DATA_PATH, prepare=None, update=None):
+    """Confere o upload completo e inicia a ingestão em segundo plano.
+
+    `prepare` é repassado a dataset.ingest_file e `update` a
+    dataset.merge_file, conforme o modo do upload. Retorna o progresso inicial
+    (etapa 'received'); o restante é acompanhado por ingestion_status. Se a
+    ingestão já tiver sido iniciada, levanta IngestionStarted com o progresso
+    atual, sem iniciar outra.
+    """
+    if os.path.exists(_job_path(upload_id, path)):
+        raise IngestionStarted(ingestion_status(upload_id, path))
+    meta = _read_meta(upload_id, path)
+    if meta['received'] != meta['size']:
+        raise ValueError(f"Upload incompleto: {meta['received']} de {meta['size']} bytes recebidos.")
+    if not meta['header_ok']:
+        discard_upload(upload_id, path)
+        raise ValueError("Cabeçalho não encontrado no início do arquivo.")
+
+    part, _ = _paths(upload_id, path)
+    job = {
+        'id': upload_id, 'stage': 'received', 'done': ['received'], 'message': STAGES['received'],
+        'stages': list(STAGES), 'labels': STAGES, 'error': None, 'version': None, 'finished': False,
+        'mode': meta.get('mode', 'replace'), 'summary': None,
+    }
+    # Criação exclusiva (os.link falha se o destino existir) e já com o conteúdo
+    # completo: de duas chamadas simultâneas, só uma inicia a ingestão
+    job_path = _job_path(upload_id, path)
+    tmp_path = f'{job_path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(job, f)
+    try:
+        os.link(tmp_path, job_path)
+    except FileExistsError:
+        raise IngestionStarted(ingestion_status(upload_id, path)) from None
+    finally:
+        os.remove(tmp_path)
+    threading.Thread(
+        target=_run_ingestion,
+        args=(upload_id, part, dict(job, done=list(job['done'])), path, job['mode'], prepare, update),
+        name=f'ingestao-{upload_id}', daemon=True
+    ).start()
+    return job